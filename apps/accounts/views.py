@@ -243,7 +243,7 @@ class TeamDetailView(TeamMemberRequiredMixin, DetailView):
             team=team
         ).select_related("owner")
 
-        ctx["campaigns"] = Campaign.objects.filter(
+        ctx["campaigns"] = Campaign.objects.visible().filter(
             owner__in=team.members.all()
         ).select_related("template").distinct()
 
@@ -0,0 +1,115 @@
+"""
+Micro-benchmark of the plasmid map label layout.
+Compares apps.core.utils.layout.assign_label_levels (sorted sweep, O(n log n))
+with the former pairwise implementation of the plasmid and simulation views (O(levels·n²)),
+on synthetic maps of increasing size.
+
+Usage: python manage.py benchmark_label_layout --sizes 50 200 1000 --repeat 5
+"""
+import copy
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.core.utils.layout import DEFAULT_LEVELS, assign_label_levels
+
+VISUAL_WIDTH = 900
+
+
+def legacy_detect_overlaps_and_adjust(features_list, levels=DEFAULT_LEVELS):
+    """Former implementation, kept here as the reference for the benchmark."""
+    features_sorted = sorted(features_list, key=lambda f: f["visual_center"])
+
+    for current_feature in features_sorted:
+        current_feature["label_level"] = 0
+
+        for test_level in range(levels):
+            has_overlap = False
+
+            for other_feature in features_sorted:
+                if other_feature is current_feature:
+                    continue
+                if other_feature.get("label_level", 0) != test_level:
+                    continue
+
+                c_left = current_feature["visual_center"] - current_feature["label_text_width"] / 2
+                c_right = current_feature["visual_center"] + current_feature["label_text_width"] / 2
+                o_left = other_feature["visual_center"] - other_feature["label_text_width"] / 2
+                o_right = other_feature["visual_center"] + other_feature["label_text_width"] / 2
+
+                if not (c_right + 5 < o_left or o_right + 5 < c_left):
+                    has_overlap = True
+                    break
+
+            if not has_overlap:
+                current_feature["label_level"] = test_level
+                break
+
+
+def make_features(count, seed):
+    """Outside labels spread over a 900px wide map."""
+    rng = random.Random(seed)
+    return [
+        {
+            "visual_center": rng.randint(0, VISUAL_WIDTH),
+            "label_text_width": 8 * rng.randint(3, 15),
+            "label_level": 0,
+        }
+        for _ in range(count)
+    ]
+
+
+def count_collisions(features, margin=5):
+    """Number of overlapping label pairs on the same level (quality check, not timed)."""
+    collisions = 0
+    by_level = {}
+    for f in features:
+        by_level.setdefault(f["label_level"], []).append(f)
+    for level_features in by_level.values():
+        spans = sorted(
+            (f["visual_center"] - f["label_text_width"] / 2, f["visual_center"] + f["label_text_width"] / 2)
+            for f in level_features
+        )
+        for i, (_, right) in enumerate(spans):
+            for left, _ in spans[i + 1:]:
+                if left > right + margin:
+                    break
+                collisions += 1
+    return collisions
+
+
+class Command(BaseCommand):
+    help = 'Compare the sweep-line label layout with the former pairwise implementation.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[20, 100, 500, 2000], help='Number of outside labels per map.')
+        parser.add_argument('--repeat', type=int, default=5, help='Runs per size (best time is kept).')
+        parser.add_argument('--levels', type=int, default=DEFAULT_LEVELS, help='Number of label levels.')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def _best_time(self, func, features, repeat, levels):
+        best = float('inf')
+        result = None
+        for _ in range(repeat):
+            data = copy.deepcopy(features)
+            start = time.perf_counter()
+            func(data, levels=levels)
+            best = min(best, time.perf_counter() - start)
+            result = data
+        return best, result
+
+    def handle(self, *args, **options):
+        repeat = max(1, options['repeat'])
+        levels = options['levels']
+
+        self.stdout.write(f"{'labels':>8} {'legacy (ms)':>12} {'sweep (ms)':>11} {'speedup':>8} {'collisions legacy/sweep':>24}")
+        for size in options['sizes']:
+            features = make_features(size, options['seed'])
+            legacy_time, legacy_result = self._best_time(legacy_detect_overlaps_and_adjust, features, repeat, levels)
+            sweep_time, sweep_result = self._best_time(assign_label_levels, features, repeat, levels)
+            speedup = legacy_time / sweep_time if sweep_time else float('inf')
+            collisions = f"{count_collisions(legacy_result)}/{count_collisions(sweep_result)}"
+            self.stdout.write(
+                f"{size:>8} {legacy_time * 1000:>12.2f} {sweep_time * 1000:>11.2f} {speedup:>7.1f}x {collisions:>24}"
+            )
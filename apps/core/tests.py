@@ -1,3 +1,33 @@
-from django.test import TestCase
+from django.test import SimpleTestCase
 
-# Create your tests here.
+from apps.core.utils.layout import assign_label_levels
+
+
+def label(center, width):
+    return {"visual_center": center, "label_text_width": width, "label_level": 0}
+
+
+class LabelLayoutTests(SimpleTestCase):
+    def test_overlapping_labels_are_stacked(self):
+        features = [label(100, 40), label(110, 40), label(120, 40), label(300, 40)]
+
+        assign_label_levels(features)
+
+        self.assertEqual([f["label_level"] for f in features], [0, 1, 2, 0])
+
+    def test_level_is_reused_once_free(self):
+        # 5px margin: 150 - 20 = 130 > 100 + 20 + 5
+        features = [label(100, 40), label(105, 40), label(150, 40)]
+
+        assign_label_levels(features)
+
+        self.assertEqual([f["label_level"] for f in features], [0, 1, 0])
+
+    def test_levels_are_configurable(self):
+        features = [label(100, 40) for _ in range(5)]
+
+        assign_label_levels(features, levels=5)
+
+        self.assertEqual(sorted(f["label_level"] for f in features), [0, 1, 2, 3, 4])
+        for f in assign_label_levels([label(100, 40) for _ in range(5)], levels=2):
+            self.assertIn(f["label_level"], (0, 1))
@@ -0,0 +1,22 @@
+"""
+Core app hashing utilities.
+Function: Provide content hashes (SHA-256) for files, used to address cached data by content.
+"""
+import hashlib
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def file_sha256(path, chunk_size=CHUNK_SIZE):
+    """
+    Return the hex SHA-256 digest of a file, read by chunks.
+
+    Args:
+        path (str | Path): File to hash.
+        chunk_size (int): Size of the chunks read from disk.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as stream:
+        for chunk in iter(lambda: stream.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
@@ -0,0 +1,55 @@
+"""
+Core app layout utilities.
+Function: Place the external labels of a linear plasmid map on stacked levels so that they do not overlap.
+"""
+import heapq
+
+DEFAULT_LEVELS = 3
+DEFAULT_MARGIN = 5
+
+
+def assign_label_levels(features, levels=DEFAULT_LEVELS, margin=DEFAULT_MARGIN):
+    """
+    Set ``label_level`` on each feature so that labels on the same level do not overlap.
+
+    Each label spans ``visual_center ± label_text_width / 2``. Labels are swept by
+    their left edge while the right edge of the last label of every level is
+    tracked: a label goes on the lowest level whose right edge (plus ``margin``)
+    is left of it, which costs O(n log n) instead of comparing all pairs.
+    When every level is taken, the label goes on the level that frees up first.
+
+    Args:
+        features (list[dict]): Features with ``visual_center`` and ``label_text_width``, updated in place.
+        levels (int): Number of available label levels.
+        margin (int | float): Minimum horizontal gap between two labels of the same level, in px.
+    """
+    if levels < 1:
+        raise ValueError("levels must be at least 1")
+
+    def _bounds(feature):
+        half_width = feature["label_text_width"] / 2
+        return feature["visual_center"] - half_width, feature["visual_center"] + half_width
+
+    spans = sorted((_bounds(f) + (i,) for i, f in enumerate(features)), key=lambda span: span[0])
+
+    # Right edge of the last label placed on each level, -inf while the level is empty
+    right_edges = [float("-inf")] * levels
+    # Free levels, smallest first, and busy levels ordered by the position where they free up
+    free_levels = list(range(levels))
+    busy_levels = []
+
+    for left, right, index in spans:
+        while busy_levels and busy_levels[0][0] + margin < left:
+            _, level = heapq.heappop(busy_levels)
+            heapq.heappush(free_levels, level)
+
+        if free_levels:
+            level = heapq.heappop(free_levels)
+        else:
+            _, level = heapq.heappop(busy_levels)
+
+        right_edges[level] = max(right_edges[level], right)
+        heapq.heappush(busy_levels, (right_edges[level], level))
+        features[index]["label_level"] = level
+
+    return features
@@ -0,0 +1,74 @@
+"""
+Cache of GenBank files rendered from the database.
+
+Plasmids without a stored file (no file_path) are rendered from their sequence and
+annotations by service.iter_genbank. The result is kept on disk under
+MEDIA_ROOT/genbank_cache/<plasmid id>/<content version>.gb, so simulations and
+exports reuse it instead of rebuilding it for every run.
+
+The content version is a hash of everything the rendering depends on, so a stale
+file is never served. The signals in signals.py also drop the entries of a plasmid
+as soon as the plasmid or one of its annotations is saved or deleted, so old
+versions do not pile up on disk.
+"""
+import hashlib
+import json
+import os
+import shutil
+import uuid
+from pathlib import Path
+
+from django.conf import settings
+
+# Bump when iter_genbank output changes, to invalidate every cached file
+RENDER_VERSION = 1
+
+
+def get_cache_dir() -> Path:
+    return Path(settings.MEDIA_ROOT) / "genbank_cache"
+
+
+def content_version(plasmid, locus_name: str) -> str:
+    """
+    SHA-256 of the rendering inputs: name, locus name, sequence and annotations.
+    Uses plasmid.annotations.all(), so prefetched annotations do not hit the database.
+    """
+    annotations = sorted(
+        (ann.start, ann.end, ann.strand, ann.feature_type, ann.label)
+        for ann in plasmid.annotations.all()
+    )
+    canonical = {
+        "render": RENDER_VERSION,
+        "name": plasmid.name,
+        "locus": locus_name,
+        "annotations": annotations,
+    }
+    digest = hashlib.sha256(json.dumps(canonical, sort_keys=True).encode("utf-8"))
+    digest.update(b"\0")
+    digest.update((plasmid.sequence or "").encode("utf-8"))
+    return digest.hexdigest()
+
+
+def cached_genbank(plasmid, locus_name: str) -> Path:
+    """Return the path of the rendered GenBank file for this plasmid, rendering it on a miss."""
+    from .service import iter_genbank
+
+    plasmid_dir = get_cache_dir() / str(plasmid.pk)
+    path = plasmid_dir / f"{content_version(plasmid, locus_name)}.gb"
+    if path.is_file():
+        return path
+
+    plasmid_dir.mkdir(parents=True, exist_ok=True)
+    tmp_path = plasmid_dir / f".tmp-{uuid.uuid4().hex}"
+    with open(tmp_path, "w") as out:
+        out.writelines(iter_genbank(plasmid, locus_name))
+    # Atomic: concurrent renderings of the same version do not see partial files
+    os.replace(tmp_path, path)
+    return path
+
+
+def invalidate(plasmid_id) -> None:
+    """Drop every cached rendering of a plasmid."""
+    if plasmid_id is None:
+        return
+    shutil.rmtree(get_cache_dir() / str(plasmid_id), ignore_errors=True)
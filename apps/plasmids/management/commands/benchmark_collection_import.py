@@ -0,0 +1,125 @@
+"""
+Benchmark of the "save to collection" import of simulation sequences.
+Compares the former per-row import (one exists() loop, one INSERT per plasmid and per annotation)
+with service.bulk_import_genbank_files on a folder of GenBank files (data/pYTK by default).
+
+Each run happens in a transaction that is rolled back, and files are copied into a temporary
+folder: the database and MEDIA_ROOT are left untouched.
+
+Usage: python manage.py benchmark_collection_import --source data/pYTK --repeat 3
+"""
+import shutil
+import tempfile
+import time
+import uuid
+from pathlib import Path
+
+from Bio import SeqIO
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from apps.plasmids.models import Plasmid, PlasmidAnnotation, PlasmidCollection
+from apps.plasmids.service import bulk_import_genbank_files
+
+
+class _Rollback(Exception):
+    pass
+
+
+def legacy_import(gb_files, *, collection, storage_dir, description=""):
+    """Former per-row import of simulation_view, kept here as the reference for the benchmark."""
+    imported_count = 0
+    for gb_file in gb_files:
+        try:
+            record = next(SeqIO.parse(gb_file, "genbank"))
+
+            identifier = record.id
+            if not identifier or identifier == '.' or '<unknown' in identifier:
+                identifier = gb_file.stem
+
+            clean_id = identifier
+            while Plasmid.objects.filter(identifier=clean_id).exists():
+                clean_id = f"{identifier}_{uuid.uuid4().hex[:4]}"
+
+            permanent_path = storage_dir / f"{clean_id}_{gb_file.name}"
+            shutil.copy(gb_file, permanent_path)
+
+            new_plasmid = Plasmid.objects.create(
+                identifier=clean_id,
+                name=record.description[:200] if record.description else clean_id,
+                type="Imported",
+                sequence=str(record.seq).upper(),
+                length=len(record.seq),
+                description=description,
+                collection=collection,
+                file_path=str(permanent_path),
+                is_public=False
+            )
+
+            for feature in record.features:
+                if feature.type == 'source':
+                    continue
+                label = feature.type
+                for key in ('label', 'gene', 'note'):
+                    if key in feature.qualifiers:
+                        label = feature.qualifiers[key][0]
+                        break
+                PlasmidAnnotation.objects.create(
+                    plasmid=new_plasmid,
+                    feature_type=feature.type,
+                    start=int(feature.location.start),
+                    end=int(feature.location.end),
+                    strand=feature.location.strand or 1,
+                    label=label[:200],
+                    qualifiers=feature.qualifiers
+                )
+            imported_count += 1
+        except Exception:
+            continue
+    return imported_count
+
+
+class Command(BaseCommand):
+    help = 'Compare the per-row and bulk imports of GenBank files into a collection.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--source', default=str(Path(settings.BASE_DIR) / 'data' / 'pYTK'), help='Folder of .gb files.')
+        parser.add_argument('--repeat', type=int, default=3, help='Runs per implementation (best time is kept).')
+
+    def _measure(self, import_func, gb_files):
+        """Run one import in a rolled back transaction. Returns (seconds, queries, plasmids)."""
+        with tempfile.TemporaryDirectory() as storage:
+            try:
+                with transaction.atomic():
+                    collection = PlasmidCollection.objects.create(name='benchmark import')
+                    with CaptureQueriesContext(connection) as queries:
+                        start = time.perf_counter()
+                        import_func(gb_files, collection=collection, storage_dir=Path(storage))
+                        elapsed = time.perf_counter() - start
+                    created = collection.plasmids.count()
+                    raise _Rollback
+            except _Rollback:
+                pass
+        return elapsed, len(queries), created
+
+    def handle(self, *args, **options):
+        source = Path(options['source'])
+        gb_files = sorted(source.glob('**/*.gb'))
+        if not gb_files:
+            raise CommandError(f"No .gb files found under {source}")
+
+        implementations = [
+            ('per-row', legacy_import),
+            ('bulk', bulk_import_genbank_files),
+        ]
+        results = {}
+        for label, import_func in implementations:
+            runs = [self._measure(import_func, gb_files) for _ in range(max(1, options['repeat']))]
+            results[label] = min(runs)
+            elapsed, query_count, created = results[label]
+            self.stdout.write(f"{label:>8}: {elapsed * 1000:9.1f} ms  {query_count:6d} queries  {created} plasmids")
+
+        speedup = results['per-row'][0] / results['bulk'][0] if results['bulk'][0] else float('inf')
+        self.stdout.write(self.style.SUCCESS(f"{len(gb_files)} files from {source}: bulk import is {speedup:.1f}x faster"))
@@ -0,0 +1,50 @@
+"""
+Inspect, evict or purge the cache of parsed GenBank files (apps/plasmids/parse_cache.py).
+
+Usage:
+  python manage.py genbank_parse_cache            # hit / miss counters and size
+  python manage.py genbank_parse_cache --evict    # apply GENBANK_PARSE_CACHE_MAX_BYTES
+  python manage.py genbank_parse_cache --purge    # empty the cache and reset the counters
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.template.defaultfilters import filesizeformat
+
+from apps.plasmids import parse_cache
+
+
+class Command(BaseCommand):
+    help = "Inspect, evict or purge the cache of parsed GenBank files"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--purge", action="store_true", help="Delete every entry and reset the counters")
+        parser.add_argument(
+            "--evict",
+            action="store_true",
+            help="Evict least recently used entries above the size limit",
+        )
+        parser.add_argument(
+            "--max-bytes",
+            type=int,
+            default=None,
+            help="Size limit used by --evict (defaults to settings.GENBANK_PARSE_CACHE_MAX_BYTES)",
+        )
+
+    def handle(self, *args, **options):
+        if options["purge"]:
+            count = parse_cache.purge()
+            self.stdout.write(self.style.SUCCESS(f"Purged {count} cache entrie(s)"))
+            return
+
+        if options["evict"]:
+            evicted = parse_cache.evict(options["max_bytes"])
+            self.stdout.write(self.style.SUCCESS(f"Evicted {evicted} cache entrie(s)"))
+
+        stats = parse_cache.stats()
+        self.stdout.write(
+            f"{stats['entries']} entrie(s), {filesizeformat(stats['bytes'])} "
+            f"/ {filesizeformat(settings.GENBANK_PARSE_CACHE_MAX_BYTES)} in {parse_cache.get_cache_dir()}"
+        )
+        self.stdout.write(
+            f"hits={stats['hits']} misses={stats['misses']} hit ratio={stats['hit_ratio']:.1%}"
+        )
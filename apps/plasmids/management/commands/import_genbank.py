@@ -7,9 +7,9 @@ from django.core.management.base import BaseCommand, CommandError
 from django.db import transaction
 
 try:
-    from Bio import SeqIO
+    from apps.plasmids.parsing import parse_genbank_files
 except Exception as e:
-    SeqIO = None
+    parse_genbank_files = None
     BIOPYTHON_IMPORT_ERROR = e
 else:
     BIOPYTHON_IMPORT_ERROR = None
@@ -64,7 +64,7 @@ class Command(BaseCommand):
         )
 
     def handle(self, *args, **options):
-        if SeqIO is None:
+        if parse_genbank_files is None:
             raise CommandError(
                 f"Biopython is required. Import error: {BIOPYTHON_IMPORT_ERROR}"
             )
@@ -97,9 +97,16 @@ class Command(BaseCommand):
         skipped = 0
         failed = 0
 
-        for fp in files:
+        # Files are parsed up front (in a process pool for large folders), then saved one by one
+        for fp, parsed in zip(files, parse_genbank_files(files)):
             try:
-                res = self._import_one_file(fp, collection, Plasmid, PlasmidAnnotation, allow_update, make_public)
+                if parsed.error:
+                    raise ValueError(parsed.error)
+                if len(parsed.records) != 1:
+                    raise ValueError(f"expected one GenBank record, found {len(parsed.records)}")
+                res = self._import_one_file(
+                    fp, parsed.records[0], collection, Plasmid, PlasmidAnnotation, allow_update, make_public
+                )
                 if res == "created":
                     created += 1
                 elif res == "updated":
@@ -117,12 +124,9 @@ class Command(BaseCommand):
         self.stdout.write(f"  failed:  {failed}")
 
     @transaction.atomic
-    def _import_one_file(self, fp: Path, collection, Plasmid, PlasmidAnnotation, allow_update: bool, make_public: bool):
+    def _import_one_file(self, fp: Path, record, collection, Plasmid, PlasmidAnnotation, allow_update: bool, make_public: bool):
         identifier = fp.stem
 
-        # Parse GenBank
-        record = SeqIO.read(str(fp), "genbank")
-
         # --- Find existing plasmid
         # Prefer identifier field if it exists; else fallback on name.
         lookup = {}
@@ -143,9 +147,9 @@ class Command(BaseCommand):
         if _model_has_field(Plasmid, "name"):
             defaults["name"] = (record.name or identifier)
         if _model_has_field(Plasmid, "sequence"):
-            defaults["sequence"] = str(record.seq)
+            defaults["sequence"] = record.sequence
         if _model_has_field(Plasmid, "length"):
-            defaults["length"] = len(record.seq)
+            defaults["length"] = record.length
         if _model_has_field(Plasmid, "description"):
             defaults["description"] = record.description or ""
         if _model_has_field(Plasmid, "genbank_data"):
@@ -183,7 +187,8 @@ class Command(BaseCommand):
                 PlasmidAnnotation.objects.filter(plasmid=plasmid).delete()
 
         # --- Create annotations
-        for feature in getattr(record, "features", []):
+        for feature in record.features:
+            # Only the label / gene qualifiers name an annotation here (not the parser's note / type fallback)
             raw_label = (
                 feature.qualifiers.get("label", [""])[0]
                 or feature.qualifiers.get("gene", [""])[0]
@@ -193,11 +198,11 @@ class Command(BaseCommand):
             PlasmidAnnotation.objects.create(
                 plasmid=plasmid,
                 feature_type=feature.type,
-                start=int(feature.location.start),
-                end=int(feature.location.end),
-                strand=feature.location.strand or 1,
-                label=raw_label,
-                qualifiers=dict(feature.qualifiers),
+                start=feature.start,
+                end=feature.end,
+                strand=feature.strand,
+                label=raw_label[:200],
+                qualifiers=feature.qualifiers,
             )
 
         action = "Imported" if created else "Updated"
@@ -0,0 +1,210 @@
+"""
+On-disk cache of parsed GenBank files, addressed by content.
+
+The same files are parsed again and again: collection files on every simulation and
+import_genbank --update, result files whenever the visuals of a run are rebuilt.
+parsing.parse_genbank_files / parse_genbank_contents hash each input (SHA-256 of its
+bytes) and look it up here before calling Bio.SeqIO; only the misses are parsed.
+
+An entry is the pickled (records, error) of one input, under
+GENBANK_PARSE_CACHE_DIR/<format version>/<aa>/<sha256>-<mode>.pickle, where mode
+is "all" (every record) or "first" (first_only parsing). Unpickling runs arbitrary code,
+so the cache lives in its own directory, outside MEDIA_ROOT: media holds user uploads
+and is served by the web server, and only this module may write entries. A full entry also serves
+first_only lookups. Parse errors are cached too: an unchanged broken file is not parsed
+again. Bump FORMAT_VERSION when the summaries (parsing.RecordSummary...) change.
+
+The total size is bounded by settings.GENBANK_PARSE_CACHE_MAX_BYTES: a hit refreshes the
+entry mtime, and the least recently used entries are evicted after each batch that
+stored new ones. Hit / miss counters are kept per process (counters()) and in
+stats.json for the whole deployment (stats(), shown on the simulation metrics page).
+"""
+import fcntl
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import uuid
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from django.conf import settings
+
+# Bump when the pickled summaries change, to ignore every older entry
+FORMAT_VERSION = 1
+ENTRY_SUFFIX = ".pickle"
+STATS_FILENAME = "stats.json"
+
+MODE_ALL = "all"
+MODE_FIRST = "first"
+
+# Hits and misses of the current process, since its start
+_counters = Counter()
+
+
+def get_cache_dir() -> Path:
+    return Path(settings.GENBANK_PARSE_CACHE_DIR)
+
+
+def get_entries_dir() -> Path:
+    return get_cache_dir() / f"v{FORMAT_VERSION}"
+
+
+def is_enabled() -> bool:
+    return getattr(settings, "GENBANK_PARSE_CACHE_ENABLED", True)
+
+
+def content_key(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _entry_path(key: str, mode: str) -> Path:
+    return get_entries_dir() / key[:2] / f"{key}-{mode}{ENTRY_SUFFIX}"
+
+
+def _read_entry(path: Path) -> Optional[Tuple[list, Optional[str]]]:
+    try:
+        with open(path, "rb") as stream:
+            records, error = pickle.load(stream)
+    except FileNotFoundError:
+        return None
+    except Exception:
+        # Truncated or unreadable entry: parse again and overwrite it
+        return None
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+    return records, error
+
+
+def lookup(key: str, first_only: bool) -> Optional[Tuple[list, Optional[str]]]:
+    """Cached (records, error) for this content, or None on a miss."""
+    if first_only:
+        entry = _read_entry(_entry_path(key, MODE_FIRST))
+        if entry is not None:
+            return entry
+        entry = _read_entry(_entry_path(key, MODE_ALL))
+        if entry is not None:
+            records, error = entry
+            return records[:1], error
+        return None
+    return _read_entry(_entry_path(key, MODE_ALL))
+
+
+def store(key: str, first_only: bool, records: list, error: Optional[str]) -> None:
+    path = _entry_path(key, MODE_FIRST if first_only else MODE_ALL)
+    path.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+    tmp_path = path.parent / f".tmp-{uuid.uuid4().hex}"
+    with open(tmp_path, "wb") as stream:
+        pickle.dump((records, error), stream, protocol=pickle.HIGHEST_PROTOCOL)
+    # Atomic: a concurrent reader sees the old entry or the new one, never a partial file
+    os.replace(tmp_path, path)
+
+
+# ==========================================
+# Counters
+# ==========================================
+
+def record(hits: int, misses: int) -> None:
+    """Add the hits / misses of one batch to the process counters and to stats.json."""
+    if not hits and not misses:
+        return
+    _counters["hits"] += hits
+    _counters["misses"] += misses
+
+    cache_dir = get_cache_dir()
+    cache_dir.mkdir(mode=0o700, parents=True, exist_ok=True)
+    # Read-modify-write under an exclusive lock: workers and web processes share the file
+    with open(cache_dir / STATS_FILENAME, "a+") as stream:
+        fcntl.flock(stream, fcntl.LOCK_EX)
+        try:
+            stream.seek(0)
+            try:
+                totals = json.loads(stream.read() or "{}")
+            except ValueError:
+                totals = {}
+            totals["hits"] = totals.get("hits", 0) + hits
+            totals["misses"] = totals.get("misses", 0) + misses
+            stream.seek(0)
+            stream.truncate()
+            json.dump(totals, stream)
+            stream.flush()
+        finally:
+            fcntl.flock(stream, fcntl.LOCK_UN)
+
+
+def counters() -> Dict[str, int]:
+    """Hits and misses of the current process."""
+    return {"hits": _counters["hits"], "misses": _counters["misses"]}
+
+
+# ==========================================
+# Size limit and inspection
+# ==========================================
+
+def list_entries() -> List[dict]:
+    """Entries as {'path', 'size', 'last_used'}, most recently used first."""
+    entries = []
+    entries_dir = get_entries_dir()
+    if not entries_dir.is_dir():
+        return entries
+    for shard in os.scandir(entries_dir):
+        if not shard.is_dir():
+            continue
+        for entry in os.scandir(shard.path):
+            if not entry.name.endswith(ENTRY_SUFFIX):
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append({"path": Path(entry.path), "size": stat.st_size, "last_used": stat.st_mtime})
+    entries.sort(key=lambda e: e["last_used"], reverse=True)
+    return entries
+
+
+def evict(max_bytes: Optional[int] = None) -> int:
+    """Delete the least recently used entries above max_bytes. Return the number of deleted entries."""
+    if max_bytes is None:
+        max_bytes = settings.GENBANK_PARSE_CACHE_MAX_BYTES
+    entries = list_entries()
+    total = sum(e["size"] for e in entries)
+    evicted = 0
+    for entry in reversed(entries):
+        if total <= max_bytes:
+            break
+        try:
+            entry["path"].unlink()
+        except FileNotFoundError:
+            pass
+        total -= entry["size"]
+        evicted += 1
+    return evicted
+
+
+def stats() -> Dict[str, float]:
+    """Deployment-wide counters and current size: hits, misses, hit_ratio, entries, bytes."""
+    try:
+        with open(get_cache_dir() / STATS_FILENAME) as stream:
+            totals = json.load(stream)
+    except (OSError, ValueError):
+        totals = {}
+    hits, misses = totals.get("hits", 0), totals.get("misses", 0)
+    entries = list_entries()
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_ratio": hits / (hits + misses) if hits + misses else 0.0,
+        "entries": len(entries),
+        "bytes": sum(e["size"] for e in entries),
+    }
+
+
+def purge() -> int:
+    """Delete every entry (of every format version) and reset the counters. Return the number of entries deleted."""
+    count = len(list_entries())
+    shutil.rmtree(get_cache_dir(), ignore_errors=True)
+    return count
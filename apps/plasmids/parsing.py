@@ -0,0 +1,198 @@
+"""
+GenBank parsing shared by imports and simulation result rendering.
+
+Parsing with Bio.SeqIO is CPU bound. parse_genbank_files and parse_genbank_contents
+fan the inputs out to a process pool and return compact, picklable summaries
+(RecordSummary / FeatureSummary) rather than SeqRecord objects, so every caller gets
+the same normalized structure:
+- feature labels follow the label / gene / note / feature type order
+- a feature without strand is read as forward (1)
+- the sequence is a plain string, as found in the file
+
+Inputs smaller than settings.GENBANK_PARSE_PARALLEL_MIN_BYTES in total are parsed
+in-process: starting workers would cost more than it saves.
+
+Both functions look every input up in parse_cache (by SHA-256 of its bytes) first:
+only the inputs never seen before reach Bio.SeqIO.
+"""
+import functools
+import io
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+
+from Bio import SeqIO
+
+from apps.core.utils.hashing import file_sha256
+
+from . import parse_cache
+
+# Record annotations kept in the summary
+ANNOTATION_KEYS = ("topology", "molecule_type", "date")
+
+
+@dataclass
+class FeatureSummary:
+    type: str
+    start: int
+    end: int
+    strand: int
+    label: str
+    qualifiers: Dict[str, List[str]]
+
+
+@dataclass
+class RecordSummary:
+    id: str
+    name: str
+    description: str
+    sequence: str
+    annotations: Dict[str, str] = field(default_factory=dict)
+    features: List[FeatureSummary] = field(default_factory=list)
+
+    @property
+    def length(self) -> int:
+        return len(self.sequence)
+
+
+@dataclass
+class ParsedFile:
+    """
+    Records of one input, in file order; error is set when the input could not be parsed.
+    transient marks errors unrelated to the content (unreadable file), which are not cached.
+    """
+    source: str
+    records: List[RecordSummary]
+    error: Optional[str] = None
+    transient: bool = False
+
+
+def feature_label(feature) -> str:
+    for key in ("label", "gene", "note"):
+        if key in feature.qualifiers:
+            return feature.qualifiers[key][0]
+    return feature.type
+
+
+def summarize_record(record) -> RecordSummary:
+    return RecordSummary(
+        id=record.id or "",
+        name=record.name or "",
+        description=record.description or "",
+        sequence=str(record.seq) if record.seq is not None else "",
+        annotations={key: str(record.annotations[key]) for key in ANNOTATION_KEYS if key in record.annotations},
+        features=[
+            FeatureSummary(
+                type=feature.type,
+                start=int(feature.location.start),
+                end=int(feature.location.end),
+                strand=feature.location.strand or 1,
+                label=feature_label(feature),
+                qualifiers={key: list(values) for key, values in feature.qualifiers.items()},
+            )
+            for feature in record.features
+        ],
+    )
+
+
+def _summarize(source: str, handle, first_only: bool) -> ParsedFile:
+    try:
+        records = []
+        for record in SeqIO.parse(handle, "genbank"):
+            records.append(summarize_record(record))
+            if first_only:
+                break
+    except Exception as e:
+        return ParsedFile(source=source, records=[], error=str(e) or type(e).__name__)
+    return ParsedFile(source=source, records=records)
+
+
+def parse_genbank_file(path, first_only: bool = False) -> ParsedFile:
+    """Parse one GenBank file (only its first record with first_only)."""
+    try:
+        with open(path) as handle:
+            return _summarize(str(path), handle, first_only)
+    except OSError as e:
+        return ParsedFile(source=str(path), records=[], error=str(e) or type(e).__name__, transient=True)
+
+
+def parse_genbank_bytes(item: Tuple[str, bytes], first_only: bool = False) -> ParsedFile:
+    """Parse GenBank content received as (name, bytes), e.g. an uploaded file."""
+    name, data = item
+    return _summarize(name, io.StringIO(data.decode("utf-8", errors="replace")), first_only)
+
+
+def _parse_all(parse, items: list, total_bytes: int, max_workers: Optional[int]) -> List[ParsedFile]:
+    """Apply parse to every item, in a process pool for large inputs. Results keep the input order."""
+    workers = min(max_workers or settings.GENBANK_PARSE_WORKERS, len(items))
+    if workers <= 1 or total_bytes < settings.GENBANK_PARSE_PARALLEL_MIN_BYTES:
+        return [parse(item) for item in items]
+
+    # fork: workers reuse the modules already imported by the parent (Biopython, Django)
+    context = multiprocessing.get_context("fork")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        return list(pool.map(parse, items, chunksize=max(1, len(items) // (workers * 4))))
+
+
+def _parse_cached(parse, items: list, keys: List[Optional[str]], sources: List[str], sizes: List[int],
+                  first_only: bool, max_workers: Optional[int]) -> List[ParsedFile]:
+    """
+    _parse_all behind parse_cache: items whose key is cached are not parsed, the others
+    are parsed (in a pool if large enough) and stored. A None key is never cached.
+    """
+    if not parse_cache.is_enabled():
+        return _parse_all(parse, items, sum(sizes), max_workers)
+
+    results: List[Optional[ParsedFile]] = [None] * len(items)
+    misses = []
+    for index, key in enumerate(keys):
+        entry = parse_cache.lookup(key, first_only) if key else None
+        if entry is None:
+            misses.append(index)
+        else:
+            records, error = entry
+            results[index] = ParsedFile(source=sources[index], records=records, error=error)
+
+    if misses:
+        parsed = _parse_all(parse, [items[i] for i in misses], sum(sizes[i] for i in misses), max_workers)
+        for index, result in zip(misses, parsed):
+            results[index] = result
+            if keys[index] and not result.transient:
+                parse_cache.store(keys[index], first_only, result.records, result.error)
+        parse_cache.evict()
+    parse_cache.record(hits=len(items) - len(misses), misses=len(misses))
+    return results
+
+
+def parse_genbank_files(paths: Iterable, *, first_only: bool = False, max_workers: Optional[int] = None) -> List[ParsedFile]:
+    """Parse GenBank files; one ParsedFile per path, in the same order."""
+    paths = [Path(path) for path in paths]
+    keys, sizes = [], []
+    for path in paths:
+        try:
+            sizes.append(path.stat().st_size)
+            keys.append(file_sha256(path) if parse_cache.is_enabled() else None)
+        except OSError:
+            # Parsed anyway, to report the error in the ParsedFile
+            sizes.append(0)
+            keys.append(None)
+    return _parse_cached(
+        functools.partial(parse_genbank_file, first_only=first_only), paths,
+        keys, [str(path) for path in paths], sizes, first_only, max_workers,
+    )
+
+
+def parse_genbank_contents(
+    contents: Iterable[Tuple[str, bytes]], *, first_only: bool = False, max_workers: Optional[int] = None
+) -> List[ParsedFile]:
+    """Parse (name, bytes) GenBank contents; one ParsedFile per item, in the same order."""
+    contents = list(contents)
+    keys = [parse_cache.content_key(data) if parse_cache.is_enabled() else None for _, data in contents]
+    return _parse_cached(
+        functools.partial(parse_genbank_bytes, first_only=first_only), contents,
+        keys, [name for name, _ in contents], [len(data) for _, data in contents], first_only, max_workers,
+    )
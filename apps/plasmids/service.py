@@ -1,14 +1,20 @@
 import io
+import re
+import shutil
+import uuid
 import zipfile
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
-from typing import Iterable, List, Optional, Tuple
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
 
+from django.conf import settings
 from django.db import transaction
 from django.utils.text import slugify
 
-from Bio import SeqIO
-
-from .models import Plasmid, PlasmidCollection
+from . import genbank_cache
+from .parsing import parse_genbank_contents, parse_genbank_files
+from .models import Plasmid, PlasmidAnnotation, PlasmidCollection
 
 
 @dataclass
@@ -42,15 +48,6 @@ def _iter_genbank_bytes_from_upload(uploaded_file) -> Iterable[Tuple[str, bytes]
         yield (uploaded_file.name, uploaded_file.read())
 
 
-def _parse_genbank_records(file_bytes: bytes, source_name: str):
-    """
-    Parse one genbank content and yield SeqRecord.
-    """
-    handle = io.StringIO(file_bytes.decode("utf-8", errors="replace"))
-    # genbank format name in biopython is "genbank"
-    return SeqIO.parse(handle, "genbank")
-
-
 def _pick_identifier(record) -> str:
     """
     Decide plasmid identifier.
@@ -76,16 +73,20 @@ def import_plasmids_from_upload(
     skipped = 0
     errors: List[str] = []
 
-    for filename, content in _iter_genbank_bytes_from_upload(uploaded_file):
+    # Every file of the upload is parsed first (in parallel for large uploads)
+    for parsed in parse_genbank_contents(_iter_genbank_bytes_from_upload(uploaded_file)):
+        filename = parsed.source
         try:
-            records = list(_parse_genbank_records(content, filename))
+            if parsed.error:
+                raise ValueError(parsed.error)
+            records = parsed.records
             if not records:
                 errors.append(f"{filename}: Can't find GenBank record")
                 continue
 
             for rec in records:
                 identifier = _pick_identifier(rec)
-                seq = str(rec.seq) if getattr(rec, "seq", None) is not None else ""
+                seq = rec.sequence
 
                 # If plasmid with same owner+identifier exists, skip
                 # Champs requis par le modèle: identifier, name, type, sequence, length, collection
@@ -116,6 +117,127 @@ def import_plasmids_from_upload(
     return ImportResult(created=created, skipped=skipped, errors=errors)
 
 
+# =================================================================================
+# Bulk import of GenBank files (simulation sequences -> new collection)
+
+# Rows per INSERT for bulk_create (keeps SQLite under its variable limit)
+BULK_BATCH_SIZE = 500
+
+
+def _assign_identifiers(wanted: List[str]) -> List[str]:
+    """
+    Free identifiers for a batch of plasmids: existing ones get a random '_xxxx' suffix.
+    Collisions with the database are checked with one query per round (a single round in practice).
+    """
+    assigned: List[Optional[str]] = [None] * len(wanted)
+    pending = list(range(len(wanted)))
+    candidates = {i: wanted[i] for i in pending}
+    batch: set = set()
+
+    while pending:
+        taken = set(
+            Plasmid.objects
+            .filter(identifier__in={candidates[i] for i in pending})
+            .values_list("identifier", flat=True)
+        )
+        retry = []
+        for i in pending:
+            candidate = candidates[i]
+            if candidate in taken or candidate in batch:
+                candidates[i] = f"{wanted[i]}_{uuid.uuid4().hex[:4]}"
+                retry.append(i)
+            else:
+                assigned[i] = candidate
+                batch.add(candidate)
+        pending = retry
+
+    return assigned
+
+
+def bulk_import_genbank_files(
+    gb_files: Iterable[Path],
+    *,
+    collection: PlasmidCollection,
+    storage_dir: Path,
+    storage_root: Optional[Path] = None,
+    description: str = "",
+) -> ImportResult:
+    """
+    Import the first record of each GenBank file into collection.
+    - every file is parsed before touching the database (see parsing.parse_genbank_files)
+    - identifier collisions are resolved for the whole batch (see _assign_identifiers)
+    - plasmids and annotations are inserted with bulk_create in one transaction
+    Files are copied into storage_dir; file_path is stored relative to storage_root when given.
+    The copies are deleted again if the transaction is rolled back.
+    Unreadable files are reported in ImportResult.errors and skipped.
+    """
+    gb_files = [Path(gb_file) for gb_file in gb_files]
+    parsed = []
+    errors: List[str] = []
+    for gb_file, result in zip(gb_files, parse_genbank_files(gb_files, first_only=True)):
+        if result.error or not result.records:
+            errors.append(f"{gb_file.name}: {result.error or 'no GenBank record found'}")
+            continue
+        record = result.records[0]
+        identifier = record.id
+        if not identifier or identifier == "." or "<unknown" in identifier:
+            identifier = gb_file.stem
+        parsed.append((gb_file, record, identifier))
+
+    if not parsed:
+        return ImportResult(created=0, skipped=0, errors=errors)
+
+    storage_dir = Path(storage_dir)
+    storage_dir.mkdir(parents=True, exist_ok=True)
+
+    copied: List[Path] = []
+    try:
+        with transaction.atomic():
+            identifiers = _assign_identifiers([identifier for _, _, identifier in parsed])
+
+            plasmids = []
+            for (gb_file, record, _), clean_id in zip(parsed, identifiers):
+                permanent_path = storage_dir / f"{clean_id}_{gb_file.name}"
+                if not permanent_path.exists():
+                    copied.append(permanent_path)
+                shutil.copy(gb_file, permanent_path)
+                plasmids.append(Plasmid(
+                    identifier=clean_id,
+                    name=record.description[:200] if record.description else clean_id,
+                    type="Imported",
+                    sequence=record.sequence.upper(),
+                    length=record.length,
+                    description=description,
+                    collection=collection,
+                    file_path=str(permanent_path.relative_to(storage_root) if storage_root else permanent_path),
+                    is_public=False,
+                ))
+            Plasmid.objects.bulk_create(plasmids, batch_size=BULK_BATCH_SIZE)
+
+            annotations = [
+                PlasmidAnnotation(
+                    plasmid=plasmid,
+                    feature_type=feature.type,
+                    start=feature.start,
+                    end=feature.end,
+                    strand=feature.strand,
+                    label=feature.label[:200],
+                    qualifiers=feature.qualifiers,
+                )
+                for plasmid, (_, record, _) in zip(plasmids, parsed)
+                for feature in record.features
+                if feature.type != "source"
+            ]
+            PlasmidAnnotation.objects.bulk_create(annotations, batch_size=BULK_BATCH_SIZE)
+    except BaseException:
+        # Rolled back: no plasmid points to these copies
+        for path in copied:
+            path.unlink(missing_ok=True)
+        raise
+
+    return ImportResult(created=len(plasmids), skipped=0, errors=errors)
+
+
 def get_or_create_target_collection(*, owner, target_collection, new_collection_name: str):
     """
     Return a collection or None.
@@ -133,3 +255,143 @@ def get_or_create_target_collection(*, owner, target_collection, new_collection_
         name=name,
         is_public=False,
     )
+
+
+# =================================================================================
+# Collection export (GenBank files)
+
+# Threads used to write GenBank files: the work is I/O bound
+EXPORT_WORKERS = 8
+
+
+@dataclass
+class ExportResult:
+    written: int
+    copied: int
+    generated: int
+
+
+def plasmids_for_export(collections) -> List[Plasmid]:
+    """
+    Plasmids of the given collections, in collection order then by id.
+    Annotations are loaded with a single prefetch query.
+    """
+    collections = list(collections)
+    position = {c.id: i for i, c in enumerate(collections)}
+    plasmids = (
+        Plasmid.objects
+        .filter(collection_id__in=position)
+        .prefetch_related("annotations")
+        .order_by("id")
+    )
+    return sorted(plasmids, key=lambda p: position[p.collection_id])
+
+
+def genbank_basename(identifier: str) -> str:
+    """File name (without extension) for a plasmid identifier, without the '_xxxx' dedup suffix."""
+    clean_name = identifier or ""
+    if re.search(r"_[0-9a-f]{4}$", clean_name):
+        clean_name = clean_name[:-5]
+
+    safe_name = "".join([c for c in clean_name if c.isalnum() or c in (" ", ".", "_", "-")]).strip()
+    safe_name = safe_name.replace(" ", "_")
+    return safe_name or "plasmid"
+
+
+def resolve_genbank_file(plasmid: Plasmid) -> Optional[Path]:
+    """Path of the GenBank file stored for this plasmid, if it exists on disk."""
+    if not plasmid.file_path:
+        return None
+    path = Path(plasmid.file_path)
+    if path.is_absolute():
+        return path if path.is_file() else None
+    # Paths of imported files are relative to MEDIA_ROOT, older ones to BASE_DIR
+    for base in (settings.BASE_DIR, settings.MEDIA_ROOT):
+        candidate = Path(base) / plasmid.file_path
+        if candidate.is_file():
+            return candidate
+    return None
+
+
+def iter_genbank(plasmid: Plasmid, locus_name: str) -> Iterator[str]:
+    """
+    Render a minimal GenBank file from the database (sequence + annotations), chunk by chunk.
+    Uses plasmid.annotations.all(), so prefetched annotations do not hit the database.
+    """
+    raw_seq = "".join(plasmid.sequence.split()).lower() if plasmid.sequence else ""
+    length = len(raw_seq)
+
+    yield (
+        f"LOCUS       {locus_name[:16]:<16} {length:>10} bp    DNA     linear   UNK 01-JAN-1980\n"
+        f"DEFINITION  {plasmid.name}\n"
+        f"ACCESSION   {locus_name}\n"
+        f"VERSION     {locus_name}.1\n"
+        f"KEYWORDS    .\n"
+        f"SOURCE      .\n"
+        f"  ORGANISM  .\n"
+    )
+
+    yield "FEATURES             Location/Qualifiers\n"
+    annotations = sorted(plasmid.annotations.all(), key=lambda a: a.start)
+    if annotations:
+        for ann in annotations:
+            loc_str = f"{ann.start + 1}..{ann.end}"
+            if ann.strand == -1:
+                loc_str = f"complement({loc_str})"
+            ftype = ann.feature_type.strip() or "misc_feature"
+            label = ann.label or ftype
+            yield (
+                f"     {ftype:<16}{loc_str}\n"
+                f"                     /label=\"{label}\"\n"
+                f"                     /note=\"Imported from Collection\"\n"
+            )
+    else:
+        yield (
+            f"     misc_feature    1..{length}\n"
+            f"                     /label=\"{plasmid.name}\"\n"
+            f"                     /note=\"No annotations in DB\"\n"
+        )
+
+    yield f"ORIGIN\n        1 {raw_seq}\n//\n"
+
+
+def export_plasmids_to_dir(
+    plasmids: Iterable[Plasmid],
+    dest_dir,
+    *,
+    copy_file: Callable = shutil.copyfile,
+    max_workers: int = EXPORT_WORKERS,
+) -> ExportResult:
+    """
+    Write one '<genbank_basename>.gb' file per plasmid into dest_dir with copy_file(src, dest).
+    - src is the stored GenBank file when it exists
+    - otherwise the rendering from the database, taken from genbank_cache (rendered on a miss)
+    Files are written by a thread pool. When two plasmids map to the same file name, the last one wins.
+    """
+    dest_dir = Path(dest_dir)
+    dest_dir.mkdir(parents=True, exist_ok=True)
+
+    # One task per destination file (same rule as a serial loop: the last plasmid wins)
+    tasks = {}
+    for plasmid in plasmids:
+        name = genbank_basename(plasmid.identifier)
+        tasks[name] = plasmid
+
+    def _write(item):
+        name, plasmid = item
+        dest_path = dest_dir / f"{name}.gb"
+        src_path = resolve_genbank_file(plasmid)
+        if src_path is not None:
+            try:
+                copy_file(src_path, dest_path)
+                return "copied"
+            except OSError:
+                pass
+        copy_file(genbank_cache.cached_genbank(plasmid, name), dest_path)
+        return "generated"
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        outcomes = list(pool.map(_write, tasks.items()))
+
+    copied = outcomes.count("copied")
+    return ExportResult(written=len(outcomes), copied=copied, generated=len(outcomes) - copied)
@@ -0,0 +1,19 @@
+"""
+Signals for the Plasmids app.
+Function: Drop cached GenBank renderings when a plasmid or one of its annotations changes.
+"""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import genbank_cache
+from .models import Plasmid, PlasmidAnnotation
+
+
+@receiver([post_save, post_delete], sender=Plasmid)
+def invalidate_plasmid_genbank(sender, instance, **kwargs):
+    genbank_cache.invalidate(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=PlasmidAnnotation)
+def invalidate_annotation_genbank(sender, instance, **kwargs):
+    genbank_cache.invalidate(instance.plasmid_id)
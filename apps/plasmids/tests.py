@@ -1,3 +1,341 @@
-from django.test import TestCase
+import io
+import os
+import shutil
+import tempfile
+import zipfile
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import IntegrityError
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from apps.core.utils.hashing import file_sha256
+
+from . import genbank_cache, parse_cache, parsing
+from .models import Plasmid, PlasmidAnnotation, PlasmidCollection
+from .parsing import parse_genbank_contents, parse_genbank_files
+from .service import bulk_import_genbank_files, export_plasmids_to_dir, plasmids_for_export
+
+User = get_user_model()
+
+
+class CollectionTestCase(TestCase):
+    """One collection with a plasmid stored on disk and three plasmids only in the database."""
+
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.tmp, ignore_errors=True)
+        media_override = override_settings(
+            MEDIA_ROOT=str(self.tmp / "media"), GENBANK_PARSE_CACHE_DIR=str(self.tmp / "parse_cache")
+        )
+        media_override.enable()
+        self.addCleanup(media_override.disable)
+
+        self.user = User.objects.create_user(email="owner@example.com", password="pass")
+        self.collection = PlasmidCollection.objects.create(name="Kit", owner=self.user)
+
+        stored = self.tmp / "stored.gb"
+        stored.write_text("LOCUS       pSTORED\n//\n")
+        Plasmid.objects.create(
+            identifier="pSTORED", name="stored", type="1", sequence="ATGC", length=4,
+            collection=self.collection, file_path=str(stored),
+        )
+        for i in range(3):
+            plasmid = Plasmid.objects.create(
+                identifier=f"pGEN{i}_ab12", name=f"generated {i}", type="1", sequence="ATGCATGC", length=8,
+                collection=self.collection,
+            )
+            PlasmidAnnotation.objects.create(plasmid=plasmid, feature_type="CDS", start=0, end=6, strand=-1, label="gfp")
+
+
+class CollectionExportTests(CollectionTestCase):
+    def test_plasmids_are_loaded_with_two_queries(self):
+        with self.assertNumQueries(2):
+            plasmids = plasmids_for_export([self.collection])
+            for plasmid in plasmids:
+                list(plasmid.annotations.all())
+        self.assertEqual(len(plasmids), 4)
+
+    def test_export_copies_stored_files_and_generates_the_others(self):
+        dest = self.tmp / "out"
+
+        result = export_plasmids_to_dir(plasmids_for_export([self.collection]), dest)
+
+        self.assertEqual((result.written, result.copied, result.generated), (4, 1, 3))
+        self.assertEqual((dest / "pSTORED.gb").read_text(), "LOCUS       pSTORED\n//\n")
+        generated = (dest / "pGEN0.gb").read_text()
+        self.assertIn("     CDS             complement(1..6)\n", generated)
+        self.assertIn('/label="gfp"', generated)
+        self.assertTrue(generated.endswith("ORIGIN\n        1 atgcatgc\n//\n"))
+
+    def test_zip_export_includes_plasmids_without_file(self):
+        self.client.force_login(self.user)
+
+        response = self.client.get(reverse("plasmids:collection_export", args=[self.collection.pk]))
+
+        archive = zipfile.ZipFile(io.BytesIO(response.content))
+        self.assertEqual(
+            sorted(archive.namelist()),
+            ["README.txt", "pGEN0_ab12.gb", "pGEN1_ab12.gb", "pGEN2_ab12.gb", "pSTORED.gb"],
+        )
+
+
+class GenbankCacheTests(CollectionTestCase):
+    def cached_files(self, plasmid):
+        return list((genbank_cache.get_cache_dir() / str(plasmid.pk)).glob("*.gb"))
+
+    def test_rendering_is_reused_between_exports(self):
+        plasmid = Plasmid.objects.get(identifier="pGEN0_ab12")
+        export_plasmids_to_dir(plasmids_for_export([self.collection]), self.tmp / "run1")
+        cached = self.cached_files(plasmid)
+        self.assertEqual(len(cached), 1)
+        mtime = cached[0].stat().st_mtime_ns
+
+        export_plasmids_to_dir(plasmids_for_export([self.collection]), self.tmp / "run2")
+
+        self.assertEqual(self.cached_files(plasmid), cached)
+        self.assertEqual(cached[0].stat().st_mtime_ns, mtime)
+
+    def test_annotation_change_invalidates_rendering(self):
+        plasmid = Plasmid.objects.get(identifier="pGEN0_ab12")
+        export_plasmids_to_dir(plasmids_for_export([self.collection]), self.tmp / "run1")
+
+        annotation = plasmid.annotations.get()
+        annotation.label = "rfp"
+        annotation.save()
+        self.assertEqual(self.cached_files(plasmid), [])
+
+        export_plasmids_to_dir(plasmids_for_export([self.collection]), self.tmp / "run2")
+        self.assertIn('/label="rfp"', (self.tmp / "run2" / "pGEN0.gb").read_text())
+
+    def test_sequence_change_changes_version(self):
+        plasmid = plasmids_for_export([self.collection])[1]
+        before = genbank_cache.content_version(plasmid, "pGEN0")
+
+        plasmid.sequence = "GGGG"
+
+        self.assertNotEqual(genbank_cache.content_version(plasmid, "pGEN0"), before)
+
+
+def write_gb(path, identifier):
+    path.write_text(
+        f"LOCUS       {identifier:<16}{8:>12} bp    DNA     circular UNK 01-JAN-1980\n"
+        f"DEFINITION  {identifier} part.\n"
+        f"ACCESSION   {identifier}\n"
+        "FEATURES             Location/Qualifiers\n"
+        "     CDS             1..6\n"
+        "                     /gene=\"gfp\"\n"
+        "ORIGIN\n"
+        "        1 atgcatgc\n"
+        "//\n"
+    )
+    return path
+
+
+class BulkImportTests(TestCase):
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.tmp, ignore_errors=True)
+        self.collection = PlasmidCollection.objects.create(name="Imported")
+        self.sources = self.tmp / "sources"
+        self.sources.mkdir()
+        media_override = override_settings(
+            MEDIA_ROOT=str(self.tmp / "media"), GENBANK_PARSE_CACHE_DIR=str(self.tmp / "parse_cache")
+        )
+        media_override.enable()
+        self.addCleanup(media_override.disable)
+
+    def write_gb(self, filename, identifier):
+        return write_gb(self.sources / filename, identifier)
+
+    def test_identifier_collisions_are_resolved_in_bulk(self):
+        other = PlasmidCollection.objects.create(name="Existing")
+        Plasmid.objects.create(identifier="pA", name="a", type="1", sequence="A", length=1, collection=other)
+        files = [self.write_gb("a.gb", "pA"), self.write_gb("b.gb", "pB"), self.write_gb("b2.gb", "pB")]
+        (self.sources / "broken.gb").write_text("not genbank")
+        files.append(self.sources / "broken.gb")
+
+        # Collisions vérifiées par lot : 2 SELECT (candidats, puis suffixes) + 2 INSERT + savepoint
+        with self.assertNumQueries(6):
+            result = bulk_import_genbank_files(files, collection=self.collection, storage_dir=self.tmp / "store")
+
+        self.assertEqual(result.created, 3)
+        self.assertEqual(len(result.errors), 1)
+        identifiers = sorted(self.collection.plasmids.values_list("identifier", flat=True))
+        self.assertRegex(identifiers[0], r"^pA_[0-9a-f]{4}$")
+        self.assertIn("pB", identifiers)
+        self.assertEqual(len(set(identifiers)), 3)
+        self.assertEqual(PlasmidAnnotation.objects.filter(plasmid__collection=self.collection, label="gfp").count(), 3)
+
+    def test_file_path_is_relative_to_storage_root(self):
+        result = bulk_import_genbank_files(
+            [self.write_gb("a.gb", "pA")],
+            collection=self.collection,
+            storage_dir=self.tmp / "store" / "user_1",
+            storage_root=self.tmp / "store",
+        )
+
+        plasmid = self.collection.plasmids.get()
+        self.assertEqual(result.created, 1)
+        self.assertEqual(plasmid.file_path, "user_1/pA_a.gb")
+        self.assertTrue((self.tmp / "store" / plasmid.file_path).is_file())
+
+    def test_rolled_back_import_leaves_no_copied_files(self):
+        files = [self.write_gb("a.gb", "pA"), self.write_gb("b.gb", "pB")]
+
+        with mock.patch.object(PlasmidAnnotation.objects, "bulk_create", side_effect=IntegrityError("boom")):
+            with self.assertRaises(IntegrityError):
+                bulk_import_genbank_files(files, collection=self.collection, storage_dir=self.tmp / "store")
+
+        self.assertFalse(self.collection.plasmids.exists())
+        self.assertEqual(list((self.tmp / "store").iterdir()), [])
+
+
+class GenbankParsingTests(TestCase):
+    """The process pool returns the same summaries as in-process parsing, in input order."""
+
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.tmp, ignore_errors=True)
+        self.sources = self.tmp / "sources"
+        self.sources.mkdir()
+        media_override = override_settings(
+            MEDIA_ROOT=str(self.tmp / "media"), GENBANK_PARSE_CACHE_DIR=str(self.tmp / "parse_cache")
+        )
+        media_override.enable()
+        self.addCleanup(media_override.disable)
+
+    def write_gb(self, filename, identifier):
+        return write_gb(self.sources / filename, identifier)
+
+    def parse(self, files, **kwargs):
+        return [(p.error is None, [(r.id, r.sequence, [(f.type, f.label, f.strand) for f in r.features]) for r in p.records])
+                for p in parse_genbank_files(files, **kwargs)]
+
+    def test_pool_matches_in_process_parsing(self):
+        files = [self.write_gb(f"p{i}.gb", f"pP{i}") for i in range(6)]
+        (self.sources / "broken.gb").write_text("LOCUS       broken\nFEATURES             Location/Qualifiers\n")
+        files.insert(2, self.sources / "broken.gb")
+
+        with override_settings(GENBANK_PARSE_CACHE_ENABLED=False):
+            serial = self.parse(files, max_workers=1)
+            with override_settings(GENBANK_PARSE_PARALLEL_MIN_BYTES=0):
+                pooled = self.parse(files, max_workers=2)
+
+        self.assertEqual(serial, pooled)
+        self.assertEqual(serial[2], (False, []))
+        self.assertEqual(serial[0][1], [("pP0", "ATGCATGC", [("CDS", "gfp", 1)])])
+
+    def test_small_inputs_stay_in_process(self):
+        files = [self.write_gb("a.gb", "pA"), self.write_gb("b.gb", "pB")]
+
+        with mock.patch("apps.plasmids.parsing.ProcessPoolExecutor") as pool:
+            parse_genbank_files(files, max_workers=4)
+
+        pool.assert_not_called()
+
+    def test_import_command_uses_normalized_features(self):
+        self.write_gb("a.gb", "pA")
+
+        call_command("import_genbank", str(self.sources), collection="Command", stdout=io.StringIO())
+
+        annotation = PlasmidAnnotation.objects.get(plasmid__identifier="a")
+        self.assertEqual((annotation.feature_type, annotation.label, annotation.strand), ("CDS", "gfp", 1))
+
+
+    def test_import_command_labels_from_label_or_gene_only(self):
+        (self.sources / "a.gb").write_text(
+            "LOCUS       pA                 8 bp    DNA     circular UNK 01-JAN-1980\n"
+            "FEATURES             Location/Qualifiers\n"
+            "     promoter        1..3\n"
+            "                     /note=\"described by a note\"\n"
+            "     CDS             4..8\n"
+            f"                     /label=\"{'x' * 250}\"\n"
+            "ORIGIN\n"
+            "        1 atgcatgc\n"
+            "//\n"
+        )
+
+        call_command("import_genbank", str(self.sources), collection="Command", stdout=io.StringIO())
+
+        labels = dict(PlasmidAnnotation.objects.values_list("feature_type", "label"))
+        self.assertEqual(labels, {"promoter": "", "CDS": "x" * 200})
+
+class ParseCacheTests(TestCase):
+    """Parsed files are reused by content; SeqIO only sees inputs never parsed before."""
+
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.tmp, ignore_errors=True)
+        media_override = override_settings(
+            MEDIA_ROOT=str(self.tmp / "media"), GENBANK_PARSE_CACHE_DIR=str(self.tmp / "parse_cache")
+        )
+        media_override.enable()
+        self.addCleanup(media_override.disable)
+
+    def test_unchanged_content_is_not_parsed_again(self):
+        first = write_gb(self.tmp / "a.gb", "pA")
+        parse_genbank_files([first])
+        # Same bytes under another name or uploaded: served from the cache, with the caller's source
+        copy = self.tmp / "copy.gb"
+        shutil.copyfile(first, copy)
+
+        with mock.patch("apps.plasmids.parsing.SeqIO.parse") as seqio_parse:
+            [from_file] = parse_genbank_files([copy])
+            [from_upload] = parse_genbank_contents([("upload.gb", first.read_bytes())])
+
+        seqio_parse.assert_not_called()
+        self.assertEqual(from_file.source, str(copy))
+        self.assertEqual(from_upload.source, "upload.gb")
+        self.assertEqual([r.id for r in from_file.records], ["pA"])
+        self.assertEqual(from_upload.records[0].features[0].label, "gfp")
+        self.assertEqual(parse_cache.stats()["hits"], 2)
+        self.assertEqual(parse_cache.stats()["misses"], 1)
+
+    def test_changed_content_and_errors(self):
+        path = write_gb(self.tmp / "a.gb", "pA")
+        parse_genbank_files([path], first_only=True)
+        write_gb(path, "pB")
+        broken = self.tmp / "broken.gb"
+        broken.write_text("LOCUS       broken\nFEATURES             Location/Qualifiers\n")
+
+        [changed, error] = parse_genbank_files([path, broken], first_only=True)
+        [cached_error] = parse_genbank_files([broken], first_only=True)
+
+        self.assertEqual(changed.records[0].id, "pB")
+        self.assertIsNotNone(error.error)
+        self.assertEqual(cached_error.error, error.error)
+        self.assertEqual(parse_cache.stats()["misses"], 3)
+
+    def test_entries_are_stored_outside_media_root(self):
+        parse_genbank_files([write_gb(self.tmp / "a.gb", "pA")])
+
+        self.assertEqual(len(list((self.tmp / "parse_cache").rglob(f"*{parse_cache.ENTRY_SUFFIX}"))), 1)
+        self.assertFalse((self.tmp / "media").exists())
+
+    def test_missing_files_are_not_cached(self):
+        [missing] = parse_genbank_files([self.tmp / "missing.gb"])
+
+        self.assertIsNotNone(missing.error)
+        self.assertEqual(parse_cache.stats()["entries"], 0)
+
+    def test_least_recently_used_entries_are_evicted(self):
+        files = [write_gb(self.tmp / f"p{i}.gb", f"pP{i}") for i in range(3)]
+        parse_genbank_files(files[:2])
+        entry_size = parse_cache.stats()["bytes"] / 2
+        for mtime, path in enumerate(files[:2], start=1):
+            entry = parse_cache._entry_path(file_sha256(path), parse_cache.MODE_ALL)
+            os.utime(entry, (mtime, mtime))
+
+        with override_settings(GENBANK_PARSE_CACHE_MAX_BYTES=int(entry_size * 2.5)):
+            # The hit makes p0 the most recent entry: storing p2 evicts p1
+            parse_genbank_files(files[:1])
+            parse_genbank_files(files[2:])
+
+        self.assertEqual(parse_cache.stats()["entries"], 2)
+        with mock.patch("apps.plasmids.parsing._summarize", wraps=parsing._summarize) as summarize:
+            parse_genbank_files(files)
+        self.assertEqual([call.args[0] for call in summarize.call_args_list], [str(files[1])])
@@ -20,8 +20,16 @@ from apps.correspondences import forms
 from apps.accounts.models import Team
 
 from .forms import PlasmidSearchForm,AddPlasmidsToCollectionForm, ImportPlasmidsForm, PlasmidCollectionForm
+from . import genbank_cache
 from .models import PlasmidCollection, Plasmid
-from .service import import_plasmids_from_upload, get_or_create_target_collection
+from .service import (
+    import_plasmids_from_upload,
+    get_or_create_target_collection,
+    genbank_basename,
+    plasmids_for_export,
+    resolve_genbank_file,
+)
+from apps.core.utils.layout import assign_label_levels
 
 from django.db.models import Q
 
@@ -292,44 +300,8 @@ def plasmid_detail(request, id):
     features_above = [f for f in parsed["features"] if f.get("label_position") == "outside" and f.get("label_side") == "above"]
     features_below = [f for f in parsed["features"] if f.get("label_position") == "outside" and f.get("label_side") == "below"]
     
-    def detect_overlaps_and_adjust(features_list):
-        """Détecte les chevauchements et ajuste les niveaux (jusqu'à 3 niveaux)"""
-        # Trier par position
-        features_sorted = sorted(features_list, key=lambda f: f["visual_center"])
-        
-        for current_feature in features_sorted:
-            # Trouver le niveau approprié en testant les chevauchements à chaque niveau
-            current_feature["label_level"] = 0
-            
-            for test_level in range(3):  # Tester les niveaux 0, 1, 2
-                has_overlap = False
-                
-                # Vérifier si ce niveau est libre (pas de chevauchement avec d'autres features au même niveau)
-                for other_feature in features_sorted:
-                    if other_feature == current_feature:
-                        continue
-                    
-                    if other_feature["label_level"] != test_level:
-                        continue
-                    
-                    # Calculer les positions horizontales des labels
-                    current_left = current_feature["visual_center"] - current_feature["label_text_width"] / 2
-                    current_right = current_feature["visual_center"] + current_feature["label_text_width"] / 2
-                    other_left = other_feature["visual_center"] - other_feature["label_text_width"] / 2
-                    other_right = other_feature["visual_center"] + other_feature["label_text_width"] / 2
-                    
-                    # Vérifier le chevauchement (avec une marge de 5px)
-                    if not (current_right + 5 < other_left or other_right + 5 < current_left):
-                        has_overlap = True
-                        break
-                
-                # Si pas de chevauchement à ce niveau, on l'assigne
-                if not has_overlap:
-                    current_feature["label_level"] = test_level
-                    break
-    
-    detect_overlaps_and_adjust(features_above)
-    detect_overlaps_and_adjust(features_below)
+    assign_label_levels(features_above)
+    assign_label_levels(features_below)
 
     context = {
         "plasmid": plasmid,
@@ -537,13 +509,12 @@ def collection_export_gb_zip(request, pk: int):
     if not collection.is_public and collection.owner_id != request.user.id:
         raise Http404("No permission")
 
-    plasmids = collection.plasmids.all()
-    if not plasmids.exists():
+    # Same loading as the simulation inputs: one query for plasmids, one for annotations
+    plasmids = plasmids_for_export([collection])
+    if not plasmids:
         raise Http404("Empty collection")
 
     buffer = BytesIO()
-    missing = 0
-    added = 0
 
     # Contents of .zip file about to be exported
     with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_DEFLATED) as zf:
@@ -551,29 +522,18 @@ def collection_export_gb_zip(request, pk: int):
             "README.txt",
             f"Exported collection: {collection.name}\n"
             f"Format: GenBank (.gb)\n"
-            f"Note: files are read from plasmid.file_path on disk.\n"
+            f"Note: files are read from plasmid.file_path on disk; "
+            f"plasmids without a stored file are rebuilt from their sequence and annotations.\n"
         )
 
         for p in plasmids:
-            fp = getattr(p, "file_path", None)
-            if not fp:
-                missing += 1
-                continue
-
-            path = Path(fp)
-            if not path.exists() or not path.is_file():
-                missing += 1
-                continue
-
-            base = safe_filename(p.identifier or p.name or path.stem)
+            path = resolve_genbank_file(p)
+            base = safe_filename(p.identifier or p.name or (path.stem if path else ""))
             arcname = f"{base}.gb"
 
-            with open(path, "rb") as f:
-                zf.writestr(arcname, f.read())
-                added += 1
-
-    if added == 0:
-        raise Http404("No GenBank files available to export (missing file_path or files not found on disk).")
+            if path is None:
+                path = genbank_cache.cached_genbank(p, genbank_basename(p.identifier))
+            zf.write(path, arcname)
 
     buffer.seek(0)
     zip_name = safe_filename(collection.name, default=f"collection_{collection.id}")
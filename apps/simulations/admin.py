@@ -1,3 +1,64 @@
+from django.conf import settings
 from django.contrib import admin
 
-# Register your models here.
+from . import deletion
+from .models import Campaign, SimulationBatch, SimulationJob
+
+
+@admin.register(SimulationJob)
+class SimulationJobAdmin(admin.ModelAdmin):
+    list_display = ("id", "run_id", "owner", "batch", "status", "termination_reason", "created_at", "started_at", "finished_at")
+    list_filter = ("status", "termination_reason", "cancel_requested")
+    search_fields = ("run_id", "owner__email")
+    readonly_fields = ("created_at", "started_at", "finished_at")
+
+
+@admin.register(SimulationBatch)
+class SimulationBatchAdmin(admin.ModelAdmin):
+    list_display = ("id", "batch_id", "name", "owner", "created_at")
+    search_fields = ("batch_id", "name", "owner__email")
+    readonly_fields = ("created_at",)
+
+
+class DeletionStatusFilter(admin.SimpleListFilter):
+    title = "deletion"
+    parameter_name = "deletion"
+
+    def lookups(self, request, model_admin):
+        return (("pending", "Pending"), ("failed", "Failed"))
+
+    def queryset(self, request, queryset):
+        if self.value() == "pending":
+            return queryset.pending_deletion().filter(deletion_attempts__lt=settings.SIMULATION_DELETION_MAX_ATTEMPTS)
+        if self.value() == "failed":
+            return queryset.filter(pk__in=deletion.failed_deletions())
+        return queryset
+
+
+@admin.register(Campaign)
+class CampaignAdmin(admin.ModelAdmin):
+    list_display = ("id", "name", "owner", "run_id", "created_at", "deletion_status", "deletion_attempts")
+    list_filter = (DeletionStatusFilter,)
+    search_fields = ("run_id", "name", "owner__email")
+    readonly_fields = ("created_at", "deletion_requested_at", "deletion_attempts", "deletion_error", "deletion_retry_at")
+    actions = ("schedule_deletion", "retry_deletion")
+
+    @admin.display(description="Deletion")
+    def deletion_status(self, obj):
+        if not obj.deletion_requested_at:
+            return ""
+        if obj.deletion_attempts >= settings.SIMULATION_DELETION_MAX_ATTEMPTS:
+            return f"Failed: {obj.deletion_error}"
+        if obj.deletion_error:
+            return f"Retrying ({obj.deletion_error})"
+        return "Pending"
+
+    @admin.action(description="Delete selected campaigns and their files (in the background)")
+    def schedule_deletion(self, request, queryset):
+        count = deletion.request_deletion(queryset)
+        self.message_user(request, f"{count} campaign(s) scheduled for deletion.")
+
+    @admin.action(description="Retry deletion of selected campaigns")
+    def retry_deletion(self, request, queryset):
+        count = deletion.retry(queryset)
+        self.message_user(request, f"{count} deletion(s) queued again.")
@@ -0,0 +1,236 @@
+"""
+Archives zip : résultats construits à la volée, séquences extraites sous contrôle.
+
+Plutôt que de précalculer ``tout_telecharger.zip`` à la fin de chaque run
+(double empreinte disque, temps d'archivage sur le chemin critique),
+``stream_zip`` écrit l'archive morceau par morceau dans la réponse HTTP :
+la mémoire utilisée est bornée par ``CHUNK_SIZE``, quel que soit le volume.
+
+À l'inverse, ``extract_sequences`` remplace ``ZipFile.extractall`` pour les
+archives de séquences envoyées par les utilisateurs : seuls les fichiers
+GenBank sont écrits (ni ``__MACOSX/``, ni fichiers cachés, ni autres
+formats), chaque membre est décompressé par morceaux en vérifiant son
+en-tête ``LOCUS`` et les tailles réellement écrites sont bornées par fichier
+et au total (``settings.SIMULATION_ARCHIVE_MAX_*``) : une bombe zip est
+arrêtée avant d'avoir rempli le disque.
+"""
+import dataclasses
+import pathlib
+import zipfile
+
+from django.conf import settings
+from django.template.defaultfilters import filesizeformat
+
+CHUNK_SIZE = 1024 * 1024
+
+# Sous-ensembles téléchargeables (paramètre ``kind``)
+KIND_EXTENSIONS = {
+    'gb': {'.gb', '.gbk', '.genbank'},
+    'tables': {'.csv', '.tsv', '.xlsx', '.xls', '.txt'},
+    'images': {'.svg', '.png', '.jpg', '.jpeg'},
+}
+
+
+# ==========================================
+# 1. ARCHIVES DES RÉSULTATS
+# ==========================================
+
+def select_result_files(output_dir, kind=None, names=None):
+    """
+    Fichiers de ``output_dir`` à archiver, triés par nom.
+    ``kind`` restreint à une famille (voir KIND_EXTENSIONS), ``names`` à une liste explicite.
+    """
+    output_dir = pathlib.Path(output_dir)
+    if kind and kind not in KIND_EXTENSIONS:
+        raise ValueError(f"Unknown file kind: {kind}")
+    wanted = set(names) if names else None
+
+    files = []
+    for path in sorted(output_dir.iterdir()):
+        if not path.is_file():
+            continue
+        if kind and path.suffix.lower() not in KIND_EXTENSIONS[kind]:
+            continue
+        if wanted is not None and path.name not in wanted:
+            continue
+        files.append(path)
+    return files
+
+
+class _ZipBuffer:
+    """Flux non "seekable" : zipfile y écrit, le générateur vide les morceaux accumulés."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def stream_zip(files, root=None, compression=zipfile.ZIP_DEFLATED):
+    """
+    Générateur d'octets d'une archive zip contenant ``files``.
+    Les noms dans l'archive sont relatifs à ``root`` (sinon le nom du fichier).
+    """
+    buffer = _ZipBuffer()
+    with zipfile.ZipFile(buffer, 'w', compression=compression) as archive:
+        for path in files:
+            path = pathlib.Path(path)
+            arcname = str(path.relative_to(root)) if root else path.name
+            info = zipfile.ZipInfo.from_file(path, arcname)
+            info.compress_type = compression
+            with open(path, 'rb') as src, archive.open(info, 'w') as dest:
+                while True:
+                    chunk = src.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    dest.write(chunk)
+                    data = buffer.drain()
+                    if data:
+                        yield data
+            data = buffer.drain()
+            if data:
+                yield data
+    # Répertoire central, écrit à la fermeture
+    data = buffer.drain()
+    if data:
+        yield data
+
+
+# ==========================================
+# 2. EXTRACTION DES ARCHIVES DE SÉQUENCES
+# ==========================================
+
+# Seule extension lue par compute_all (glob '**/*.gb')
+SEQUENCE_SUFFIX = '.gb'
+GENBANK_HEADER = b'LOCUS'
+
+
+class ArchiveError(Exception):
+    """Archive de séquences refusée (message présentable à l'utilisateur)."""
+
+
+@dataclasses.dataclass
+class ExtractionResult:
+    files: int = 0
+    bytes_written: int = 0
+    skipped: int = 0
+
+
+def member_path(info):
+    """
+    Chemin relatif où extraire un membre de l'archive, ou None s'il est ignoré
+    (dossier, autre format, fichier caché, ``__MACOSX``). L'arborescence de
+    l'archive est conservée, sans composant absolu ni ``..``.
+    """
+    if info.is_dir():
+        return None
+    parts = [
+        part for part in pathlib.PurePosixPath(info.filename.replace('\\', '/')).parts
+        if part not in ('', '/', '.', '..')
+    ]
+    if not parts or not parts[-1].endswith(SEQUENCE_SUFFIX):
+        return None
+    if any(part.startswith('.') or part == '__MACOSX' for part in parts):
+        return None
+    return pathlib.PurePosixPath(*parts)
+
+
+def sequence_members(archive):
+    """Couples (membre, chemin relatif) des fichiers GenBank d'une ``zipfile.ZipFile`` ouverte."""
+    members = []
+    for info in archive.infolist():
+        path = member_path(info)
+        if path is not None:
+            members.append((info, path))
+    return members
+
+
+def _limits():
+    return (
+        getattr(settings, 'SIMULATION_ARCHIVE_MAX_FILE_BYTES', None),
+        getattr(settings, 'SIMULATION_ARCHIVE_MAX_BYTES', None),
+    )
+
+
+def extract_sequences(path_zip, dest_dir, *, max_file_bytes=None, max_total_bytes=None):
+    """
+    Extrait les fichiers GenBank de ``path_zip`` dans ``dest_dir``.
+    Lève ArchiveError (et supprime les fichiers déjà écrits) si une limite est
+    dépassée ou si un membre n'est pas un GenBank. Renvoie un ExtractionResult.
+    """
+    default_file, default_total = _limits()
+    max_file_bytes = max_file_bytes or default_file
+    max_total_bytes = max_total_bytes or default_total
+    dest_dir = pathlib.Path(dest_dir)
+    result = ExtractionResult()
+    written = []
+
+    try:
+        archive = zipfile.ZipFile(path_zip)
+    except zipfile.BadZipFile:
+        raise ArchiveError(f"'{pathlib.Path(path_zip).name}' is not a valid zip archive.")
+
+    try:
+        with archive:
+            members = sequence_members(archive)
+            result.skipped = sum(1 for info in archive.infolist() if not info.is_dir()) - len(members)
+
+            # Refus immédiat d'après les tailles annoncées ; les octets réellement écrits sont recomptés
+            declared = sum(info.file_size for info, _ in members)
+            if max_total_bytes and declared > max_total_bytes:
+                raise ArchiveError(_total_message(max_total_bytes))
+
+            for info, rel_path in members:
+                if max_file_bytes and info.file_size > max_file_bytes:
+                    raise ArchiveError(_file_message(rel_path, max_file_bytes))
+                target = dest_dir / rel_path
+                target.parent.mkdir(parents=True, exist_ok=True)
+                written.append(target)
+                size = 0
+                with archive.open(info) as src, open(target, 'wb') as dest:
+                    first = True
+                    while True:
+                        chunk = src.read(CHUNK_SIZE)
+                        if not chunk:
+                            break
+                        if first and not chunk.lstrip().startswith(GENBANK_HEADER):
+                            raise ArchiveError(
+                                f"'{rel_path}' is not a GenBank file (it should start with a LOCUS line)."
+                            )
+                        first = False
+                        size += len(chunk)
+                        if max_file_bytes and size > max_file_bytes:
+                            raise ArchiveError(_file_message(rel_path, max_file_bytes))
+                        if max_total_bytes and result.bytes_written + size > max_total_bytes:
+                            raise ArchiveError(_total_message(max_total_bytes))
+                        dest.write(chunk)
+                if size == 0:
+                    raise ArchiveError(f"'{rel_path}' is empty.")
+                result.files += 1
+                result.bytes_written += size
+    except Exception as e:
+        # Archive refusée ou corrompue : aucun fichier partiel ne reste dans le run
+        for path in written:
+            path.unlink(missing_ok=True)
+        if isinstance(e, ArchiveError):
+            raise
+        raise ArchiveError(f"'{pathlib.Path(path_zip).name}' could not be extracted: {e}")
+    return result
+
+
+def _file_message(rel_path, limit):
+    return f"'{rel_path}' is larger than {filesizeformat(limit)} once extracted."
+
+
+def _total_message(limit):
+    return f"The sequences archive is larger than {filesizeformat(limit)} once extracted."
@@ -0,0 +1,149 @@
+"""
+Soumission d'un lot de templates contre un jeu d'entrées partagé.
+
+Le dossier ``MEDIA_ROOT/simulation_batches/<batch_id>/`` reçoit une seule fois
+les entrées communes (table de correspondance, primers, concentrations, archive
+de séquences extraite ou collections exportées) et les templates du lot. Chaque
+template devient ensuite un run ordinaire (``MEDIA_ROOT/simulations/<run_id>/``)
+dont les fichiers sont des liens durs vers ceux du lot (``blobs.share_file``) :
+ni réextraction, ni réexport, ni rehachage par template. Le dossier du lot est
+supprimé une fois les jobs créés ; les runs restent autonomes (manifeste,
+rerun, cache).
+"""
+import pathlib
+import shutil
+import zipfile
+
+from django.conf import settings
+
+from . import blobs, manifest, preflight
+from .jobs import get_run_dir
+
+TEMPLATE_SUFFIXES = ('.xlsx',)
+# Entrées partagées copiées dans chaque run, dans leur sous-dossier habituel
+SHARED_ROLES = ('correspondence', 'primers', 'concentrations')
+
+
+class BatchError(Exception):
+    """Lot de templates invalide (message présentable à l'utilisateur)."""
+
+
+def get_batch_dir(batch_id):
+    return pathlib.Path(settings.MEDIA_ROOT) / 'simulation_batches' / batch_id
+
+
+# ==========================================
+# 1. TEMPLATES DU LOT
+# ==========================================
+
+def _is_template_entry(info):
+    name = pathlib.PurePosixPath(info.filename)
+    return (
+        not info.is_dir()
+        and name.suffix.lower() in TEMPLATE_SUFFIXES
+        and not name.name.startswith(('.', '~$'))
+        and '__MACOSX' not in name.parts
+    )
+
+
+def collect_templates(uploaded_files, archive, dest_dir, *, max_templates):
+    """
+    Enregistre dans ``dest_dir`` les templates envoyés un par un et ceux d'une
+    archive zip (``archive`` : fichier uploadé ou None). Renvoie leurs chemins,
+    dans l'ordre d'envoi puis dans celui de l'archive.
+    """
+    dest_dir = pathlib.Path(dest_dir)
+    dest_dir.mkdir(parents=True, exist_ok=True)
+    entries = []
+
+    for uploaded in uploaded_files:
+        if pathlib.Path(uploaded.name).suffix.lower() not in TEMPLATE_SUFFIXES:
+            raise BatchError(f"'{uploaded.name}' is not an Excel template (.xlsx).")
+        entries.append((pathlib.Path(uploaded.name).name, uploaded.chunks))
+
+    zip_file = None
+    if archive:
+        try:
+            zip_file = zipfile.ZipFile(archive)
+        except zipfile.BadZipFile:
+            raise BatchError(f"'{archive.name}' is not a valid zip archive.")
+        for info in zip_file.infolist():
+            if _is_template_entry(info):
+                entries.append((pathlib.PurePosixPath(info.filename).name, info))
+
+    if len(entries) > max_templates:
+        raise BatchError(f"Too many templates: {len(entries)} (at most {max_templates} per batch).")
+    names = [name for name, _ in entries]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        raise BatchError(f"Several templates are named {', '.join(duplicates)}; template names must be unique.")
+
+    paths = []
+    try:
+        for name, source in entries:
+            path = dest_dir / name
+            with open(path, 'wb') as out:
+                if isinstance(source, zipfile.ZipInfo):
+                    with zip_file.open(source) as stream:
+                        shutil.copyfileobj(stream, out)
+                else:
+                    for chunk in source():
+                        out.write(chunk)
+            paths.append(path)
+    finally:
+        if zip_file is not None:
+            zip_file.close()
+    return paths
+
+
+def check_templates(templates, path_mapping, available_names):
+    """
+    Vérification préalable de chaque template ; lève PreflightError avec les problèmes de tous les templates.
+    Renvoie le rapport combiné (avec les parts ambiguës, non bloquantes).
+    """
+    combined = preflight.PreflightReport()
+    for template in templates:
+        report = preflight.check_inputs(template, path_mapping, available_names)
+        combined.plasmids += report.plasmids
+        combined.errors += [f"{template.name}: {problem}" for problem in report.problems()]
+        combined.ambiguous += report.ambiguous
+    if not combined.ok:
+        raise preflight.PreflightError(combined)
+    return combined
+
+
+# ==========================================
+# 2. RUNS DU LOT
+# ==========================================
+
+def prepare_run(run_id, template, shared, digests=None):
+    """
+    Crée le dossier du run ``run_id`` : son template puis des liens vers les
+    entrées partagées du lot. ``shared`` associe un rôle ('correspondence',
+    'primers', 'concentrations', 'archive') à un fichier du dossier du lot et
+    'sequences' au dossier des séquences. Renvoie les chemins du run par rôle.
+    """
+    work_dir = get_run_dir(run_id)
+    (work_dir / 'template').mkdir(parents=True)
+    paths = {'template': work_dir / 'template' / template.name}
+    blobs.share_file(template, paths['template'])
+
+    for role in SHARED_ROLES:
+        src = shared.get(role)
+        if not src:
+            continue
+        (work_dir / role).mkdir()
+        paths[role] = work_dir / role / src.name
+        # Le fichier de concentrations est réécrit par compute_all : chaque run a sa copie
+        if role == 'concentrations':
+            shutil.copy(src, paths[role])
+        else:
+            blobs.share_file(src, paths[role])
+
+    if shared.get('archive'):
+        paths['archive'] = work_dir / shared['archive'].name
+        blobs.share_file(shared['archive'], paths['archive'])
+
+    blobs.share_tree(shared['sequences'], work_dir / 'sequences')
+    manifest.write_manifest(work_dir, paths, digests=digests)
+    return paths
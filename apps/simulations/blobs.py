@@ -0,0 +1,206 @@
+"""
+Stockage dédupliqué des fichiers d'entrée des simulations.
+
+Chaque fichier (séquences .gb, archives, templates...) est rangé une seule fois
+sous ``MEDIA_ROOT/blobs/<2 premiers caractères>/<sha256><extension>`` ; les
+dossiers de run n'en contiennent que des liens durs. Une centaine de pièces pYTK
+partagées par tous les runs n'occupent donc qu'une seule fois le disque.
+
+Le compteur de références est le nombre de liens durs du blob (``st_nlink``) :
+un blob qui n'a plus qu'un lien n'est référencé par aucun run et peut être
+supprimé par ``collect_garbage``. Le délai de grâce part de la création du
+blob (``st_mtime``, fixé au stockage) : ``st_ctime`` change à chaque lien
+créé ou supprimé, il repousserait la collecte d'un blob qu'on vient de libérer.
+Les liens symboliques n'apparaîtraient pas
+dans ce compteur : si le lien dur est impossible (autre système de fichiers),
+on copie le fichier à la place, ce qui reste sûr pour le ramasse-miettes.
+
+Les blobs sont partagés : ne jamais y lier un fichier qui sera réécrit en place
+(ex. le fichier de concentrations, mis à jour par compute_all).
+"""
+import os
+import pathlib
+import shutil
+import time
+import uuid
+
+from django.conf import settings
+
+from apps.core.utils.hashing import file_sha256
+
+# Un blob tout juste créé n'a pas encore reçu son lien : on ne le collecte pas tout de suite
+GC_GRACE_SECONDS = 3600
+
+
+def get_blob_dir():
+    return pathlib.Path(settings.MEDIA_ROOT) / 'blobs'
+
+
+def blob_path(digest, suffix=''):
+    return get_blob_dir() / digest[:2] / f'{digest}{suffix.lower()}'
+
+
+def _link_or_copy(blob, dest):
+    dest = pathlib.Path(dest)
+    if dest.exists() or dest.is_symlink():
+        dest.unlink()
+    try:
+        os.link(blob, dest)
+    except OSError:
+        shutil.copy2(blob, dest)
+
+
+def _store(src, digest, suffix, move=False):
+    """Place ``src`` dans le store s'il n'y est pas déjà. Renvoie le chemin du blob."""
+    blob = blob_path(digest, suffix)
+    if blob.exists():
+        return blob
+    blob.parent.mkdir(parents=True, exist_ok=True)
+    tmp = blob.parent / f'.tmp-{uuid.uuid4().hex}'
+    if move:
+        shutil.move(str(src), tmp)
+    else:
+        shutil.copy2(src, tmp)
+    # Date de création du blob (copy2 et move conservent celle de la source)
+    os.utime(tmp)
+    # os.replace est atomique : deux runs qui stockent le même contenu ne se gênent pas
+    os.replace(tmp, blob)
+    return blob
+
+
+def link_into(src, dest):
+    """
+    Remplace ``shutil.copy(src, dest)`` : ``dest`` devient un lien vers le blob
+    de ``src``. Renvoie l'empreinte SHA-256 du contenu.
+    """
+    src = pathlib.Path(src)
+    digest = file_sha256(src)
+    blob = _store(src, digest, src.suffix)
+    _link_or_copy(blob, dest)
+    return digest
+
+
+def intern_file(path):
+    """Déplace un fichier déjà écrit dans le dossier du run vers le store et le remplace par un lien."""
+    path = pathlib.Path(path)
+    digest = file_sha256(path)
+    blob = blob_path(digest, path.suffix)
+    if blob.exists():
+        _link_or_copy(blob, path)
+        return digest
+    _store(path, digest, path.suffix, move=True)
+    _link_or_copy(blob, path)
+    return digest
+
+
+def intern_tree(directory, pattern='**/*.gb'):
+    """Applique ``intern_file`` à tous les fichiers de ``directory`` correspondant à ``pattern``."""
+    return {
+        str(path.relative_to(directory)): intern_file(path)
+        for path in pathlib.Path(directory).glob(pattern)
+        if path.is_file() and not path.is_symlink()
+    }
+
+
+def share_file(src, dest):
+    """
+    ``dest`` devient un lien de plus vers le contenu de ``src``, déjà interné
+    (fichier d'un autre dossier de run) : pas de relecture ni de hachage.
+    """
+    _link_or_copy(src, dest)
+
+
+def share_tree(src_dir, dest_dir, pattern='**/*.gb'):
+    """``share_file`` pour chaque fichier de ``src_dir`` correspondant à ``pattern``. Renvoie le nombre de fichiers."""
+    src_dir = pathlib.Path(src_dir)
+    count = 0
+    for path in src_dir.glob(pattern):
+        if path.is_file():
+            dest = pathlib.Path(dest_dir) / path.relative_to(src_dir)
+            dest.parent.mkdir(parents=True, exist_ok=True)
+            share_file(path, dest)
+            count += 1
+    return count
+
+
+def collect_garbage(grace_seconds=GC_GRACE_SECONDS):
+    """
+    Supprime les blobs qui ne sont plus liés par aucun dossier de run.
+    Renvoie ``(nombre de blobs supprimés, octets libérés)``.
+    """
+    blob_dir = get_blob_dir()
+    if not blob_dir.is_dir():
+        return 0, 0
+
+    now = time.time()
+    removed = 0
+    freed = 0
+    for blob in blob_dir.glob('*/*'):
+        try:
+            stat = blob.stat()
+        except FileNotFoundError:
+            continue
+        if stat.st_nlink > 1:
+            continue
+        # Fichier temporaire d'un stockage en cours : son st_mtime peut être celui de la source
+        created = stat.st_ctime if blob.name.startswith('.tmp-') else stat.st_mtime
+        if now - created < grace_seconds:
+            continue
+        try:
+            blob.unlink()
+        except FileNotFoundError:
+            continue
+        removed += 1
+        freed += stat.st_size
+    return removed, freed
+
+
+def blob_inodes():
+    """Blobs du store indexés par ``(st_dev, st_ino)`` : retrouve le blob d'un lien dur d'un dossier de run."""
+    blob_dir = get_blob_dir()
+    inodes = {}
+    if not blob_dir.is_dir():
+        return inodes
+    for blob in blob_dir.glob('*/*'):
+        try:
+            stat = blob.stat()
+        except FileNotFoundError:
+            continue
+        inodes[(stat.st_dev, stat.st_ino)] = blob
+    return inodes
+
+
+def linked_blobs(directory, inodes):
+    """Blobs (d'après ``blob_inodes()``) dont un lien dur se trouve sous ``directory``."""
+    linked = set()
+    for root, _, files in os.walk(directory):
+        for name in files:
+            try:
+                stat = os.lstat(os.path.join(root, name))
+            except FileNotFoundError:
+                continue
+            if stat.st_nlink > 1 and (stat.st_dev, stat.st_ino) in inodes:
+                linked.add(inodes[(stat.st_dev, stat.st_ino)])
+    return linked
+
+
+def remove_unreferenced(blobs):
+    """
+    Supprime ceux des ``blobs`` qui ne sont plus liés par aucun run, sans délai de
+    grâce : à utiliser pour des blobs dont on vient de supprimer des liens, y
+    compris des blobs stockés depuis moins de ``GC_GRACE_SECONDS``.
+    Renvoie ``(nombre de blobs supprimés, octets libérés)``.
+    """
+    removed = 0
+    freed = 0
+    for blob in blobs:
+        try:
+            stat = blob.stat()
+            if stat.st_nlink > 1:
+                continue
+            blob.unlink()
+        except FileNotFoundError:
+            continue
+        removed += 1
+        freed += stat.st_size
+    return removed, freed
@@ -0,0 +1,265 @@
+"""
+Cache des résultats de simulation, adressé par le contenu des entrées.
+
+La clé est un SHA-256 calculé sur une représentation canonique de tout ce qui
+est passé à ``compute_all`` : contenu du template, de la table de
+correspondance, des fichiers primers / concentrations et de chaque fichier .gb,
+paramètres (primers PCR, enzymes, concentration par défaut) et version
+d'InSillyClo. Les réglages du ``DataSourceHardCodedImplementation`` (enzymes,
+séparateurs) sont écrits en dur dans le paquet : sa version les couvre, et la
+clé se calcule dans la requête web sans importer InSillyClo.
+
+Une entrée est un dossier ``MEDIA_ROOT/simulation_cache/<clé>/`` contenant
+une copie de ``results/``, les fichiers dérivés (``visuals.jsonl``) et un
+``meta.json`` (taille, dates, nombre de hits).
+Les fichiers sont liés en dur quand c'est possible : matérialiser un run depuis
+le cache ne coûte que quelques millisecondes. La taille totale est bornée par
+``settings.SIMULATION_CACHE_MAX_BYTES`` (éviction LRU sur ``last_used``).
+"""
+import functools
+import hashlib
+import importlib.metadata
+import json
+import os
+import pathlib
+import shutil
+import time
+import uuid
+
+from django.conf import settings
+
+from apps.core.utils.hashing import file_sha256
+
+META_FILENAME = 'meta.json'
+# Fichiers dérivés des résultats, conservés avec eux pour ne pas les recalculer
+# (assemblies.json : empreintes par plasmide des reruns incrémentaux)
+SIDECAR_FILES = ('visuals.jsonl', 'assemblies.json')
+
+
+def get_cache_dir():
+    return pathlib.Path(settings.MEDIA_ROOT) / 'simulation_cache'
+
+
+def is_enabled():
+    return getattr(settings, 'SIMULATION_CACHE_ENABLED', True)
+
+
+# ==========================================
+# 1. CLÉ CANONIQUE
+# ==========================================
+
+@functools.lru_cache(maxsize=None)
+def data_source_fingerprint():
+    """DataSource utilisé par compute_all, identifié par la version installée d'InSillyClo (lue sans l'importer)."""
+    return {
+        'insillyclo': importlib.metadata.version('insillyclo'),
+        'implementation': 'DataSourceHardCodedImplementation',
+    }
+
+
+def sequence_digests(sequences_dir):
+    """Couples (nom de fichier, SHA-256) triés des séquences .gb d'un dossier."""
+    return sorted(
+        (gb_file.name, file_sha256(gb_file))
+        for gb_file in pathlib.Path(sequences_dir).glob('**/*.gb')
+    )
+
+
+def compute_cache_key(work_dir, payload, sequences=None):
+    """
+    Hash canonique des entrées d'un run préparé dans ``work_dir``.
+    Doit être appelé avant compute_all (qui réécrit le fichier de concentrations).
+    ``sequences`` : résultat de ``sequence_digests`` déjà calculé (lot de runs
+    partageant les mêmes séquences).
+    """
+    work_dir = pathlib.Path(work_dir)
+
+    def _hash(key):
+        rel = payload.get(key)
+        return file_sha256(work_dir / rel) if rel else None
+
+    # compute_all identifie les séquences par leur nom de fichier : il fait partie de la clé
+    if sequences is None:
+        sequences = sequence_digests(work_dir / 'sequences')
+
+    canonical = {
+        'template': _hash('template'),
+        'correspondence': _hash('correspondence'),
+        'primers': _hash('primers'),
+        'concentrations': _hash('concentrations'),
+        'sequences': [list(item) for item in sequences],
+        'pcr_primers': [list(pair) for pair in payload.get('pcr_primers') or []],
+        'enzymes': payload.get('enzymes'),
+        'default_concentration': payload.get('default_concentration'),
+        'data_source': data_source_fingerprint(),
+    }
+    encoded = json.dumps(canonical, sort_keys=True, separators=(',', ':')).encode('utf-8')
+    return hashlib.sha256(encoded).hexdigest()
+
+
+# ==========================================
+# 2. LECTURE / ÉCRITURE
+# ==========================================
+
+def _link_tree(src, dst):
+    """Copie ``src`` vers ``dst`` en liens durs (copie classique si le FS ne le permet pas)."""
+    def _link_or_copy(s, d):
+        try:
+            os.link(s, d)
+        except OSError:
+            shutil.copy2(s, d)
+    shutil.copytree(src, dst, copy_function=_link_or_copy)
+
+
+def _dir_size(path):
+    return sum(f.stat().st_size for f in pathlib.Path(path).rglob('*') if f.is_file())
+
+
+def _read_meta(entry_dir):
+    try:
+        with open(entry_dir / META_FILENAME) as stream:
+            return json.load(stream)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_meta(entry_dir, meta):
+    tmp_path = entry_dir / f'{META_FILENAME}.{uuid.uuid4().hex}'
+    with open(tmp_path, 'w') as stream:
+        json.dump(meta, stream)
+    os.replace(tmp_path, entry_dir / META_FILENAME)
+
+
+def lookup(key):
+    """Renvoie le dossier ``results`` en cache pour cette clé, ou None."""
+    if not key or not is_enabled():
+        return None
+    entry_dir = get_cache_dir() / key
+    results_dir = entry_dir / 'results'
+    meta = _read_meta(entry_dir)
+    if meta is None or not results_dir.is_dir():
+        return None
+    return results_dir
+
+
+def materialize(key, work_dir):
+    """
+    Recrée ``results/`` (et les fichiers annexes en cache) dans ``work_dir``
+    à partir de l'entrée en cache. Renvoie True en cas de hit.
+    """
+    results_dir = lookup(key)
+    if results_dir is None:
+        return False
+
+    work_dir = pathlib.Path(work_dir)
+    output_dir = work_dir / 'results'
+    entry_dir = results_dir.parent
+    if output_dir.exists():
+        shutil.rmtree(output_dir)
+    try:
+        _link_tree(results_dir, output_dir)
+        for name in SIDECAR_FILES:
+            if (entry_dir / name).is_file():
+                shutil.copy2(entry_dir / name, work_dir / name)
+    except (OSError, shutil.Error):
+        # Entrée évincée pendant la copie : on la traite comme un miss
+        shutil.rmtree(output_dir, ignore_errors=True)
+        return False
+
+    meta = _read_meta(entry_dir) or {}
+    meta['last_used'] = time.time()
+    meta['hits'] = meta.get('hits', 0) + 1
+    _write_meta(entry_dir, meta)
+    return True
+
+
+def store(key, work_dir):
+    """Ajoute ``results/`` d'un run terminé au cache puis applique la limite de taille."""
+    if not key or not is_enabled():
+        return
+    work_dir = pathlib.Path(work_dir)
+    cache_dir = get_cache_dir()
+    entry_dir = cache_dir / key
+    if lookup(key) is not None:
+        return
+
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    # Écriture dans un dossier temporaire puis renommage atomique
+    tmp_dir = cache_dir / f'.tmp-{key}-{uuid.uuid4().hex[:8]}'
+    try:
+        _link_tree(work_dir / 'results', tmp_dir / 'results')
+        for name in SIDECAR_FILES:
+            if (work_dir / name).is_file():
+                shutil.copy2(work_dir / name, tmp_dir / name)
+        now = time.time()
+        _write_meta(tmp_dir, {
+            'created_at': now,
+            'last_used': now,
+            'hits': 0,
+            'size': _dir_size(tmp_dir),
+        })
+        os.rename(tmp_dir, entry_dir)
+    except OSError:
+        # Un autre processus a stocké la même clé entre-temps
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        return
+
+    evict()
+
+
+# ==========================================
+# 3. INSPECTION / ÉVICTION
+# ==========================================
+
+def list_entries():
+    """Liste les entrées du cache, de la plus récemment utilisée à la plus ancienne."""
+    cache_dir = get_cache_dir()
+    if not cache_dir.is_dir():
+        return []
+    entries = []
+    for entry_dir in cache_dir.iterdir():
+        if not entry_dir.is_dir() or entry_dir.name.startswith('.'):
+            continue
+        meta = _read_meta(entry_dir)
+        if meta is None:
+            continue
+        entries.append({'key': entry_dir.name, 'path': entry_dir, **meta})
+    entries.sort(key=lambda e: e.get('last_used', 0), reverse=True)
+    return entries
+
+
+def remove(key):
+    entry_dir = get_cache_dir() / key
+    if entry_dir.is_dir():
+        shutil.rmtree(entry_dir, ignore_errors=True)
+        return True
+    return False
+
+
+def evict(max_bytes=None):
+    """Supprime les entrées les moins récemment utilisées au-delà de ``max_bytes``. Renvoie les clés supprimées."""
+    if max_bytes is None:
+        max_bytes = settings.SIMULATION_CACHE_MAX_BYTES
+    entries = list_entries()
+    total = sum(e.get('size', 0) for e in entries)
+    evicted = []
+    # Parcours du moins récent au plus récent
+    for entry in reversed(entries):
+        if total <= max_bytes:
+            break
+        remove(entry['key'])
+        total -= entry.get('size', 0)
+        evicted.append(entry['key'])
+    return evicted
+
+
+def purge():
+    """Vide entièrement le cache. Renvoie le nombre d'entrées supprimées."""
+    entries = list_entries()
+    for entry in entries:
+        remove(entry['key'])
+    cache_dir = get_cache_dir()
+    if cache_dir.is_dir():
+        for leftover in cache_dir.glob('.tmp-*'):
+            shutil.rmtree(leftover, ignore_errors=True)
+    return len(entries)
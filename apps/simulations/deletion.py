@@ -0,0 +1,179 @@
+"""
+Suppression asynchrone des campagnes et de leurs dossiers de run.
+
+La vue de suppression ne fait que marquer les campagnes (``request_deletion``) :
+elles disparaissent aussitôt de l'historique et des pages de résultats, et la
+requête rend la main sans toucher au disque. Le worker de suppression
+(``python manage.py simulation_deletion_worker``) traite ensuite les demandes
+par lots de ``SIMULATION_DELETION_BATCH_SIZE`` :
+
+- les dossiers ``MEDIA_ROOT/simulations/<run_id>/`` sont supprimés en
+  parallèle (``SIMULATION_DELETION_WORKERS`` threads : ``rmtree`` passe
+  l'essentiel de son temps dans des appels système) ;
+- les jobs et campagnes dont le dossier a disparu sont supprimés en base en
+  une requête par table ;
+- un échec est enregistré sur la campagne (``deletion_error``) et retenté
+  avec un délai croissant, au plus ``SIMULATION_DELETION_MAX_ATTEMPTS`` fois.
+  Les échecs définitifs apparaissent dans l'admin, qui permet de relancer.
+
+Le run d'une campagne encore en file ou en cours est d'abord annulé : son
+dossier n'est supprimé qu'une fois le processus de simulation arrêté.
+"""
+import datetime
+import functools
+import pathlib
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from . import blobs
+from .jobs import get_run_dir, request_cancel
+from .models import Campaign, SimulationJob
+
+# Délai avant la tentative n : RETRY_BASE_SECONDS * 2 ** (n - 1)
+RETRY_BASE_SECONDS = 60
+
+
+@dataclass
+class DeletionReport:
+    deleted: list = field(default_factory=list)
+    failed: list = field(default_factory=list)
+
+
+def request_deletion(campaigns):
+    """
+    Marque les campagnes ``campaigns`` (queryset) pour suppression et annule
+    leurs runs actifs. Renvoie le nombre de campagnes marquées.
+    """
+    campaigns = campaigns.visible()
+    ids = list(campaigns.values_list('pk', flat=True))
+    if not ids:
+        return 0
+    for job in SimulationJob.objects.filter(
+        campaign__in=ids,
+        status__in=(SimulationJob.STATUS_QUEUED, SimulationJob.STATUS_RUNNING),
+    ):
+        request_cancel(job)
+    return Campaign.objects.filter(pk__in=ids).update(
+        deletion_requested_at=timezone.now(),
+        deletion_attempts=0,
+        deletion_error='',
+        deletion_retry_at=None,
+    )
+
+
+def retry(campaigns):
+    """Remet en file les suppressions échouées de ``campaigns`` (action de l'admin)."""
+    return campaigns.pending_deletion().update(deletion_attempts=0, deletion_error='', deletion_retry_at=None)
+
+
+def failed_deletions():
+    """Campagnes dont la suppression a échoué définitivement."""
+    return Campaign.objects.pending_deletion().filter(deletion_attempts__gte=settings.SIMULATION_DELETION_MAX_ATTEMPTS)
+
+
+def due_deletions(now=None):
+    """
+    Demandes à traiter maintenant, les plus anciennes d'abord. Un run encore
+    actif (annulation en cours) attend l'arrêt de son processus.
+    """
+    now = now or timezone.now()
+    return (
+        Campaign.objects.pending_deletion()
+        .filter(deletion_attempts__lt=settings.SIMULATION_DELETION_MAX_ATTEMPTS)
+        .filter(Q(deletion_retry_at__isnull=True) | Q(deletion_retry_at__lte=now))
+        .exclude(simulation_job__status__in=(SimulationJob.STATUS_QUEUED, SimulationJob.STATUS_RUNNING))
+        .order_by('deletion_requested_at', 'pk')
+    )
+
+
+def remove_workspace(run_id, inodes=None, released=None):
+    """
+    Supprime le dossier d'un run ; renvoie None, ou le message d'erreur.
+    Les blobs liés depuis ce dossier (``inodes`` : ``blobs.blob_inodes()``) sont
+    ajoutés à ``released``.
+    """
+    if not run_id or pathlib.PurePath(run_id).name != run_id:
+        return None
+    work_dir = get_run_dir(run_id)
+    if inodes and released is not None:
+        released.update(blobs.linked_blobs(work_dir, inodes))
+    try:
+        shutil.rmtree(work_dir)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        return str(e) or type(e).__name__
+    return None
+
+
+def process_pending(*, batch_size=None, max_workers=None, now=None):
+    """Traite un lot de demandes de suppression. Renvoie un ``DeletionReport``."""
+    now = now or timezone.now()
+    batch_size = batch_size or settings.SIMULATION_DELETION_BATCH_SIZE
+    max_workers = max_workers or settings.SIMULATION_DELETION_WORKERS
+    report = DeletionReport()
+
+    rows = list(due_deletions(now).values_list('pk', 'run_id')[:batch_size])
+    if not rows:
+        return report
+
+    # Blobs liés depuis les dossiers supprimés : libérés dès ce lot, sans attendre le
+    # délai de grâce de collect_garbage
+    inodes = blobs.blob_inodes()
+    released = set()
+    remove = functools.partial(remove_workspace, inodes=inodes, released=released)
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(rows)))) as pool:
+        errors = list(pool.map(remove, [run_id for _, run_id in rows]))
+
+    for (pk, run_id), error in zip(rows, errors):
+        if error is None:
+            report.deleted.append(pk)
+        else:
+            report.failed.append((pk, run_id, error))
+
+    if report.deleted:
+        with transaction.atomic():
+            SimulationJob.objects.filter(campaign__in=report.deleted).delete()
+            Campaign.objects.filter(pk__in=report.deleted).delete()
+    # Les blobs qui ne sont plus liés par aucun run sont supprimés
+    blobs.remove_unreferenced(released)
+
+    for pk, _, error in report.failed:
+        attempts = Campaign.objects.filter(pk=pk).values_list('deletion_attempts', flat=True).first() or 0
+        Campaign.objects.filter(pk=pk).update(
+            deletion_attempts=F('deletion_attempts') + 1,
+            deletion_error=error,
+            deletion_retry_at=now + datetime.timedelta(seconds=RETRY_BASE_SECONDS * 2 ** attempts),
+        )
+    return report
+
+
+class DeletionWorker:
+    """Boucle du worker de suppression : un lot toutes les ``poll_interval`` secondes."""
+
+    def __init__(self, *, poll_interval=None, batch_size=None, max_workers=None, log=print):
+        self.poll_interval = poll_interval if poll_interval is not None else settings.SIMULATION_WORKER_POLL_INTERVAL
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+        self.log = log
+
+    def run(self, *, once=False):
+        while True:
+            report = process_pending(batch_size=self.batch_size, max_workers=self.max_workers)
+            if report.deleted:
+                self.log(f"Deleted {len(report.deleted)} campaign(s)")
+            for pk, run_id, error in report.failed:
+                self.log(f"Could not delete campaign {pk} ({run_id}): {error}")
+            # Lot complet : il reste sans doute des demandes, on enchaîne sans attendre
+            busy = len(report.deleted) + len(report.failed) >= (self.batch_size or settings.SIMULATION_DELETION_BATCH_SIZE)
+            if once and not busy:
+                return
+            if not busy:
+                time.sleep(self.poll_interval)
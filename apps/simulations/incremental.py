@@ -0,0 +1,196 @@
+"""
+Reruns incrémentaux : seuls les plasmides modifiés sont resimulés.
+
+À la fin de chaque run, ``assemblies.json`` (à la racine du run, conservé avec
+les résultats dans le cache) associe à chaque plasmide du template une
+empreinte de tout ce dont dépendent ses fichiers (``<id>.gb``,
+``<id>-digestion.svg``, ``<id>-pcr.svg``) :
+
+- la définition de l'assemblage (en-tête du template : enzyme, parts...) ;
+- la ligne du plasmide (id, type, parts choisies) et le nom produit ;
+- le contenu (SHA-256) de chaque fichier .gb utilisé ;
+- les enzymes de digestion, les paires de primers (avec leurs séquences),
+  les réglages du DataSource et la version d'InSillyClo.
+
+Lors d'un rerun depuis l'historique (``payload['previous_run']``), les
+plasmides dont l'empreinte n'a pas changé reprennent les fichiers du run
+précédent (liens durs) ; seules les lignes modifiées ou nouvelles passent par
+compute_all (voir ``sharding.compute_sharded``). Les fichiers qui portent sur
+tous les plasmides (tables, gels globaux, dilutions) sont ensuite régénérés
+dans l'ordre du template : le résultat est celui d'un run complet.
+"""
+import dataclasses
+import hashlib
+import json
+import os
+import pathlib
+import uuid
+
+from apps.core.utils.hashing import file_sha256
+
+from . import blobs
+from . import cache as simulation_cache
+
+FINGERPRINTS_FILENAME = 'assemblies.json'
+FINGERPRINTS_VERSION = 1
+
+# Fichiers produits par compute_all pour chaque plasmide (gels seulement avec enzymes / primers)
+PLASMID_FILE_SUFFIXES = ('.gb', '-digestion.svg', '-pcr.svg')
+
+
+def plasmid_files(plasmid_id):
+    return [f'{plasmid_id}{suffix}' for suffix in PLASMID_FILE_SUFFIXES]
+
+
+def _digest(data):
+    encoded = json.dumps(data, sort_keys=True, separators=(',', ':'), default=str).encode('utf-8')
+    return hashlib.sha256(encoded).hexdigest()
+
+
+# ==========================================
+# 1. EMPREINTES
+# ==========================================
+
+def fingerprint_plasmids(prepared, *, gb_files, enzyme_names=None):
+    """
+    Empreinte de chaque plasmide d'un template préparé (``sharding.prepare``).
+    Renvoie ``{plasmid_id: empreinte}`` ; un id en double garde la dernière ligne, comme compute_all.
+    """
+    # compute_all nomme chaque séquence d'après son fichier (seq.name = stem)
+    paths = {pathlib.Path(path).stem: path for path in gb_files}
+    digests = {}
+
+    def _file_digest(name):
+        if name not in digests:
+            digests[name] = file_sha256(paths[name]) if name in paths else None
+        return digests[name]
+
+    context = {
+        'assembly': dataclasses.asdict(prepared['assembly']),
+        'enzymes': list(enzyme_names) if enzyme_names else None,
+        'primers': [list(pair) for pair in prepared['primer_pairs']],
+        'data_source': simulation_cache.data_source_fingerprint(),
+    }
+
+    fingerprints = {}
+    for plasmid, plasmid_name, part_to_assemble in prepared['instances']:
+        fingerprints[str(plasmid.plasmid_id)] = _digest({
+            'context': context,
+            'plasmid': dataclasses.asdict(plasmid),
+            'name': plasmid_name,
+            'parts': [
+                {
+                    'interpretation': part.chosen_interpretation,
+                    'sequences': [[seq.name, _file_digest(seq.name)] for seq in part.sequences],
+                }
+                for part in part_to_assemble
+            ],
+        })
+    return fingerprints
+
+
+def fingerprint_inputs(**compute_kwargs):
+    """
+    Empreintes d'un run calculé directement par compute_all : relit le template
+    et les séquences avec un observer muet (les problèmes ont déjà été signalés).
+    """
+    import insillyclo.observer
+    from . import sharding
+
+    compute_kwargs['observer'] = insillyclo.observer.InSillyCloCliObserver(debug=False, fail_on_error=False)
+    prepared = sharding.prepare(**compute_kwargs)
+    return fingerprint_plasmids(
+        prepared,
+        gb_files=compute_kwargs['gb_plasmids'],
+        enzyme_names=compute_kwargs.get('enzyme_names'),
+    )
+
+
+def write_fingerprints(work_dir, fingerprints):
+    tmp_path = pathlib.Path(work_dir) / f'.{FINGERPRINTS_FILENAME}.{uuid.uuid4().hex}'
+    with open(tmp_path, 'w') as stream:
+        json.dump({'version': FINGERPRINTS_VERSION, 'plasmids': fingerprints}, stream)
+    os.replace(tmp_path, pathlib.Path(work_dir) / FINGERPRINTS_FILENAME)
+
+
+def read_fingerprints(work_dir):
+    """Empreintes d'un run terminé, ou {} s'il n'en a pas (run antérieur, version différente)."""
+    try:
+        with open(pathlib.Path(work_dir) / FINGERPRINTS_FILENAME) as stream:
+            data = json.load(stream)
+    except (OSError, ValueError):
+        return {}
+    if data.get('version') != FINGERPRINTS_VERSION:
+        return {}
+    return data.get('plasmids') or {}
+
+
+# ==========================================
+# 2. RERUN
+# ==========================================
+
+def previous_run_dir(payload, work_dir):
+    """Dossier du run dont ``work_dir`` est le rerun, s'il a des empreintes ; None sinon."""
+    run_id = payload.get('previous_run')
+    # Identifiant venant du formulaire : un simple nom de dossier, jamais un chemin
+    if not run_id or pathlib.PurePath(run_id).name != run_id:
+        return None
+    previous_dir = pathlib.Path(work_dir).parent / run_id
+    if previous_dir == pathlib.Path(work_dir) or not read_fingerprints(previous_dir):
+        return None
+    return previous_dir
+
+
+def reusable_plasmids(previous_dir, fingerprints):
+    """Ids des plasmides dont l'empreinte est inchangée et dont le run précédent a encore le .gb."""
+    previous = read_fingerprints(previous_dir)
+    previous_results = pathlib.Path(previous_dir) / 'results'
+    return {
+        plasmid_id
+        for plasmid_id, fingerprint in fingerprints.items()
+        if previous.get(plasmid_id) == fingerprint
+        and (previous_results / f'{plasmid_id}.gb').is_file()
+    }
+
+
+def compute_incremental(*, previous_dir, observer, output_dir, input_template_filled, max_shards, min_rows,
+                        **compute_kwargs):
+    """
+    Équivalent de compute_all qui reprend de ``previous_dir`` les fichiers des
+    plasmides inchangés. Renvoie ``(empreintes, ids réutilisés)``.
+    """
+    from . import sharding
+
+    output_dir = pathlib.Path(output_dir)
+    prepared = sharding.prepare(observer=observer, input_template_filled=input_template_filled, **compute_kwargs)
+    fingerprints = fingerprint_plasmids(
+        prepared,
+        gb_files=compute_kwargs['gb_plasmids'],
+        enzyme_names=compute_kwargs.get('enzyme_names'),
+    )
+    reused = reusable_plasmids(previous_dir, fingerprints)
+
+    previous_results = pathlib.Path(previous_dir) / 'results'
+    for plasmid_id in sorted(reused):
+        for name in plasmid_files(plasmid_id):
+            if (previous_results / name).is_file():
+                blobs.share_file(previous_results / name, output_dir / name)
+
+    # Positions des lignes à simuler (ordre du template, comme les shards)
+    rows = [
+        index for index, (plasmid, _, _) in enumerate(prepared['instances'])
+        if str(plasmid.plasmid_id) not in reused
+    ]
+    if rows:
+        sharding.compute_sharded(
+            observer=observer,
+            output_dir=output_dir,
+            input_template_filled=input_template_filled,
+            shards=sharding.shard_count(len(rows), max_shards=max_shards, min_rows=min_rows),
+            prepared=prepared,
+            rows=rows,
+            **compute_kwargs,
+        )
+    else:
+        sharding.write_aggregates(prepared, output_dir=output_dir, observer=observer, **compute_kwargs)
+    return fingerprints, reused
@@ -0,0 +1,551 @@
+"""
+Exécution des simulations en arrière-plan.
+
+Le formulaire de simulation prépare le dossier du run (fichiers d'entrée,
+séquences) puis appelle ``enqueue_simulation`` : la requête HTTP rend la main
+immédiatement. Le worker (``python manage.py simulation_worker``) récupère les
+jobs "queued" et exécute ``compute_all`` dans un processus dédié par run, ce
+qui laisse les workers WSGI libres de servir les autres pages.
+
+Chaque processus de run est borné en temps réel, en temps CPU et en mémoire
+(settings.SIMULATION_*_LIMIT) et peut être tué sur demande d'annulation ; ses
+résultats partiels sont alors supprimés et la raison de l'arrêt est
+enregistrée sur le job et la Campaign.
+
+Les limites CPU et mémoire sont des rlimits : elles s'appliquent à chaque
+processus. Les processus des shards (sharding.py) en héritent telles quelles,
+un run découpé en N shards peut donc consommer jusqu'à N + 1 fois ces limites.
+Elles ne sont pas divisées entre les shards : un shard forké hérite de l'espace
+d'adressage du run (pile de simulation préchargée comprise), qu'une fraction de
+RLIMIT_AS ne couvrirait pas. Le nombre total de processus reste borné par
+SIMULATION_MAX_PROCESSES.
+
+Les processus de run ne touchent jamais à la base : ils reçoivent le run_id
+et le payload (chemins + paramètres) et renvoient la liste des fichiers produits.
+Seul le processus parent met à jour SimulationJob / Campaign.
+"""
+import multiprocessing
+import os
+import pathlib
+import shutil
+import signal
+import time
+
+from django.conf import settings
+from django.utils import timezone
+
+from apps.plasmids import parse_cache
+
+from . import cache as simulation_cache
+from . import incremental
+from . import metrics
+from . import progress
+from . import runtime
+from . import visuals
+from .models import SimulationJob
+
+
+class SimulationError(Exception):
+    """Erreur de simulation présentable à l'utilisateur."""
+
+
+def get_run_dir(run_id):
+    return pathlib.Path(settings.MEDIA_ROOT) / 'simulations' / run_id
+
+
+# ==========================================
+# 1. CÔTÉ WEB : MISE EN FILE
+# ==========================================
+
+def enqueue_simulation(*, run_id, payload, owner=None, campaign=None, batch=None, sequences=None):
+    """
+    Crée le job correspondant à un dossier de run déjà préparé.
+
+    Si des entrées identiques ont déjà été simulées, les résultats sont
+    recopiés depuis le cache et le job est créé directement à l'état "done".
+    ``sequences`` : empreintes des séquences déjà calculées (voir cache.sequence_digests).
+    """
+    work_dir = get_run_dir(run_id)
+    payload = dict(payload)
+    if simulation_cache.is_enabled():
+        payload['cache_key'] = simulation_cache.compute_cache_key(work_dir, payload, sequences=sequences)
+
+    output_dir = work_dir / 'results'
+    if simulation_cache.materialize(payload.get('cache_key'), work_dir):
+        output = finalize_outputs(work_dir, output_dir, from_cache=True)
+        now = timezone.now()
+        job = SimulationJob.objects.create(
+            run_id=run_id,
+            payload={**payload, 'cache_hit': True},
+            owner=owner,
+            campaign=campaign,
+            batch=batch,
+            status=SimulationJob.STATUS_DONE,
+            started_at=now,
+            finished_at=now,
+        )
+        complete_job(job, output)
+        return job
+
+    return SimulationJob.objects.create(
+        run_id=run_id,
+        payload=payload,
+        owner=owner,
+        campaign=campaign,
+        batch=batch,
+    )
+
+
+# ==========================================
+# 2. CÔTÉ PROCESSUS DU RUN : EXÉCUTION
+# ==========================================
+
+def run_simulation(run_id, payload, *, max_shards=1):
+    """
+    Exécute compute_all pour un run. Appelée dans le processus du run :
+    pas d'accès à la base ici, uniquement au dossier du run.
+    Un gros template est réparti sur au plus ``max_shards`` processus (voir sharding.py).
+    Un rerun (``payload['previous_run']``) ne resimule que les plasmides modifiés (voir incremental.py).
+    """
+    # Déjà importés dans le processus du worker (runtime.preload) : ces imports ne coûtent rien
+    import insillyclo.simulator
+    from . import sharding
+
+    work_dir = get_run_dir(run_id)
+    if not work_dir.is_dir():
+        raise SimulationError("Simulation workspace not found (expired or deleted).")
+
+    def _path(key):
+        rel = payload.get(key)
+        return work_dir / rel if rel else None
+
+    sequences_dir = work_dir / 'sequences'
+    output_dir = work_dir / 'results'
+    output_dir.mkdir(exist_ok=True)
+
+    gb_files = list(sequences_dir.glob('**/*.gb'))
+    if not gb_files:
+        raise SimulationError("No valid .gb files found.")
+
+    # Avancement publié dans progress.jsonl (lu par la vue de statut)
+    observer = progress.ProgressObserver(work_dir, debug=False, fail_on_error=True)
+    pcr_primers = [tuple(pair) for pair in payload.get('pcr_primers', [])]
+    recorder = metrics.PhaseRecorder()
+    with recorder.phase('parse_template') as phase:
+        total = progress.count_template_plasmids(_path('template'))
+        phase['plasmids'] = total
+
+    compute_kwargs = dict(
+        observer=observer,
+        settings=None,
+        input_template_filled=_path('template'),
+        input_parts_files=[_path('correspondence')],
+        gb_plasmids=gb_files,
+        output_dir=output_dir,
+        data_source=runtime.get_data_source(),
+        primers_file=_path('primers'),
+        primer_id_pairs=pcr_primers,
+        enzyme_names=payload.get('enzymes'),
+        default_mass_concentration=payload.get('default_concentration'),
+        concentration_file=_path('concentrations'),
+    )
+    shards = sharding.shard_count(total, max_shards=max_shards, min_rows=settings.SIMULATION_SHARD_MIN_ROWS)
+    previous_dir = incremental.previous_run_dir(payload, work_dir)
+    fingerprints = None
+    reused = set()
+
+    with recorder.phase('compute') as phase, observer.track(output_dir, total=total):
+        phase['shards'] = shards
+        try:
+            if previous_dir is not None:
+                fingerprints, reused = incremental.compute_incremental(
+                    previous_dir=previous_dir,
+                    max_shards=max_shards,
+                    min_rows=settings.SIMULATION_SHARD_MIN_ROWS,
+                    **compute_kwargs,
+                )
+                phase['reused'] = len(reused)
+            elif shards > 1:
+                prepared = sharding.compute_sharded(shards=shards, **compute_kwargs)
+                fingerprints = incremental.fingerprint_plasmids(
+                    prepared, gb_files=gb_files, enzyme_names=payload.get('enzymes'),
+                )
+            else:
+                insillyclo.simulator.compute_all(sbol_export=False, **compute_kwargs)
+        except FileNotFoundError as fnf_error:
+            missing = fnf_error.filename
+            if not missing and "No such file" in str(fnf_error):
+                # Tentative d'extraction du nom si filename est vide
+                missing = str(fnf_error)
+            raise SimulationError(f"Simulation failed: A required plasmid file is missing. The simulator looked for: {missing}")
+        except MemoryError:
+            # Limite mémoire du processus atteinte : traitée par le worker
+            raise
+        except Exception as e:
+            # Si l'erreur contient "No such file" mais n'est pas un FileNotFoundError
+            error_str = str(e)
+            if "No such file" in error_str or "does not exist" in error_str:
+                raise SimulationError(f"Simulation failed: A required file is missing. Details: {error_str}")
+            # Sinon, c'est une autre erreur de simulation, on la remonte telle quelle
+            raise SimulationError(f"Simulation failed: {error_str or type(e).__name__}")
+
+    # Empreintes par plasmide, relues par un futur rerun de ce run
+    with recorder.phase('fingerprint'):
+        if fingerprints is None:
+            try:
+                fingerprints = incremental.fingerprint_inputs(**compute_kwargs)
+            except Exception:
+                # Sans empreintes, un rerun de ce run resimulera simplement tout
+                fingerprints = None
+        if fingerprints is not None:
+            incremental.write_fingerprints(work_dir, fingerprints)
+
+    with recorder.phase('finalize') as phase:
+        parsed_before = parse_cache.counters()
+        # Lecture des .gb produits avec les processus accordés au run (budget du worker), pas un pool de cpu_count
+        output = finalize_outputs(work_dir, output_dir, reuse_from=previous_dir, reused=reused, max_workers=max_shards)
+        # Fichiers .gb des résultats déjà lus (cache de lecture GenBank) / lus par ce run
+        parsed_after = parse_cache.counters()
+        phase['parse_cache_hits'] = parsed_after['hits'] - parsed_before['hits']
+        phase['parse_cache_misses'] = parsed_after['misses'] - parsed_before['misses']
+    with recorder.phase('cache_store'):
+        simulation_cache.store(payload.get('cache_key'), work_dir)
+    observer.finished(files=len(output['files']))
+    output['metrics'] = recorder.as_dict(input_files=len(gb_files), output_files=len(output['files']))
+    return output
+
+
+def finalize_outputs(work_dir, output_dir, reuse_from=None, reused=(), from_cache=False, max_workers=1):
+    """
+    Précalcule les visuels des plasmides produits et renvoie la liste des
+    fichiers. L'archive zip n'est plus construite ici : elle est générée à la
+    demande au téléchargement.
+    ``reuse_from`` / ``reused`` : run précédent et plasmides repris tels quels
+    d'un rerun incrémental, dont les visuels sont recopiés.
+    ``from_cache`` : résultats recopiés du cache, avec leur sidecar complet. Sinon le
+    sidecar est toujours réécrit : un fichier présent a pu être écrit avant la fin du run.
+    ``max_workers`` : processus de lecture des GenBank (1 : dans le processus courant).
+    """
+    if not (from_cache and (work_dir / visuals.SIDECAR_FILENAME).is_file()):
+        visuals.write_visuals_sidecar(
+            work_dir,
+            reuse_from=reuse_from,
+            reusable={f'{plasmid_id}.gb' for plasmid_id in reused},
+            max_workers=max_workers,
+        )
+    return {'files': sorted(os.listdir(output_dir))}
+
+
+# ==========================================
+# 3. PROCESSUS ENFANT : LIMITES DE RESSOURCES
+# ==========================================
+
+def get_limits():
+    """Limites appliquées à chaque run (None ou 0 : pas de limite)."""
+    return {
+        'wall_seconds': getattr(settings, 'SIMULATION_TIME_LIMIT', None),
+        'cpu_seconds': getattr(settings, 'SIMULATION_CPU_TIME_LIMIT', None),
+        'memory_bytes': getattr(settings, 'SIMULATION_MEMORY_LIMIT', None),
+    }
+
+
+def _apply_rlimits(limits):
+    # Le module resource n'existe que sous Unix
+    import resource
+
+    if limits.get('cpu_seconds'):
+        cpu = int(limits['cpu_seconds'])
+        # SIGXCPU à la limite souple, SIGKILL à la limite dure
+        resource.setrlimit(resource.RLIMIT_CPU, (cpu, cpu + 5))
+    if limits.get('memory_bytes'):
+        memory = int(limits['memory_bytes'])
+        resource.setrlimit(resource.RLIMIT_AS, (memory, memory))
+
+
+class Outcome:
+    """Issue d'un run, transmise du processus enfant au worker."""
+
+    def __init__(self, status, *, reason='', message='', output=None):
+        self.status = status
+        self.reason = reason
+        self.message = message
+        self.output = output or {}
+
+
+def _run_in_child(run_id, payload, limits, max_shards, conn):
+    """Point d'entrée du processus d'un run : applique les limites, exécute, renvoie l'issue par le pipe."""
+    # Groupe de processus propre au run : l'annulation tue aussi les processus des shards
+    os.setpgid(0, 0)
+    try:
+        _apply_rlimits(limits)
+        output = run_simulation(run_id, payload, max_shards=max_shards)
+        conn.send(Outcome(SimulationJob.STATUS_DONE, output=output))
+    except MemoryError:
+        megabytes = int(limits.get('memory_bytes') or 0) // (1024 * 1024)
+        conn.send(Outcome(
+            SimulationJob.STATUS_FAILED,
+            reason=SimulationJob.REASON_MEMORY_LIMIT,
+            message=f"Simulation stopped: memory limit exceeded ({megabytes} MB).",
+        ))
+    except SimulationError as e:
+        conn.send(Outcome(SimulationJob.STATUS_FAILED, reason=SimulationJob.REASON_ERROR, message=str(e)))
+    except Exception as e:
+        conn.send(Outcome(SimulationJob.STATUS_FAILED, reason=SimulationJob.REASON_ERROR, message=f"Simulation failed: {e}"))
+    finally:
+        conn.close()
+
+
+class RunningSimulation:
+    """
+    Un run en cours dans son propre processus, avec sa limite de temps réel.
+    ``shards`` : nombre de processus que le run peut utiliser pour un gros template.
+    """
+
+    def __init__(self, job, limits, shards=1):
+        self.job = job
+        self.limits = limits
+        self.shards = shards
+        self.started = time.monotonic()
+        self._conn, child_conn = multiprocessing.Pipe(duplex=False)
+        # fork : le run hérite de la pile de simulation préchargée par le worker (runtime.preload)
+        # Pas daemon : le processus du run doit pouvoir lancer le pool des shards
+        self.process = multiprocessing.get_context('fork').Process(
+            target=_run_in_child,
+            args=(job.run_id, job.payload, limits, shards, child_conn),
+            name=f"simulation-{job.run_id}",
+        )
+        self.process.start()
+        child_conn.close()
+        self.usage = None
+
+    def _signal_group(self, signum):
+        try:
+            os.killpg(self.process.pid, signum)
+        except ProcessLookupError:
+            pass
+
+    def terminate(self):
+        self._signal_group(signal.SIGTERM)
+        self.process.join(5)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        # Shards éventuellement restés orphelins
+        self._signal_group(signal.SIGKILL)
+
+    def poll(self):
+        """Renvoie l'Outcome du run s'il est terminé (ou doit l'être), sinon None."""
+        # Le pipe devient aussi lisible quand l'enfant meurt sans rien envoyer (EOF)
+        if self._conn.poll():
+            try:
+                outcome = self._conn.recv()
+            except EOFError:
+                outcome = None
+            return outcome or self._outcome_from_exitcode(self._reap())
+
+        wall = self.limits.get('wall_seconds')
+        if wall and time.monotonic() - self.started > wall:
+            self.terminate()
+            return Outcome(
+                SimulationJob.STATUS_FAILED,
+                reason=SimulationJob.REASON_TIMEOUT,
+                message=f"Simulation stopped: time limit exceeded ({int(wall)} s).",
+            )
+        return None
+
+    def cancel(self):
+        self.terminate()
+        return Outcome(SimulationJob.STATUS_CANCELLED, reason=SimulationJob.REASON_CANCELLED, message="Simulation cancelled.")
+
+    def _reap(self):
+        """Attend la fin du processus du run ; renvoie son code de sortie et garde son rusage."""
+        try:
+            _, status, self.usage = os.wait4(self.process.pid, 0)
+        except ChildProcessError:
+            # Déjà attendu par multiprocessing
+            self.process.join()
+            return self.process.exitcode
+        exitcode = os.waitstatus_to_exitcode(status)
+        # multiprocessing ne doit plus attendre ce pid (déjà libéré)
+        self.process._popen.returncode = exitcode
+        return exitcode
+
+    def _outcome_from_exitcode(self, exitcode):
+        if exitcode == -signal.SIGXCPU or (exitcode == -signal.SIGKILL and self.limits.get('cpu_seconds')
+                                           and self._cpu_exhausted()):
+            return Outcome(
+                SimulationJob.STATUS_FAILED,
+                reason=SimulationJob.REASON_CPU_LIMIT,
+                message=f"Simulation stopped: CPU time limit exceeded ({int(self.limits['cpu_seconds'])} s).",
+            )
+        return Outcome(
+            SimulationJob.STATUS_FAILED,
+            reason=SimulationJob.REASON_CRASHED,
+            message=f"Simulation process exited unexpectedly (exit code {exitcode}).",
+        )
+
+    def _cpu_exhausted(self):
+        # SIGKILL vient aussi du noyau (OOM) ou d'un tiers : seul le temps CPU consommé le rattache à RLIMIT_CPU
+        if self.usage is None:
+            return False
+        return self.usage.ru_utime + self.usage.ru_stime >= self.limits['cpu_seconds']
+
+
+# ==========================================
+# 4. CÔTÉ WORKER : ORCHESTRATION
+# ==========================================
+
+def claim_next_job():
+    """Passe le plus ancien job "queued" en "running" et le renvoie (ou None)."""
+    while True:
+        job = SimulationJob.objects.filter(status=SimulationJob.STATUS_QUEUED).order_by('created_at').first()
+        if job is None:
+            return None
+        # L'update conditionnel évite qu'un autre worker prenne le même job
+        claimed = SimulationJob.objects.filter(pk=job.pk, status=SimulationJob.STATUS_QUEUED).update(
+            status=SimulationJob.STATUS_RUNNING,
+            started_at=timezone.now(),
+        )
+        if claimed:
+            job.refresh_from_db()
+            return job
+
+
+def complete_job(job, output):
+    job.status = SimulationJob.STATUS_DONE
+    job.finished_at = timezone.now()
+    job.error = ''
+    job.save(update_fields=['status', 'finished_at', 'error'])
+
+    if job.campaign_id:
+        campaign = job.campaign
+        campaign.output_files = {'files': output.get('files', [])}
+        campaign.save(update_fields=['output_files'])
+
+        # Mesures du processus du run (absentes si les résultats viennent du cache)
+        if 'metrics' in output:
+            worker_metrics = dict(output['metrics'])
+            if job.started_at:
+                worker_metrics['queue_wait_s'] = round((job.started_at - job.created_at).total_seconds(), 3)
+            metrics.store_metrics(campaign, 'worker', worker_metrics)
+
+
+def cleanup_partial_outputs(run_id):
+    """Supprime les résultats partiels d'un run interrompu (les entrées restent, pour "Edit / Rerun")."""
+    work_dir = get_run_dir(run_id)
+    shutil.rmtree(work_dir / 'results', ignore_errors=True)
+    (work_dir / visuals.SIDECAR_FILENAME).unlink(missing_ok=True)
+
+
+def fail_job(job, message, *, reason=SimulationJob.REASON_ERROR, status=SimulationJob.STATUS_FAILED):
+    job.status = status
+    job.finished_at = timezone.now()
+    job.error = message
+    job.termination_reason = reason
+    job.save(update_fields=['status', 'finished_at', 'error', 'termination_reason'])
+    cleanup_partial_outputs(job.run_id)
+
+    # La Campaign garde la raison de l'arrêt
+    if job.campaign_id:
+        campaign = job.campaign
+        campaign.results_data = {
+            **(campaign.results_data or {}),
+            'termination': {
+                'status': status,
+                'reason': reason,
+                'message': message,
+                'at': job.finished_at.isoformat(),
+            },
+        }
+        campaign.save(update_fields=['results_data'])
+
+
+def request_cancel(job):
+    """
+    Annule un job. En file : annulé immédiatement. En cours : le worker
+    tue son processus au prochain tour. Renvoie False si le job est déjà terminé.
+    """
+    cancelled = SimulationJob.objects.filter(pk=job.pk, status=SimulationJob.STATUS_QUEUED).update(
+        status=SimulationJob.STATUS_CANCELLED,
+        cancel_requested=True,
+    )
+    if cancelled:
+        job.refresh_from_db()
+        fail_job(job, "Simulation cancelled.", reason=SimulationJob.REASON_CANCELLED, status=SimulationJob.STATUS_CANCELLED)
+        return True
+    return bool(SimulationJob.objects.filter(pk=job.pk, status=SimulationJob.STATUS_RUNNING).update(cancel_requested=True))
+
+
+class SimulationWorker:
+    """
+    Boucle du worker : lance un processus par job en attente (au plus
+    ``max_workers`` à la fois), applique les limites de temps / CPU / mémoire,
+    traite les annulations et enregistre l'issue de chaque run. Un run peut
+    répartir un gros template sur ``shards_per_run`` processus, sans dépasser
+    ``max_processes`` processus de shard pour l'ensemble des runs.
+    """
+
+    def __init__(self, *, max_workers=None, poll_interval=None, log=print, limits=None,
+                 shards_per_run=None, max_processes=None, preload=True):
+        self.max_workers = max_workers or settings.SIMULATION_WORKERS
+        self.poll_interval = poll_interval if poll_interval is not None else settings.SIMULATION_WORKER_POLL_INTERVAL
+        self.limits = limits if limits is not None else get_limits()
+        self.shards_per_run = shards_per_run or settings.SIMULATION_SHARDS_PER_RUN
+        self.max_processes = max_processes or settings.SIMULATION_MAX_PROCESSES
+        self.log = log
+        self.preload = preload
+
+    def _shard_budget(self, running):
+        """Processus de shard accordés au prochain run, dans la limite globale du worker."""
+        in_use = sum(handle.shards for handle in running.values())
+        return max(1, min(self.shards_per_run, self.max_processes - in_use))
+
+    def requeue_running_jobs(self):
+        """Remet en file les jobs restés "running" après un arrêt brutal du worker."""
+        return SimulationJob.objects.filter(status=SimulationJob.STATUS_RUNNING).update(
+            status=SimulationJob.STATUS_QUEUED, started_at=None
+        )
+
+    def run(self, *, once=False):
+        if self.preload:
+            # Une fois pour toute la vie du worker, avant le premier fork
+            self.log(f"Simulation stack loaded in {runtime.preload():.2f}s")
+        running = {}
+        try:
+            while True:
+                while len(running) < self.max_workers:
+                    job = claim_next_job()
+                    if job is None:
+                        break
+                    running[job.pk] = RunningSimulation(job, self.limits, self._shard_budget(running))
+                    self.log(f"Started job {job.id} ({job.run_id})")
+
+                if running:
+                    cancel_ids = set(SimulationJob.objects.filter(
+                        pk__in=list(running), cancel_requested=True,
+                    ).values_list('pk', flat=True))
+                    for pk in cancel_ids:
+                        handle = running.pop(pk)
+                        self._record_outcome(handle.job, handle.cancel())
+
+                for pk, handle in list(running.items()):
+                    outcome = handle.poll()
+                    if outcome is not None:
+                        del running[pk]
+                        self._record_outcome(handle.job, outcome)
+
+                if once and not running:
+                    return
+                time.sleep(self.poll_interval)
+        finally:
+            # Arrêt du worker : les runs en cours seront remis en file (--requeue-running)
+            for handle in running.values():
+                handle.terminate()
+
+    def _record_outcome(self, job, outcome):
+        if outcome.status == SimulationJob.STATUS_DONE:
+            complete_job(job, outcome.output)
+            self.log(f"Job {job.id} ({job.run_id}) done")
+        else:
+            fail_job(job, outcome.message, reason=outcome.reason, status=outcome.status)
+            self.log(f"Job {job.id} ({job.run_id}) {outcome.status} [{outcome.reason}]: {outcome.message}")
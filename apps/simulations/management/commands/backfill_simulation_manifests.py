@@ -0,0 +1,48 @@
+"""
+Écrit le manifeste (manifest.json) des runs créés avant son introduction.
+
+Les rôles des fichiers sont retrouvés comme le faisait l'ancien pré-remplissage
+(sous-dossiers template/, correspondence/... puis noms des fichiers à la racine).
+À lancer une fois après le déploiement ; les runs qui ont déjà un manifeste
+sont ignorés.
+
+Usage:
+  python manage.py backfill_simulation_manifests
+  python manage.py backfill_simulation_manifests --dry-run
+  python manage.py backfill_simulation_manifests --overwrite
+"""
+import pathlib
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from apps.simulations import manifest
+
+
+class Command(BaseCommand):
+    help = "Write manifest.json for simulation runs created before manifests existed"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true", help="Only report what would be written")
+        parser.add_argument("--overwrite", action="store_true", help="Rewrite existing manifests too")
+
+    def handle(self, *args, **options):
+        simulations_dir = pathlib.Path(settings.MEDIA_ROOT) / "simulations"
+        run_dirs = sorted(path for path in simulations_dir.iterdir() if path.is_dir()) if simulations_dir.is_dir() else []
+
+        written = skipped = 0
+        for run_dir in run_dirs:
+            if manifest.manifest_path(run_dir).exists() and not options["overwrite"]:
+                skipped += 1
+                continue
+            if options["dry_run"]:
+                roles = ", ".join(sorted(manifest.guess_inputs(run_dir))) or "no inputs"
+                self.stdout.write(f"  {run_dir.name}: {roles}")
+            else:
+                manifest.backfill(run_dir, overwrite=True)
+            written += 1
+
+        verb = "Would write" if options["dry_run"] else "Wrote"
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {written} manifest(s), {skipped} run(s) already had one"
+        ))
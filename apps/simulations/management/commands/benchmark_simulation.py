@@ -0,0 +1,222 @@
+"""
+Benchmark de bout en bout d'une simulation sur les données de data/.
+
+Pour chaque taille demandée, la commande construit un template synthétique
+(promoteur × CDS × terminateur du Yeast Toolkit, complétés par ConLS / ConR1 /
+pYTK095) et la table de correspondance associée, zippe toutes les séquences de
+data/ comme le ferait un utilisateur, puis emprunte le même chemin que
+simulation_view et le worker, sans la couche HTTP :
+
+    extract     extract_sequences_archive (extraction + dédoublonnage)
+    cache_key   compute_cache_key
+    puis les phases de run_simulation (parse_template, compute, finalize, cache_store)
+
+Chaque mesure tourne dans un processus neuf (comme un run du worker), pour que
+les mesures de mémoire soient propres à la taille mesurée. MEDIA_ROOT est
+redirigé vers un dossier temporaire (avec le cache de lecture GenBank) et le cache
+des résultats est désactivé.
+
+Usage:
+  python manage.py benchmark_simulation --sizes 10 100 500 --repeat 3
+  python manage.py benchmark_simulation --json bench-new.json --baseline bench-old.json
+  python manage.py benchmark_simulation --sizes 690 --shards 4 --shard-min-rows 100
+"""
+import itertools
+import json
+import platform
+import subprocess
+import tempfile
+import time
+import uuid
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import openpyxl
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+
+from apps.simulations import cache as simulation_cache
+from apps.simulations import metrics
+from apps.simulations.jobs import get_run_dir, run_simulation
+from apps.simulations.views import extract_sequences_archive
+
+# Parts du Yeast Toolkit (Lee et al. 2015) par type
+FIXED_PARTS = {'Con1': ('pYTK002', '1'), 'Con2': ('pYTK067', '5'), 'Backbone': ('pYTK095', '678')}
+PROMOTERS = [f'pYTK{n:03d}' for n in range(9, 32)]      # type 2
+CDS = [f'pYTK{n:03d}' for n in range(32, 37)]            # type 3
+TERMINATORS = [f'pYTK{n:03d}' for n in range(51, 57)]    # type 4
+MAX_SIZE = len(PROMOTERS) * len(CDS) * len(TERMINATORS)
+
+PART_NAMES = ('Con1', 'Promoter', 'CDS', 'Terminator', 'Con2', 'Backbone')
+PART_TYPES = ('1', '2', '3', '4', '5', '678')
+
+
+def write_template(path, size):
+    """Template InSillyClo de ``size`` plasmides (mise en page de template_generator)."""
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.append(['Assembly settings'])
+    sheet.append(['Restriction enzyme', 'BsaI'])
+    sheet.append(['Name', f'benchmark-{size}'])
+    sheet.append(['Output separator', '-'])
+    for _ in range(4):
+        sheet.append([])
+    sheet.append(['Assembly composition', 'Part name ->', *PART_NAMES])
+    sheet.append([None, 'Part types ->', *PART_TYPES])
+    sheet.append([None, 'Is optional part ->', *['False'] * len(PART_NAMES)])
+    sheet.append([None, 'Part name should be in output name ->', *['True'] * len(PART_NAMES)])
+    sheet.append([None, 'Part separator ->'])
+    sheet.append(['Output plasmid id ↓', 'OutputType (optional) ↓', *['↓'] * len(PART_NAMES)])
+
+    combinations = itertools.islice(itertools.product(PROMOTERS, CDS, TERMINATORS), size)
+    for index, (promoter, cds, terminator) in enumerate(combinations, start=1):
+        sheet.append([
+            f'pBENCH{index:04d}', None,
+            FIXED_PARTS['Con1'][0], promoter, cds, terminator, FIXED_PARTS['Con2'][0], FIXED_PARTS['Backbone'][0],
+        ])
+    workbook.save(path)
+
+
+def write_correspondence(path):
+    rows = [FIXED_PARTS['Con1'], FIXED_PARTS['Con2'], FIXED_PARTS['Backbone']]
+    rows += [(part, '2') for part in PROMOTERS] + [(part, '3') for part in CDS] + [(part, '4') for part in TERMINATORS]
+    with open(path, 'w') as out:
+        out.write('pID;Name;Type\n')
+        for part, part_type in rows:
+            out.write(f'{part};{part};{part_type}\n')
+
+
+def write_sequences_zip(path, source):
+    gb_files = sorted(source.glob('**/*.gb'))
+    with zipfile.ZipFile(path, 'w') as archive:
+        for gb_file in gb_files:
+            archive.write(gb_file, gb_file.name)
+    return len(gb_files)
+
+
+def measure_run(size, source, shards=1, shard_min_rows=None):
+    """Un run complet dans le processus courant ; renvoie les phases mesurées."""
+    shard_min_rows = shard_min_rows or settings.SIMULATION_SHARD_MIN_ROWS
+    with tempfile.TemporaryDirectory() as media_root, \
+            override_settings(MEDIA_ROOT=media_root, GENBANK_PARSE_CACHE_DIR=str(Path(media_root) / 'parse_cache'),
+                              SIMULATION_CACHE_ENABLED=False, SIMULATION_SHARD_MIN_ROWS=shard_min_rows):
+        run_id = uuid.uuid4().hex[:8]
+        work_dir = get_run_dir(run_id)
+        for folder in ('template', 'correspondence', 'sequences'):
+            (work_dir / folder).mkdir(parents=True)
+        write_template(work_dir / 'template' / 'template.xlsx', size)
+        write_correspondence(work_dir / 'correspondence' / 'parts.csv')
+        write_sequences_zip(work_dir / 'sequences.zip', source)
+        payload = {
+            'template': 'template/template.xlsx',
+            'correspondence': 'correspondence/parts.csv',
+            'enzymes': None,
+            'default_concentration': 200.0,
+        }
+
+        recorder = metrics.PhaseRecorder()
+        with recorder.phase('extract') as phase:
+            phase['files'] = extract_sequences_archive(work_dir / 'sequences.zip', work_dir / 'sequences')
+        with recorder.phase('cache_key'):
+            payload['cache_key'] = simulation_cache.compute_cache_key(work_dir, payload)
+
+        start = time.perf_counter()
+        output = run_simulation(run_id, payload, max_shards=shards)
+        total = time.perf_counter() - start + sum(p['wall_s'] for p in recorder.phases.values())
+
+    phases = {**recorder.phases, **output['metrics']['phases']}
+    return {'phases': phases, 'total_s': total, 'output_files': output['metrics']['output_files']}
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the simulation pipeline on synthetic templates built from data/.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 500], help=f'Plasmids per template (max {MAX_SIZE}).')
+        parser.add_argument('--repeat', type=int, default=3, help='Runs per size (median is kept).')
+        parser.add_argument('--source', default=str(Path(settings.BASE_DIR) / 'data'), help='Folder of .gb files zipped as the sequences archive.')
+        parser.add_argument('--shards', type=int, default=1, help='Maximum shard processes per run (see sharding.py).')
+        parser.add_argument('--shard-min-rows', type=int, default=None, help='Overrides settings.SIMULATION_SHARD_MIN_ROWS.')
+        parser.add_argument('--json', dest='json_path', help='Write the results to this JSON file.')
+        parser.add_argument('--baseline', help='JSON file of a previous run to compare with.')
+
+    def _run(self, size, source, repeat, shards=1, shard_min_rows=None):
+        runs = []
+        for _ in range(repeat):
+            # Processus neuf par mesure : la mémoire mesurée ne reflète que ce run
+            with ProcessPoolExecutor(max_workers=1) as pool:
+                runs.append(pool.submit(measure_run, size, source, shards, shard_min_rows).result())
+
+        phases = {}
+        for name in runs[0]['phases']:
+            wall = metrics.percentile([run['phases'][name]['wall_s'] for run in runs], 50)
+            phases[name] = {
+                'latency_s': round(wall, 4),
+                'throughput_per_s': round(size / wall, 1) if wall else None,
+                'cpu_s': round(metrics.percentile([run['phases'][name]['cpu_s'] for run in runs], 50), 4),
+                'peak_rss_mb': round(max(run['phases'][name]['max_rss_kb'] for run in runs) / 1024, 1),
+            }
+        total = metrics.percentile([run['total_s'] for run in runs], 50)
+        return {
+            'size': size,
+            'repeat': repeat,
+            'output_files': runs[0]['output_files'],
+            'total_s': round(total, 4),
+            'plasmids_per_s': round(size / total, 1),
+            'phases': phases,
+        }
+
+    def handle(self, *args, **options):
+        source = Path(options['source'])
+        if not any(source.glob('**/*.gb')):
+            raise CommandError(f"No .gb files found under {source}")
+        sizes = options['sizes']
+        if any(size < 1 or size > MAX_SIZE for size in sizes):
+            raise CommandError(f"Sizes must be between 1 and {MAX_SIZE}")
+
+        baseline = {}
+        if options['baseline']:
+            with open(options['baseline']) as stream:
+                baseline = {result['size']: result for result in json.load(stream)['results']}
+
+        results = []
+        for size in sizes:
+            result = self._run(size, source, max(1, options['repeat']), options['shards'], options['shard_min_rows'])
+            results.append(result)
+
+            self.stdout.write(self.style.SUCCESS(
+                f"{size} plasmids: {result['total_s'] * 1000:.1f} ms total, {result['plasmids_per_s']} plasmids/s"
+            ))
+            self.stdout.write(f"  {'phase':<15} {'latency (ms)':>12} {'per second':>11} {'cpu (ms)':>9} {'peak MB':>8} {'vs baseline':>12}")
+            for name, phase in result['phases'].items():
+                previous = baseline.get(size, {}).get('phases', {}).get(name)
+                ratio = f"{previous['latency_s'] / phase['latency_s']:.2f}x" if previous and phase['latency_s'] else ''
+                throughput = phase['throughput_per_s'] if phase['throughput_per_s'] is not None else '-'
+                self.stdout.write(
+                    f"  {name:<15} {phase['latency_s'] * 1000:>12.1f} {throughput:>11} "
+                    f"{phase['cpu_s'] * 1000:>9.1f} {phase['peak_rss_mb']:>8.1f} {ratio:>12}"
+                )
+
+        if options['json_path']:
+            report = {
+                'revision': git_revision(),
+                'python': platform.python_version(),
+                'source': str(source),
+                'shards': options['shards'],
+                'results': results,
+            }
+            with open(options['json_path'], 'w') as out:
+                json.dump(report, out, indent=2)
+            self.stdout.write(f"Results written to {options['json_path']}")
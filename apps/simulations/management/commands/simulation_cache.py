@@ -0,0 +1,73 @@
+"""
+Inspection et purge du cache des résultats de simulation.
+
+Usage:
+  python manage.py simulation_cache            # liste les entrées
+  python manage.py simulation_cache --evict    # applique SIMULATION_CACHE_MAX_BYTES
+  python manage.py simulation_cache --purge    # vide le cache
+  python manage.py simulation_cache --remove <key>
+"""
+import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from apps.simulations import cache as simulation_cache
+
+
+def _human_size(size):
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024:
+            return f"{size:.0f} {unit}"
+        size /= 1024
+    return f"{size:.1f} TB"
+
+
+class Command(BaseCommand):
+    help = "Inspect, evict or purge the simulation result cache"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--purge", action="store_true", help="Delete every cache entry")
+        parser.add_argument(
+            "--evict",
+            action="store_true",
+            help="Evict least recently used entries above the size limit",
+        )
+        parser.add_argument(
+            "--max-bytes",
+            type=int,
+            default=None,
+            help="Size limit used by --evict (defaults to settings.SIMULATION_CACHE_MAX_BYTES)",
+        )
+        parser.add_argument("--remove", metavar="KEY", help="Delete a single cache entry")
+
+    def handle(self, *args, **options):
+        if options["purge"]:
+            count = simulation_cache.purge()
+            self.stdout.write(self.style.SUCCESS(f"Purged {count} cache entrie(s)"))
+            return
+
+        if options["remove"]:
+            if simulation_cache.remove(options["remove"]):
+                self.stdout.write(self.style.SUCCESS(f"Removed {options['remove']}"))
+            else:
+                self.stdout.write(self.style.WARNING(f"No cache entry {options['remove']}"))
+            return
+
+        if options["evict"]:
+            evicted = simulation_cache.evict(options["max_bytes"])
+            self.stdout.write(self.style.SUCCESS(f"Evicted {len(evicted)} cache entrie(s)"))
+
+        entries = simulation_cache.list_entries()
+        total = sum(e.get("size", 0) for e in entries)
+        self.stdout.write(
+            f"{len(entries)} entrie(s), {_human_size(total)} "
+            f"/ {_human_size(settings.SIMULATION_CACHE_MAX_BYTES)} "
+            f"in {simulation_cache.get_cache_dir()}"
+        )
+        for entry in entries:
+            last_used = datetime.datetime.fromtimestamp(entry.get("last_used", 0))
+            self.stdout.write(
+                f"  {entry['key'][:16]}  {_human_size(entry.get('size', 0)):>8}  "
+                f"hits={entry.get('hits', 0):<4} last used {last_used:%Y-%m-%d %H:%M}"
+            )
@@ -0,0 +1,52 @@
+"""
+Worker de suppression : efface en arrière-plan les campagnes dont la suppression a été demandée.
+
+Usage:
+  python manage.py simulation_deletion_worker
+  python manage.py simulation_deletion_worker --once
+"""
+from django.core.management.base import BaseCommand
+
+from apps.simulations.deletion import DeletionWorker
+
+
+class Command(BaseCommand):
+    help = "Delete campaigns marked for deletion and their simulation directories"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=None,
+            help="Directories removed in parallel (defaults to settings.SIMULATION_DELETION_WORKERS)",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=None,
+            help="Campaigns handled per batch (defaults to settings.SIMULATION_DELETION_BATCH_SIZE)",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=None,
+            help="Seconds between two polls when there is nothing to delete",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Exit once no deletion is due instead of polling forever",
+        )
+
+    def handle(self, *args, **options):
+        worker = DeletionWorker(
+            poll_interval=options["poll_interval"],
+            batch_size=options["batch_size"],
+            max_workers=options["workers"],
+            log=self.stdout.write,
+        )
+        self.stdout.write(self.style.SUCCESS("Deletion worker started"))
+        try:
+            worker.run(once=options["once"])
+        except KeyboardInterrupt:
+            self.stdout.write("Deletion worker stopped")
@@ -0,0 +1,58 @@
+"""
+Ramasse-miettes des dossiers de simulation (voir apps/simulations/retention.py).
+
+Usage:
+  python manage.py simulation_gc              # un passage
+  python manage.py simulation_gc --dry-run    # affiche ce qui serait fait
+  python manage.py simulation_gc --loop       # un passage toutes les SIMULATION_GC_INTERVAL secondes
+"""
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.template.defaultfilters import filesizeformat
+
+from apps.simulations import retention
+
+
+class Command(BaseCommand):
+    help = "Delete expired or orphaned simulation workspaces, compact old runs and enforce user quotas"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="List the planned deletions / compactions and the bytes they would reclaim",
+        )
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Run forever, one pass every --interval seconds",
+        )
+        parser.add_argument(
+            "--interval",
+            type=int,
+            default=None,
+            help="Seconds between two passes with --loop (defaults to settings.SIMULATION_GC_INTERVAL)",
+        )
+
+    def handle(self, *args, **options):
+        interval = options["interval"] or settings.SIMULATION_GC_INTERVAL
+        try:
+            while True:
+                self.collect(dry_run=options["dry_run"])
+                if not options["loop"]:
+                    return
+                time.sleep(interval)
+        except KeyboardInterrupt:
+            self.stdout.write("Simulation garbage collector stopped")
+
+    def collect(self, *, dry_run):
+        report = retention.collect(dry_run=dry_run, log=self.stdout.write)
+        for run_id, error in report.errors:
+            self.stdout.write(self.style.WARNING(f"Could not clean {run_id}: {error}"))
+        verb = "Would reclaim" if dry_run else "Reclaimed"
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {filesizeformat(report.bytes_reclaimed)}: {len(report.deleted)} workspace(s) deleted, "
+            f"{len(report.compacted)} compacted, {report.blobs_removed} blob(s) removed"
+        ))
@@ -0,0 +1,58 @@
+"""
+Worker de simulation : exécute en arrière-plan les jobs créés par le formulaire.
+
+Usage:
+  python manage.py simulation_worker
+  python manage.py simulation_worker --workers 4
+  python manage.py simulation_worker --once
+"""
+from django.core.management.base import BaseCommand
+
+from apps.simulations.jobs import SimulationWorker
+
+
+class Command(BaseCommand):
+    help = "Run queued simulations, one limited process per run"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=None,
+            help="Number of simulation processes (defaults to settings.SIMULATION_WORKERS)",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=None,
+            help="Seconds between two polls of the job queue",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Exit once the queue is empty instead of polling forever",
+        )
+        parser.add_argument(
+            "--requeue-running",
+            action="store_true",
+            help="Put jobs left 'running' by a previous worker back in the queue",
+        )
+
+    def handle(self, *args, **options):
+        worker = SimulationWorker(
+            max_workers=options["workers"],
+            poll_interval=options["poll_interval"],
+            log=self.stdout.write,
+        )
+
+        if options["requeue_running"]:
+            count = worker.requeue_running_jobs()
+            self.stdout.write(f"Requeued {count} running job(s)")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Simulation worker started with {worker.max_workers} process(es)"
+        ))
+        try:
+            worker.run(once=options["once"])
+        except KeyboardInterrupt:
+            self.stdout.write("Simulation worker stopped")
@@ -0,0 +1,129 @@
+"""
+Manifeste des entrées d'un dossier de simulation.
+
+Chaque run écrit ``MEDIA_ROOT/simulations/<run_id>/manifest.json`` au moment de
+sa soumission :
+
+    {
+        "version": 1,
+        "inputs": {
+            "template": {"path": "template/plan.xlsx", "size": 5120, "sha256": "..."},
+            "correspondence": {...},
+            "archive": {"path": "sequences.zip", ...},
+            ...
+        }
+    }
+
+Le pré-remplissage depuis l'historique et la récupération des fichiers d'un
+ancien run lisent uniquement ce fichier : plus de ``glob`` répétés sur le
+dossier (lents sur un système de fichiers réseau) ni de rôle deviné d'après le
+nom (« conc », « primer »...). Les runs antérieurs reçoivent leur manifeste
+via ``python manage.py backfill_simulation_manifests`` (``guess_inputs``).
+"""
+import json
+import os
+import pathlib
+import uuid
+
+from apps.core.utils.hashing import file_sha256
+
+MANIFEST_FILENAME = 'manifest.json'
+MANIFEST_VERSION = 1
+
+# Rôles des fichiers d'entrée ; les quatre premiers ont chacun leur sous-dossier dans le run
+ROLES = ('template', 'correspondence', 'primers', 'concentrations', 'archive')
+
+
+def manifest_path(work_dir):
+    return pathlib.Path(work_dir) / MANIFEST_FILENAME
+
+
+def describe_input(work_dir, path, sha256=None):
+    """Entrée du manifeste pour un fichier du dossier de run (``sha256`` : empreinte déjà connue)."""
+    path = pathlib.Path(path)
+    return {
+        'path': path.relative_to(work_dir).as_posix(),
+        'size': path.stat().st_size,
+        'sha256': sha256 or file_sha256(path),
+    }
+
+
+def write_manifest(work_dir, inputs, digests=None):
+    """
+    Écrit le manifeste de ``work_dir`` ; ``inputs`` associe un rôle à un chemin
+    (les rôles sans fichier sont ignorés), ``digests`` un rôle à une empreinte
+    déjà calculée. Renvoie le contenu écrit.
+    """
+    work_dir = pathlib.Path(work_dir)
+    digests = digests or {}
+    manifest = {
+        'version': MANIFEST_VERSION,
+        'inputs': {
+            role: describe_input(work_dir, path, digests.get(role))
+            for role, path in inputs.items()
+            if path
+        },
+    }
+    # Écriture atomique : un pré-remplissage concurrent ne lit jamais un fichier à moitié écrit
+    tmp_path = work_dir / f'.{MANIFEST_FILENAME}.{uuid.uuid4().hex}'
+    with open(tmp_path, 'w') as stream:
+        json.dump(manifest, stream, indent=2)
+    os.replace(tmp_path, manifest_path(work_dir))
+    return manifest
+
+
+def read_manifest(work_dir):
+    """Contenu du manifeste, ou None si le run n'en a pas (ou s'il est illisible)."""
+    try:
+        with open(manifest_path(work_dir)) as stream:
+            return json.load(stream)
+    except (OSError, ValueError):
+        return None
+
+
+def input_path(work_dir, role, manifest=None):
+    """Chemin absolu du fichier de ``role`` d'après le manifeste, ou None."""
+    if manifest is None:
+        manifest = read_manifest(work_dir)
+    entry = (manifest or {}).get('inputs', {}).get(role)
+    return pathlib.Path(work_dir) / entry['path'] if entry else None
+
+
+# ==========================================
+# RUNS ANTÉRIEURS AU MANIFESTE
+# ==========================================
+
+def guess_inputs(work_dir):
+    """
+    Retrouve les entrées d'un ancien run comme le faisait le pré-remplissage :
+    sous-dossier dédié s'il existe, sinon d'après le nom des fichiers à la racine.
+    Utilisé uniquement par la commande de rattrapage.
+    """
+    work_dir = pathlib.Path(work_dir)
+    root_csv = sorted(work_dir.glob('*.csv'))
+    legacy = {
+        'template': sorted(work_dir.glob('*template*.*')) + sorted(work_dir.glob('*.xlsx')),
+        'correspondence': [f for f in root_csv if 'conc' not in f.name.lower() and 'primer' not in f.name.lower()],
+        'primers': [f for f in root_csv if 'primer' in f.name.lower()],
+        'concentrations': [f for f in root_csv if 'conc' in f.name.lower()],
+    }
+
+    inputs = {}
+    for role, candidates in legacy.items():
+        subfolder = work_dir / role
+        if subfolder.is_dir():
+            candidates = sorted(path for path in subfolder.iterdir() if path.is_file())
+        if candidates:
+            inputs[role] = candidates[0]
+
+    archives = [path for path in sorted(work_dir.glob('*.zip')) if 'tout_telecharger' not in path.name]
+    if archives:
+        inputs['archive'] = archives[0]
+    return inputs
+
+
+def backfill(work_dir, *, overwrite=False):
+    """Écrit le manifeste d'un ancien run. Renvoie le manifeste, ou None s'il existait déjà."""
+    if not overwrite and manifest_path(work_dir).exists():
+        return None
+    return write_manifest(work_dir, guess_inputs(work_dir))
@@ -0,0 +1,220 @@
+"""
+Mesure des phases d'une simulation.
+
+Chaque phase (upload des fichiers, vérification préalable, extraction du zip, export des collections,
+mise en file, puis compute_all et préparation des résultats côté worker) est
+chronométrée : temps réel, temps CPU du processus et mémoire résidente propre
+à la phase. Le pic ``ru_maxrss`` couvre toute la vie du processus (requêtes
+précédentes du processus web, autres runs du worker) : sous Linux, le pic est
+remis à zéro au début de chaque phase (``/proc/self/clear_refs``) puis relu à
+la fin (``VmHWM``). Ailleurs, la phase ne reçoit ``ru_maxrss`` que si le pic a
+augmenté pendant elle, sinon la plus grande des RSS de début et de fin. Les
+processus enfants attendus pendant la phase (shards de compute_all) comptent
+avec leur propre pic (``RUSAGE_CHILDREN``). ``rss_delta_kb`` est la variation
+de RSS entre le début et la fin de la phase. Les mesures sont enregistrées
+dans ``Campaign.results_data['metrics']`` :
+
+    {
+        'web': {'phases': {...}, 'input_files': 12},
+        'worker': {'phases': {...}, 'output_files': 40, 'queue_wait_s': 1.2},
+    }
+
+``aggregate_metrics`` les agrège sur plusieurs campagnes (percentiles par phase,
+médiane par semaine) pour la page d'administration ``simulation_metrics_view``.
+"""
+import contextlib
+import resource
+import sys
+import time
+from collections import defaultdict
+
+# Ordre d'affichage des phases connues ; les autres suivent par ordre alphabétique
+PHASES = (
+    'upload', 'preflight', 'extract', 'collections', 'collection_import', 'enqueue',
+    'parse_template', 'compute', 'fingerprint', 'finalize', 'cache_store',
+)
+PERCENTILES = (50, 90, 95)
+
+
+def _kb(rss):
+    # ru_maxrss est en octets sous macOS, en Kio ailleurs
+    return rss // 1024 if sys.platform == 'darwin' else rss
+
+
+def max_rss_kb(who=resource.RUSAGE_SELF):
+    """Pic de mémoire résidente (``ru_maxrss``) du processus ou de ses enfants attendus, en Kio."""
+    return _kb(resource.getrusage(who).ru_maxrss)
+
+
+def current_rss_kb():
+    """Mémoire résidente actuelle du processus en Kio (0 si /proc n'est pas disponible)."""
+    try:
+        with open('/proc/self/statm') as stream:
+            resident_pages = int(stream.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return 0
+    return resident_pages * resource.getpagesize() // 1024
+
+
+def reset_peak_rss():
+    """Remet à zéro le pic de RSS du processus (Linux >= 4.0). Renvoie False si impossible."""
+    try:
+        with open('/proc/self/clear_refs', 'w') as stream:
+            stream.write('5')
+    except OSError:
+        return False
+    return True
+
+
+def peak_rss_kb():
+    """Pic de RSS depuis le dernier ``reset_peak_rss`` (VmHWM), ou None."""
+    try:
+        with open('/proc/self/status') as stream:
+            for line in stream:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1])
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+class _MemoryProbe:
+    """Mémoire d'une phase : pic propre à la phase et variation de RSS."""
+
+    def __init__(self):
+        self.reset = reset_peak_rss()
+        self.rss_start = current_rss_kb()
+        self.maxrss_start = max_rss_kb()
+        self.children_start = max_rss_kb(resource.RUSAGE_CHILDREN)
+
+    def stop(self):
+        rss_end = current_rss_kb()
+        peak = peak_rss_kb() if self.reset else None
+        if peak is None:
+            maxrss = max_rss_kb()
+            peak = maxrss if maxrss > self.maxrss_start else max(self.rss_start, rss_end)
+        children = max_rss_kb(resource.RUSAGE_CHILDREN)
+        if children > self.children_start:
+            peak = max(peak, children)
+        return peak, rss_end - self.rss_start
+
+
+def count_files(directory, pattern='*'):
+    return sum(1 for path in directory.glob(pattern) if path.is_file()) if directory.is_dir() else 0
+
+
+class PhaseRecorder:
+    """
+    Chronomètre des phases successives d'un run.
+
+    Utilisation :
+        recorder = PhaseRecorder()
+        with recorder.phase('extract') as phase:
+            ...
+            phase['files'] = 12
+        recorder.as_dict()
+    """
+
+    def __init__(self):
+        self.phases = {}
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        extra = {}
+        memory = _MemoryProbe()
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        try:
+            yield extra
+        finally:
+            peak, delta = memory.stop()
+            # Une phase répétée (ex. plusieurs fichiers) cumule ses temps et garde son plus haut pic
+            previous = self.phases.get(name, {})
+            self.phases[name] = {
+                **previous,
+                **extra,
+                'wall_s': round(previous.get('wall_s', 0) + time.perf_counter() - wall_start, 4),
+                'cpu_s': round(previous.get('cpu_s', 0) + time.process_time() - cpu_start, 4),
+                'max_rss_kb': max(previous.get('max_rss_kb', 0), peak),
+                'rss_delta_kb': previous.get('rss_delta_kb', 0) + delta,
+            }
+
+    def as_dict(self, **extra):
+        return {'phases': self.phases, **extra}
+
+
+def store_metrics(campaign, section, data):
+    """Enregistre une section ('web' ou 'worker') des mesures d'une Campaign sans écraser le reste."""
+    if campaign is None:
+        return
+    campaign.refresh_from_db(fields=['results_data'])
+    results_data = campaign.results_data or {}
+    metrics = results_data.get('metrics', {})
+    metrics[section] = data
+    campaign.results_data = {**results_data, 'metrics': metrics}
+    campaign.save(update_fields=['results_data'])
+
+
+# ==========================================
+# AGRÉGATION (page d'administration)
+# ==========================================
+
+def percentile(values, q):
+    """Percentile ``q`` (0-100) par interpolation linéaire ; None si aucune valeur."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * q / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def _phase_order(name):
+    return (PHASES.index(name), name) if name in PHASES else (len(PHASES), name)
+
+
+def aggregate_metrics(rows):
+    """
+    Agrège des couples ``(created_at, results_data)``.
+
+    Renvoie ``{'runs', 'phases', 'weeks'}`` : par phase, le nombre de mesures,
+    les percentiles du temps réel, la médiane du temps CPU et le pic mémoire ;
+    par semaine, la médiane du temps total (web + worker) pour repérer les régressions.
+    """
+    by_phase = defaultdict(lambda: {'wall': [], 'cpu': [], 'rss': []})
+    by_week = defaultdict(list)
+    runs = 0
+
+    for created_at, results_data in rows:
+        metrics = (results_data or {}).get('metrics')
+        if not metrics:
+            continue
+        runs += 1
+        total = 0.0
+        for section in ('web', 'worker'):
+            for name, phase in metrics.get(section, {}).get('phases', {}).items():
+                by_phase[name]['wall'].append(phase['wall_s'])
+                by_phase[name]['cpu'].append(phase['cpu_s'])
+                by_phase[name]['rss'].append(phase.get('max_rss_kb', 0))
+                total += phase['wall_s']
+        year, week, _ = created_at.isocalendar()
+        by_week[(year, week)].append(total)
+
+    phases = []
+    for name in sorted(by_phase, key=_phase_order):
+        values = by_phase[name]
+        phases.append({
+            'name': name,
+            'count': len(values['wall']),
+            'wall': {f'p{q}': percentile(values['wall'], q) for q in PERCENTILES},
+            'wall_max': max(values['wall']),
+            'cpu_p50': percentile(values['cpu'], 50),
+            'rss_max_mb': max(values['rss']) / 1024,
+        })
+
+    weeks = [
+        {'week': f"{year}-W{week:02d}", 'runs': len(totals), 'total_p50': percentile(totals, 50)}
+        for (year, week), totals in sorted(by_week.items())
+    ]
+    return {'runs': runs, 'phases': phases, 'weeks': weeks}
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:02
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('simulations', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SimulationJob',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('run_id', models.CharField(max_length=50, unique=True, verbose_name="ID d'exécution (Dossier)")),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], db_index=True, default='queued', max_length=20)),
+                ('payload', models.JSONField(blank=True, default=dict, verbose_name="Paramètres d'exécution")),
+                ('error', models.TextField(blank=True, verbose_name="Message d'erreur")),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('campaign', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='simulation_job', to='simulations.campaign')),
+                ('owner', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='simulation_jobs', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Simulation Job',
+                'verbose_name_plural': 'Simulation Jobs',
+                'ordering': ('created_at',),
+            },
+        ),
+    ]
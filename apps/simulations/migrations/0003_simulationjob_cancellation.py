@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('simulations', '0002_simulationjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='simulationjob',
+            name='cancel_requested',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='simulationjob',
+            name='termination_reason',
+            field=models.CharField(blank=True, max_length=20, verbose_name="Raison de l'arrêt"),
+        ),
+        migrations.AlterField(
+            model_name='simulationjob',
+            name='status',
+            field=models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed'), ('cancelled', 'Cancelled')], db_index=True, default='queued', max_length=20),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:34
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('simulations', '0003_simulationjob_cancellation'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SimulationBatch',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('batch_id', models.CharField(max_length=50, unique=True, verbose_name='ID du lot')),
+                ('name', models.CharField(max_length=200, verbose_name='Nom du lot')),
+                ('parameters', models.JSONField(blank=True, default=dict, verbose_name='Paramètres partagés')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('owner', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='simulation_batches', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Simulation Batch',
+                'verbose_name_plural': 'Simulation Batches',
+                'ordering': ('-created_at',),
+            },
+        ),
+        migrations.AddField(
+            model_name='simulationjob',
+            name='batch',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='jobs', to='simulations.simulationbatch'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('simulations', '0004_simulationbatch'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='campaign',
+            name='deletion_attempts',
+            field=models.PositiveIntegerField(default=0, verbose_name='Tentatives de suppression'),
+        ),
+        migrations.AddField(
+            model_name='campaign',
+            name='deletion_error',
+            field=models.TextField(blank=True, verbose_name='Erreur de suppression'),
+        ),
+        migrations.AddField(
+            model_name='campaign',
+            name='deletion_requested_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True, verbose_name='Suppression demandée le'),
+        ),
+        migrations.AddField(
+            model_name='campaign',
+            name='deletion_retry_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Prochaine tentative'),
+        ),
+    ]
@@ -22,6 +22,15 @@ class CampaignTemplate(models.Model):
         return self.name
 
 
+class CampaignQuerySet(models.QuerySet):
+    def visible(self):
+        """Campagnes dont la suppression n'a pas été demandée (voir deletion.py)."""
+        return self.filter(deletion_requested_at__isnull=True)
+
+    def pending_deletion(self):
+        return self.filter(deletion_requested_at__isnull=False)
+
+
 class Campaign(models.Model):
     """
     Modèle représentant une simulation lancée par un utilisateur.
@@ -85,6 +94,15 @@ class Campaign(models.Model):
     results_data = models.JSONField(default=dict, blank=True, verbose_name="Données de résultats")
     output_files = models.JSONField(default=dict, blank=True, verbose_name="Liste des fichiers générés")
 
+    # Suppression asynchrone : la campagne est masquée dès la demande, puis le
+    # worker de suppression efface son dossier et ses lignes (voir deletion.py)
+    deletion_requested_at = models.DateTimeField(null=True, blank=True, db_index=True, verbose_name="Suppression demandée le")
+    deletion_attempts = models.PositiveIntegerField(default=0, verbose_name="Tentatives de suppression")
+    deletion_error = models.TextField(blank=True, verbose_name="Erreur de suppression")
+    deletion_retry_at = models.DateTimeField(null=True, blank=True, verbose_name="Prochaine tentative")
+
+    objects = CampaignQuerySet.as_manager()
+
     class Meta:
         ordering = ('-created_at',) # Trie du plus récent au plus ancien
         verbose_name = "Campaign"
@@ -122,4 +140,114 @@ class CampaignResult(models.Model):
         verbose_name_plural = "Campaign Results"
 
     def __str__(self):
-        return f"Result of {self.campaign.name}"
\ No newline at end of file
+        return f"Result of {self.campaign.name}"
+
+class SimulationBatch(models.Model):
+    """
+    Lot de simulations soumises ensemble : plusieurs templates, un seul jeu
+    d'entrées partagées (table de correspondance, séquences, primers...).
+    Les entrées communes sont préparées une fois ; chaque template devient un
+    SimulationJob (et une Campaign pour un utilisateur connecté) rattaché au lot.
+    """
+    id = models.AutoField(primary_key=True)
+    batch_id = models.CharField(max_length=50, unique=True, verbose_name="ID du lot")
+    name = models.CharField(max_length=200, verbose_name="Nom du lot")
+    owner = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='simulation_batches'
+    )
+    # Paramètres communs à tous les runs du lot
+    parameters = models.JSONField(default=dict, blank=True, verbose_name="Paramètres partagés")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ('-created_at',)
+        verbose_name = "Simulation Batch"
+        verbose_name_plural = "Simulation Batches"
+
+    def __str__(self):
+        return f"Batch {self.batch_id} - {self.name}"
+
+
+class SimulationJob(models.Model):
+    """
+    File d'attente des simulations.
+
+    Chaque soumission du formulaire crée un job "queued" ; le worker
+    (``python manage.py simulation_worker``) le récupère, exécute
+    ``compute_all`` dans un processus séparé et met à jour son statut.
+    Les runs anonymes n'ont pas de Campaign : le job est alors retrouvé via run_id.
+    """
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CANCELLED = 'cancelled'
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, 'Queued'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_DONE, 'Done'),
+        (STATUS_FAILED, 'Failed'),
+        (STATUS_CANCELLED, 'Cancelled'),
+    ]
+    FINISHED_STATUSES = (STATUS_DONE, STATUS_FAILED, STATUS_CANCELLED)
+
+    # Raisons d'arrêt d'un run (voir jobs.py)
+    REASON_ERROR = 'error'
+    REASON_CANCELLED = 'cancelled'
+    REASON_TIMEOUT = 'timeout'
+    REASON_CPU_LIMIT = 'cpu_limit'
+    REASON_MEMORY_LIMIT = 'memory_limit'
+    REASON_CRASHED = 'crashed'
+
+    id = models.AutoField(primary_key=True)
+    run_id = models.CharField(max_length=50, unique=True, verbose_name="ID d'exécution (Dossier)")
+
+    campaign = models.OneToOneField(
+        Campaign,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='simulation_job'
+    )
+    owner = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='simulation_jobs'
+    )
+    batch = models.ForeignKey(
+        SimulationBatch,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='jobs'
+    )
+
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_QUEUED, db_index=True)
+    # Chemins (relatifs au dossier du run) et paramètres passés à compute_all
+    payload = models.JSONField(default=dict, blank=True, verbose_name="Paramètres d'exécution")
+    error = models.TextField(blank=True, verbose_name="Message d'erreur")
+    termination_reason = models.CharField(max_length=20, blank=True, verbose_name="Raison de l'arrêt")
+    # Annulation demandée pendant l'exécution : le worker tue le processus au prochain tour
+    cancel_requested = models.BooleanField(default=False)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ('created_at',)  # FIFO
+        verbose_name = "Simulation Job"
+        verbose_name_plural = "Simulation Jobs"
+
+    def __str__(self):
+        return f"Job {self.id} ({self.run_id}) - {self.status}"
+
+    @property
+    def is_finished(self):
+        return self.status in self.FINISHED_STATUSES
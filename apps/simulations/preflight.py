@@ -0,0 +1,258 @@
+"""
+Vérification rapide d'une simulation avant sa mise en file.
+
+Sans cette étape, une part introuvable n'est découverte que pendant
+compute_all, parfois après plusieurs minutes, et une seule à la fois.
+``check_inputs`` lit le template et la table de correspondance, puis résout
+chaque part de chaque plasmide comme le fait InSillyClo
+(``fetch_gb_for_input_parts`` puis ``instantiate_plasmid_to_assemble``),
+mais contre un simple index des noms de fichiers .gb disponibles :
+aucune séquence n'est lue. Tous les problèmes sont rapportés d'un coup.
+
+Une part résolue par plusieurs séquences n'est qu'un avertissement :
+compute_all l'accepte (le dernier fichier l'emporte), le run est mis en file.
+
+L'index est construit sans rien écrire sur le disque : liste des entrées de
+l'archive zip (``names_from_zip``) ou noms des fichiers qu'exportera une
+sélection de collections (``names_from_plasmids``).
+"""
+import csv
+import functools
+import pathlib
+import tempfile
+import zipfile
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import List
+
+from apps.plasmids.service import genbank_basename
+
+from . import archives
+
+# Nombre de problèmes détaillés dans le message d'erreur
+MAX_REPORTED = 20
+
+
+class PreflightError(Exception):
+    """Entrées de simulation invalides ; ``report`` détaille tous les problèmes."""
+
+    def __init__(self, report):
+        super().__init__(report.summary())
+        self.report = report
+
+
+@dataclass
+class PreflightReport:
+    plasmids: int = 0
+    errors: List[str] = field(default_factory=list)
+    # (plasmid_id, part) sans séquence disponible
+    missing: List[tuple] = field(default_factory=list)
+    # (plasmid_id, part, fichiers candidats) résolus par plusieurs séquences
+    ambiguous: List[tuple] = field(default_factory=list)
+
+    @property
+    def ok(self):
+        """Pas de problème bloquant (les parts ambiguës ne bloquent pas le run)."""
+        return not (self.errors or self.missing)
+
+    def problems(self):
+        """Un message par problème bloquant : erreurs de lecture, puis parts introuvables."""
+        lines = list(self.errors)
+        lines += [f"{plasmid_id}: no sequence found for part '{part}'" for plasmid_id, part in self.missing]
+        return lines
+
+    def warnings(self):
+        """Un message par part ambiguë : compute_all retiendra le dernier fichier."""
+        return [
+            f"{plasmid_id}: part '{part}' matches several sequences ({', '.join(files)}), the last one will be used"
+            for plasmid_id, part, files in self.ambiguous
+        ]
+
+    def summary(self):
+        problems = self.problems()
+        shown = problems[:MAX_REPORTED]
+        if len(problems) > len(shown):
+            shown.append(f"... and {len(problems) - len(shown)} more problem(s)")
+        return "\n".join(shown)
+
+
+@functools.lru_cache(maxsize=None)
+def _collecting_observer_class():
+    # Classe construite à la première vérification : InSillyClo n'est pas importé avec les vues
+    import insillyclo.observer
+
+    class _CollectingObserver(insillyclo.observer.InSillyCloCliObserver):
+        """Observer du parseur : garde les problèmes signalés au lieu d'arrêter la lecture."""
+
+        def __init__(self):
+            super().__init__(debug=False, fail_on_error=False)
+            self.missing_input_parts = []
+
+        def is_fail_on_error(self):
+            return False
+
+        def notify_missing_input_part(self, *, plasmid_id, row_id, content):
+            self.missing_input_parts.append((plasmid_id, content))
+
+    return _CollectingObserver
+
+
+# ==========================================
+# 1. INDEX DES SÉQUENCES DISPONIBLES
+# ==========================================
+
+def names_from_zip(path_zip):
+    """Noms des fichiers .gb d'une archive (ceux qu'écrira archives.extract_sequences)."""
+    try:
+        with zipfile.ZipFile(path_zip) as archive:
+            return [path.name for _, path in archives.sequence_members(archive)]
+    except zipfile.BadZipFile:
+        raise archives.ArchiveError(f"'{pathlib.Path(path_zip).name}' is not a valid zip archive.")
+
+
+def names_from_plasmids(plasmids):
+    """Noms des fichiers qu'écrira export_plasmids_to_dir pour ces plasmides."""
+    return [f"{genbank_basename(plasmid.identifier)}.gb" for plasmid in plasmids]
+
+
+# ==========================================
+# 2. VÉRIFICATION
+# ==========================================
+
+def _read_correspondence(path, report):
+    """(nom, type) -> fichiers .gb, avec les mêmes règles que fetch_gb_for_input_parts."""
+    import insillyclo.cli_utils
+
+    mapping = {}
+    with open(path, 'r') as stream:
+        delimiter = insillyclo.cli_utils.get_csv_delimiter(stream)
+        reader = csv.reader(stream, delimiter=delimiter)
+        header = next(reader, [])
+        if header[:3] == ['pID', 'Name', 'Type']:
+            typed = True
+        elif header[:2] == ['pID', 'Name']:
+            typed = False
+        else:
+            report.errors.append(
+                f"Correspondence table: unexpected header {header[:3]} (expected pID, Name and optionally Type)."
+            )
+            return mapping
+        for row_number, row in enumerate(reader, start=2):
+            if not row:
+                continue
+            if len(row) < (3 if typed else 2):
+                report.errors.append(f"Correspondence table, line {row_number}: missing columns.")
+                continue
+            key = (row[1].strip(), row[2].strip() if typed else None)
+            filename = row[0] if row[0].endswith('.gb') else f"{row[0]}.gb"
+            files = mapping.setdefault(key, [])
+            if filename not in files:
+                files.append(filename)
+    return mapping
+
+
+def _parse_template(path, observer, **kwargs):
+    # Import différé : le parseur tire pandas, chargé seulement à la première soumission
+    import insillyclo.models
+    import insillyclo.parser
+
+    return insillyclo.parser.parse_assembly_and_plasmid_from_template(
+        path,
+        input_part_factory=insillyclo.models.InputPartDataClassFactory(),
+        assembly_factory=insillyclo.models.AssemblyDataClassFactory(),
+        plasmid_factory=insillyclo.models.PlasmidDataClassFactory(),
+        observer=observer,
+        **kwargs,
+    )
+
+
+def _parse_complete_rows(template_path, observer, report):
+    """
+    Plasmides du template. Les lignes où manque une part obligatoire sont
+    rapportées (toutes) puis écartées avant la lecture par le parseur
+    d'InSillyClo, qui s'arrête à la première : ``observer.is_fail_on_error``
+    y est testé sans être appelé (insillyclo 1.1.0), donc toujours vrai.
+    """
+    import openpyxl
+
+    from .sharding import OUTPUT_HEADER
+
+    assembly, _ = _parse_template(template_path, observer, load_only_assembly=True)
+    workbook = openpyxl.load_workbook(template_path)
+    sheet = workbook.worksheets[0]
+    header_row = next(cell.row for cell in sheet['A'] if cell.value == OUTPUT_HEADER)
+
+    incomplete = []
+    for row in sheet.iter_rows(min_row=header_row + 1):
+        values = [cell.value for cell in row]
+        missing = [
+            input_part.name for column, input_part in enumerate(assembly.input_parts, start=2)
+            if not input_part.is_optional and (column >= len(values) or values[column] is None)
+        ]
+        if missing and any(value is not None for value in values):
+            incomplete.append(row[0].row)
+            report.errors += [
+                f"{values[0]}: required part '{part}' is empty in the template" for part in missing
+            ]
+    if not incomplete:
+        return _parse_template(template_path, observer)[1]
+
+    for row_number in sorted(incomplete, reverse=True):
+        sheet.delete_rows(row_number)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        complete = pathlib.Path(tmp_dir) / pathlib.Path(template_path).name
+        workbook.save(complete)
+        return _parse_template(complete, observer)[1]
+
+
+def _candidates(part_n_type, mapping, available):
+    """Fichiers disponibles pour un couple (nom, type)."""
+    import insillyclo.models
+
+    name, part_type = part_n_type
+    files = list(mapping.get(part_n_type, []))
+    if part_type == insillyclo.models.get_direct_identifier() and f"{name}.gb" not in files:
+        files.append(f"{name}.gb")
+    return [filename for filename in files if available[filename]]
+
+
+def check_inputs(template_path, correspondence_path, available_names):
+    """
+    Résout toutes les parts du template contre ``available_names`` (noms de
+    fichiers .gb, un par fichier : un doublon rend la part ambiguë).
+    Renvoie un PreflightReport.
+    """
+    report = PreflightReport()
+    available = Counter(available_names)
+    if not available:
+        report.errors.append("No .gb files found in the provided sequences.")
+        return report
+
+    observer = _collecting_observer_class()()
+    try:
+        plasmids = _parse_complete_rows(template_path, observer, report)
+    except Exception as e:
+        report.errors.append(f"Template could not be read: {str(e) or type(e).__name__}")
+        return report
+    report.plasmids = len(plasmids)
+    report.errors += [
+        f"{plasmid_id}: required part '{part}' is empty in the template" for plasmid_id, part in observer.missing_input_parts
+    ]
+
+    mapping = _read_correspondence(correspondence_path, report)
+
+    for plasmid in plasmids:
+        for part_instance, input_part in plasmid.parts:
+            # Comme instantiate_plasmid_to_assemble : la première interprétation entièrement résolue est retenue
+            for interpretation in input_part.get_possible_interpretation(part_instance):
+                candidates = [_candidates(part_n_type, mapping, available) for part_n_type in interpretation]
+                if all(candidates):
+                    break
+            else:
+                report.missing.append((plasmid.plasmid_id, part_instance))
+                continue
+
+            for files in candidates:
+                if len(files) > 1 or available[files[0]] > 1:
+                    report.ambiguous.append((plasmid.plasmid_id, part_instance, files))
+    return report
@@ -0,0 +1,249 @@
+"""
+Suivi de l'avancement d'une simulation pendant compute_all.
+
+``ProgressObserver`` remplace l'InSillyCloCliObserver passé à compute_all : il
+journalise toujours les problèmes signalés (notify_*), et les enregistre aussi
+comme événements dans ``progress.jsonl`` à la racine du run. L'observer
+d'InSillyClo n'a pas de hook par assemblage : un thread surveille donc
+``results/`` et émet un événement à chaque ``<plasmid_id>.gb`` écrit (compute_all
+écrit le .gb de chaque plasmide dès qu'il est assemblé).
+
+Le fichier est en ajout seul, une ligne JSON par événement, numérotées par
+``seq`` : la vue de statut (``simulation_status_view?after=<seq>``) renvoie les
+événements qui suivent le dernier numéro reçu par la page. Seul le processus du
+pool y écrit.
+
+Le processus web ne fait que lire progress.jsonl : InSillyClo n'est importé qu'à
+la première utilisation de ``ProgressObserver`` (classe construite à la demande,
+voir ``_observer_class``), dans le processus du pool.
+"""
+import functools
+import inspect
+import json
+import pathlib
+import threading
+import time
+
+PROGRESS_FILENAME = 'progress.jsonl'
+WATCH_INTERVAL = 0.5
+
+# Événements qui terminent le flux
+TERMINAL_EVENTS = ('finished', 'failed')
+
+
+def count_template_plasmids(template_path):
+    """Nombre de plasmides à assembler d'après le template (None si illisible : compute_all signalera l'erreur)."""
+    # Import différé : le parseur tire pandas, inutile au processus web qui lit progress.jsonl
+    import insillyclo.models
+    import insillyclo.observer
+    import insillyclo.parser
+
+    try:
+        _, plasmids = insillyclo.parser.parse_assembly_and_plasmid_from_template(
+            template_path,
+            input_part_factory=insillyclo.models.InputPartDataClassFactory(),
+            assembly_factory=insillyclo.models.AssemblyDataClassFactory(),
+            plasmid_factory=insillyclo.models.PlasmidDataClassFactory(),
+            observer=insillyclo.observer.InSillyCloCliObserver(debug=False, fail_on_error=False),
+        )
+    except Exception:
+        return None
+    return len(plasmids)
+
+
+# ==========================================
+# 1. STOCKAGE (progress.jsonl)
+# ==========================================
+
+class ProgressStore:
+    """Écriture des événements d'un run ; sûre entre threads d'un même processus."""
+
+    def __init__(self, work_dir):
+        self.path = pathlib.Path(work_dir) / PROGRESS_FILENAME
+        self._lock = threading.Lock()
+        # Reprise d'un job relancé dans le même dossier : la numérotation continue
+        self._seq = 0
+        if self.path.is_file():
+            with open(self.path, 'rb') as stream:
+                self._seq = sum(1 for line in stream if line.endswith(b'\n'))
+
+    def append(self, event_type, **data):
+        with self._lock:
+            self._seq += 1
+            event = {'seq': self._seq, 'type': event_type, 'time': time.time(), **data}
+            with open(self.path, 'a', encoding='utf-8') as stream:
+                stream.write(json.dumps(event, ensure_ascii=False, default=str) + '\n')
+            return event
+
+
+def read_events(work_dir, *, after=0, offset=0):
+    """
+    Événements de numéro > ``after``, lus à partir de l'octet ``offset``.
+    Renvoie ``(événements, nouvel offset)`` ; une ligne incomplète (écriture en cours) est laissée pour plus tard.
+    """
+    path = pathlib.Path(work_dir) / PROGRESS_FILENAME
+    events = []
+    try:
+        with open(path, 'rb') as stream:
+            stream.seek(offset)
+            for line in stream:
+                if not line.endswith(b'\n'):
+                    break
+                offset += len(line)
+                event = json.loads(line)
+                if event['seq'] > after:
+                    events.append(event)
+    except FileNotFoundError:
+        pass
+    return events, offset
+
+
+# ==========================================
+# 2. OBSERVER INSTRUMENTÉ
+# ==========================================
+
+# notify_* de l'observer CLI enregistrés comme événements, avec leur niveau
+RECORDED_NOTIFICATIONS = (
+    ('notify_missing_input_part', 'error'),
+    ('notify_invalide_part_types', 'error'),
+    ('notify_invalide_parts_file', 'error'),
+    ('notify_missing_sequence_for_input_part', 'error'),
+    ('notify_missing_mass_concentration', 'error'),
+    ('notify_skipped_dilution', 'error'),
+    ('notify_concentration_issue_for_dilution', 'error'),
+    ('notify_exceeded_produced_volume_with_dilution', 'warning'),
+    ('notify_unknown_digestion_enzyme', 'error'),
+    ('notify_input_part_name_used_as_identifier', 'info'),
+    ('notify_csv_delimiter_not_found', 'info'),
+)
+
+
+def _recorded(base, name, level):
+    """Méthode notify_* qui enregistre l'événement puis délègue à l'observer CLI (logging)."""
+    parent = getattr(base, name)
+    signature = inspect.signature(parent)
+
+    def method(self, *args, **kwargs):
+        arguments = signature.bind(self, *args, **kwargs).arguments
+        arguments.pop('self')
+        self.store.append('issue', level=level, kind=name[len('notify_'):], details=arguments)
+        return parent(self, *args, **kwargs)
+
+    method.__name__ = name
+    return method
+
+
+@functools.lru_cache(maxsize=None)
+def _observer_class():
+    """Construit ``ProgressObserver`` sur l'InSillyCloCliObserver (import différé, une seule fois par processus)."""
+    import insillyclo.observer
+
+    base = insillyclo.observer.InSillyCloCliObserver
+    methods = {name: _recorded(base, name, level) for name, level in RECORDED_NOTIFICATIONS}
+    return type('ProgressObserver', (_ProgressObserverMixin, base), {
+        '__doc__': _ProgressObserverMixin.__doc__,
+        '__module__': __name__,
+        **methods,
+    })
+
+
+def __getattr__(name):
+    # ``progress.ProgressObserver`` : la classe n'existe qu'une fois InSillyClo importé
+    if name == 'ProgressObserver':
+        return _observer_class()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+class _ProgressObserverMixin:
+    """
+    Observer de compute_all qui publie l'avancement dans progress.jsonl.
+
+    Utilisation :
+        observer = ProgressObserver(work_dir, fail_on_error=True)
+        with observer.track(output_dir, total=n):
+            compute_all(observer=observer, ...)
+        observer.finished()
+    """
+
+    def __init__(self, work_dir, *, debug=False, fail_on_error=None, watch_interval=WATCH_INTERVAL):
+        super().__init__(debug=debug, fail_on_error=fail_on_error)
+        self.store = ProgressStore(work_dir)
+        self.watch_interval = watch_interval
+        self.total = None
+        self.assembled = 0
+        self._seen = set()
+        self._stop = threading.Event()
+        self._watcher = None
+        self._output_dir = None
+
+    # --- Surveillance des .gb produits ---
+
+    def _scan(self, output_dir):
+        # rglob : les shards d'un gros template écrivent dans results/.shards/<n>/results/
+        try:
+            gb_files = sorted(output_dir.rglob('*.gb'))
+        except FileNotFoundError:
+            # Dossier d'un shard supprimé pendant le parcours : repris au tour suivant
+            return
+        for gb_file in gb_files:
+            if gb_file.name in self._seen:
+                continue
+            self._seen.add(gb_file.name)
+            self.assembled += 1
+            self.store.append('assembly', plasmid_id=gb_file.stem, done=self.assembled, total=self.total)
+
+    def _watch(self, output_dir):
+        while not self._stop.wait(self.watch_interval):
+            self._scan(output_dir)
+
+    def start(self, output_dir, *, total=None):
+        output_dir = pathlib.Path(output_dir)
+        self.total = total
+        # Fichiers déjà présents (ex. relance dans le même dossier) : pas des assemblages de ce run
+        self._seen = {gb_file.name for gb_file in output_dir.rglob('*.gb')}
+        self._output_dir = output_dir
+        self.store.append('started', total=total)
+        self._stop.clear()
+        self._watcher = threading.Thread(target=self._watch, args=(output_dir,), daemon=True)
+        self._watcher.start()
+
+    def stop(self):
+        if self._watcher is None:
+            return
+        self._stop.set()
+        self._watcher.join()
+        self._watcher = None
+        # Dernier passage : les .gb écrits depuis le dernier tour
+        self._scan(self._output_dir)
+
+    def track(self, output_dir, *, total=None):
+        return _Tracking(self, output_dir, total)
+
+    # --- Événements de fin ---
+
+    def finished(self, **data):
+        self.store.append('finished', done=self.assembled, total=self.total, **data)
+
+    def failed(self, message):
+        self.store.append('failed', message=message, done=self.assembled, total=self.total)
+
+
+class _Tracking:
+    """Contexte de ``ProgressObserver.track`` : démarre la surveillance, enregistre l'échec éventuel."""
+
+    def __init__(self, observer, output_dir, total):
+        self.observer = observer
+        self.output_dir = output_dir
+        self.total = total
+
+    def __enter__(self):
+        self.observer.start(self.output_dir, total=self.total)
+        return self.observer
+
+    def __exit__(self, exc_type, exc, tb):
+        self.observer.stop()
+        if exc is not None:
+            self.observer.failed(str(exc) or exc_type.__name__)
+        else:
+            self.observer.store.append('computed', done=self.observer.assembled, total=self.total)
+        return False
@@ -0,0 +1,326 @@
+"""
+Rétention des dossiers de simulation (``MEDIA_ROOT/simulations/<run_id>/``).
+
+Sans ramasse-miettes, un dossier de run n'est supprimé que lorsque son
+propriétaire supprime la campagne : les runs anonymes (sans Campaign) et les
+dossiers abandonnés (soumission interrompue avant la mise en file) restent
+indéfiniment. ``collect`` applique, dans l'ordre :
+
+1. dossiers orphelins (ni Campaign ni SimulationJob) plus vieux que
+   ``SIMULATION_ORPHAN_GRACE_HOURS`` : supprimés ;
+2. runs anonymes plus vieux que ``SIMULATION_ANONYMOUS_RETENTION_DAYS`` :
+   supprimés avec leur job ;
+3. campagnes plus vieilles que ``SIMULATION_RETENTION_DAYS`` : supprimées ;
+4. campagnes plus vieilles que ``SIMULATION_COMPACT_AFTER_DAYS`` : compactées,
+   c'est-à-dire privées de leurs entrées intermédiaires (``sequences/``, fichiers
+   temporaires). Les résultats, le manifeste et les entrées qu'il référence
+   (template, table de correspondance, archive...) sont conservés : la page de
+   résultats, le téléchargement et le rerun depuis l'historique fonctionnent
+   toujours (l'archive est réextraite, les collections réexportées) ;
+5. quota par utilisateur ``SIMULATION_USER_QUOTA_BYTES`` : au-delà, ses runs
+   les plus anciens sont compactés, puis supprimés, jusqu'à repasser sous le quota.
+
+Un run en file ou en cours n'est jamais touché. Une valeur 0 (ou None)
+désactive la règle correspondante.
+
+Les fichiers des runs sont souvent des liens durs vers le store de blobs
+(``blobs.py``) : supprimer un dossier ne libère un fichier que s'il n'était
+lié nulle part ailleurs. Les octets récupérés comptent donc les fichiers
+libérés directement et les blobs qui ne sont plus référencés par aucun run.
+La taille utilisée pour le quota est la taille apparente des dossiers.
+"""
+import datetime
+import os
+import pathlib
+import shutil
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Optional
+
+from django.conf import settings
+from django.utils import timezone
+
+from . import blobs
+from .models import Campaign, SimulationJob
+
+# Entrées intermédiaires supprimées par le compactage (recréées par un rerun)
+INTERMEDIATE_DIRS = ('sequences',)
+
+ACTION_DELETE = 'delete'
+ACTION_COMPACT = 'compact'
+
+
+def get_simulations_dir():
+    return pathlib.Path(settings.MEDIA_ROOT) / 'simulations'
+
+
+@dataclass
+class Workspace:
+    """Dossier de run et ce que la base en sait (campagne, job)."""
+    run_id: str
+    path: pathlib.Path
+    size: int
+    created_at: datetime.datetime
+    owner_id: Optional[int] = None
+    campaign_id: Optional[int] = None
+    job_status: Optional[str] = None
+
+    @property
+    def is_active(self):
+        return self.job_status in (SimulationJob.STATUS_QUEUED, SimulationJob.STATUS_RUNNING)
+
+    @property
+    def is_orphan(self):
+        return self.campaign_id is None and self.job_status is None
+
+    @property
+    def is_anonymous(self):
+        return self.campaign_id is None and self.job_status is not None
+
+    @property
+    def is_compacted(self):
+        return not any((self.path / name).exists() for name in INTERMEDIATE_DIRS)
+
+
+@dataclass
+class Action:
+    kind: str
+    workspace: Workspace
+    reason: str
+
+
+@dataclass
+class CollectionReport:
+    actions: list = field(default_factory=list)
+    bytes_reclaimed: int = 0
+    blobs_removed: int = 0
+    errors: list = field(default_factory=list)
+    dry_run: bool = False
+
+    @property
+    def deleted(self):
+        return [a for a in self.actions if a.kind == ACTION_DELETE]
+
+    @property
+    def compacted(self):
+        return [a for a in self.actions if a.kind == ACTION_COMPACT]
+
+
+def _setting(name):
+    return getattr(settings, name, None) or 0
+
+
+# ==========================================
+# 1. INVENTAIRE
+# ==========================================
+
+def _iter_files(path):
+    """Fichiers d'un dossier (sans suivre les liens symboliques), avec leur stat."""
+    for root, _, files in os.walk(path):
+        for name in files:
+            file_path = pathlib.Path(root) / name
+            try:
+                yield file_path, file_path.lstat()
+            except FileNotFoundError:
+                continue
+
+
+def tree_size(path):
+    return sum(stat.st_size for _, stat in _iter_files(path))
+
+
+def scan_workspaces():
+    """Dossiers de ``MEDIA_ROOT/simulations``, du plus ancien au plus récent (deux requêtes)."""
+    simulations_dir = get_simulations_dir()
+    if not simulations_dir.is_dir():
+        return []
+
+    campaigns = {
+        run_id: (pk, owner_id, created_at)
+        for run_id, pk, owner_id, created_at in Campaign.objects.exclude(run_id=None)
+        .values_list('run_id', 'id', 'owner_id', 'created_at')
+    }
+    jobs = {
+        run_id: (status, owner_id, finished_at or created_at)
+        for run_id, status, owner_id, created_at, finished_at in SimulationJob.objects
+        .values_list('run_id', 'status', 'owner_id', 'created_at', 'finished_at')
+    }
+
+    workspaces = []
+    for entry in os.scandir(simulations_dir):
+        if not entry.is_dir(follow_symlinks=False):
+            continue
+        path = pathlib.Path(entry.path)
+        mtime = datetime.datetime.fromtimestamp(entry.stat().st_mtime, tz=datetime.timezone.utc)
+        workspace = Workspace(run_id=entry.name, path=path, size=tree_size(path), created_at=mtime)
+        if entry.name in jobs:
+            workspace.job_status, workspace.owner_id, workspace.created_at = jobs[entry.name]
+        if entry.name in campaigns:
+            workspace.campaign_id, workspace.owner_id, workspace.created_at = campaigns[entry.name]
+        workspaces.append(workspace)
+    workspaces.sort(key=lambda w: w.created_at)
+    return workspaces
+
+
+# ==========================================
+# 2. PLAN
+# ==========================================
+
+def _compacted_size(workspace):
+    return workspace.size - sum(tree_size(workspace.path / name) for name in INTERMEDIATE_DIRS)
+
+
+def plan(workspaces, now=None):
+    """Actions à appliquer (suppressions puis compactages), d'après les réglages de rétention."""
+    now = now or timezone.now()
+    orphan_hours = _setting('SIMULATION_ORPHAN_GRACE_HOURS')
+    anonymous_days = _setting('SIMULATION_ANONYMOUS_RETENTION_DAYS')
+    retention_days = _setting('SIMULATION_RETENTION_DAYS')
+    compact_days = _setting('SIMULATION_COMPACT_AFTER_DAYS')
+    quota = _setting('SIMULATION_USER_QUOTA_BYTES')
+
+    def older_than(workspace, delta):
+        return now - workspace.created_at > delta
+
+    actions = []
+    kept = []
+    for workspace in workspaces:
+        if workspace.is_active:
+            continue
+        if workspace.is_orphan:
+            if orphan_hours and older_than(workspace, datetime.timedelta(hours=orphan_hours)):
+                actions.append(Action(ACTION_DELETE, workspace, 'orphan'))
+        elif workspace.is_anonymous:
+            if anonymous_days and older_than(workspace, datetime.timedelta(days=anonymous_days)):
+                actions.append(Action(ACTION_DELETE, workspace, 'anonymous run expired'))
+        elif retention_days and older_than(workspace, datetime.timedelta(days=retention_days)):
+            actions.append(Action(ACTION_DELETE, workspace, 'retention period expired'))
+        else:
+            kept.append(workspace)
+
+    # Taille de chaque run conservé, compactage compris
+    sizes = {}
+    for workspace in kept:
+        sizes[workspace.run_id] = workspace.size
+        if (compact_days and not workspace.is_compacted
+                and older_than(workspace, datetime.timedelta(days=compact_days))):
+            actions.append(Action(ACTION_COMPACT, workspace, 'older than compaction delay'))
+            sizes[workspace.run_id] = _compacted_size(workspace)
+
+    if quota:
+        compacting = {a.workspace.run_id for a in actions if a.kind == ACTION_COMPACT}
+        by_owner = {}
+        for workspace in kept:
+            by_owner.setdefault(workspace.owner_id, []).append(workspace)
+        for owner_id, owned in by_owner.items():
+            usage = sum(sizes[w.run_id] for w in owned)
+            # Du plus ancien au plus récent : compacter d'abord, supprimer ensuite
+            for workspace in owned:
+                if usage <= quota:
+                    break
+                if workspace.run_id not in compacting and not workspace.is_compacted:
+                    compacted_size = _compacted_size(workspace)
+                    if compacted_size < sizes[workspace.run_id]:
+                        actions.append(Action(ACTION_COMPACT, workspace, 'user quota exceeded'))
+                        compacting.add(workspace.run_id)
+                        usage -= sizes[workspace.run_id] - compacted_size
+                        sizes[workspace.run_id] = compacted_size
+            for workspace in owned:
+                if usage <= quota:
+                    break
+                actions.append(Action(ACTION_DELETE, workspace, 'user quota exceeded'))
+                usage -= sizes[workspace.run_id]
+
+    # Un run supprimé n'a pas besoin d'être compacté
+    deleted = {a.workspace.run_id for a in actions if a.kind == ACTION_DELETE}
+    return [a for a in actions if a.kind == ACTION_DELETE or a.workspace.run_id not in deleted]
+
+
+# ==========================================
+# 3. APPLICATION
+# ==========================================
+
+def _release(paths, inodes, candidates):
+    """
+    Octets libérés en supprimant ``paths`` : fichiers sans autre lien. Les liens
+    vers un blob sont comptés dans ``candidates`` (blob -> liens supprimés).
+    """
+    freed = 0
+    for path in paths:
+        for _, stat in _iter_files(path):
+            if stat.st_nlink <= 1:
+                freed += stat.st_size
+            elif (stat.st_dev, stat.st_ino) in inodes:
+                candidates[inodes[(stat.st_dev, stat.st_ino)]] += 1
+    return freed
+
+
+def _intermediate_paths(workspace):
+    paths = [workspace.path / name for name in INTERMEDIATE_DIRS if (workspace.path / name).exists()]
+    # Fichiers temporaires laissés par une écriture interrompue (``.<nom>.<uuid>``, ``.tmp-*``)
+    paths += [path for path in workspace.path.glob('.*') if path.is_file()]
+    return paths
+
+
+def _remove(path):
+    if path.is_dir() and not path.is_symlink():
+        shutil.rmtree(path)
+    else:
+        path.unlink(missing_ok=True)
+
+
+def delete_runs(run_ids):
+    """Supprime les jobs et les campagnes de ces runs (par lots, sans charger les objets)."""
+    run_ids = list(run_ids)
+    SimulationJob.objects.filter(run_id__in=run_ids).delete()
+    Campaign.objects.filter(run_id__in=run_ids).delete()
+
+
+def collect(*, dry_run=False, now=None, log=None):
+    """Applique la politique de rétention. Renvoie un ``CollectionReport`` (estimé avec ``dry_run``)."""
+    report = CollectionReport(dry_run=dry_run)
+    report.actions = plan(scan_workspaces(), now=now)
+    inodes = blobs.blob_inodes()
+    candidates = Counter()
+    deleted_ids = []
+
+    for action in report.actions:
+        workspace = action.workspace
+        if action.kind == ACTION_DELETE:
+            paths = [workspace.path]
+        else:
+            paths = _intermediate_paths(workspace)
+        freed = _release(paths, inodes, candidates)
+        if log:
+            log(f"{action.kind} {workspace.run_id} ({action.reason})")
+        if dry_run:
+            report.bytes_reclaimed += freed
+            continue
+        try:
+            for path in paths:
+                _remove(path)
+        except OSError as e:
+            report.errors.append((workspace.run_id, str(e)))
+            continue
+        report.bytes_reclaimed += freed
+        if action.kind == ACTION_DELETE:
+            deleted_ids.append(workspace.run_id)
+
+    if dry_run:
+        # Estimation : un blob n'est libéré que si tous ses liens sont dans les dossiers supprimés
+        for blob, links in candidates.items():
+            try:
+                stat = blob.stat()
+            except FileNotFoundError:
+                continue
+            if stat.st_nlink - links <= 1:
+                report.bytes_reclaimed += stat.st_size
+        return report
+
+    if deleted_ids:
+        delete_runs(deleted_ids)
+    removed, freed = blobs.remove_unreferenced(candidates)
+    gc_removed, gc_freed = blobs.collect_garbage()
+    report.blobs_removed = removed + gc_removed
+    report.bytes_reclaimed += freed + gc_freed
+    return report
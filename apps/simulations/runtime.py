@@ -0,0 +1,45 @@
+"""
+Pile de simulation (InSillyClo, Biopython, pandas, openpyxl) chargée à la demande.
+
+Le processus web n'importe pas ces modules au démarrage : seules les vues qui
+en ont besoin (vérification préalable d'un template...) les chargent au premier
+appel. À l'inverse, le worker appelle ``preload()`` une seule fois à son
+lancement : chaque processus de run est créé par fork depuis le worker et
+hérite des modules déjà importés et du DataSource déjà construit, au lieu de
+payer ces imports à chaque simulation. Un run garde son propre processus
+(limites CPU / mémoire, annulation), seul le démarrage est mutualisé.
+"""
+import functools
+import importlib
+import time
+
+# Modules importés par compute_all et la préparation des résultats
+PRELOADED_MODULES = (
+    'pandas',
+    'openpyxl',
+    'Bio.SeqIO',
+    'Bio.Restriction',
+    'insillyclo.parser',
+    'insillyclo.simulator',
+    'insillyclo.gel',
+    'insillyclo.dilution',
+    'apps.simulations.sharding',
+    'apps.simulations.visuals',
+)
+
+
+@functools.lru_cache(maxsize=None)
+def get_data_source():
+    """DataSource d'InSillyClo (enzymes, séparateurs), construit une fois par processus ; lecture seule."""
+    import insillyclo.data_source
+
+    return insillyclo.data_source.DataSourceHardCodedImplementation()
+
+
+def preload():
+    """Importe la pile de simulation et construit le DataSource. Renvoie la durée en secondes."""
+    start = time.perf_counter()
+    for name in PRELOADED_MODULES:
+        importlib.import_module(name)
+    get_data_source()
+    return time.perf_counter() - start
@@ -0,0 +1,306 @@
+"""
+Exécution d'un gros template en plusieurs morceaux (shards) en parallèle.
+
+compute_all traite toutes les lignes du template dans un seul processus. Au-delà
+de ``settings.SIMULATION_SHARD_MIN_ROWS`` lignes, le processus du run :
+
+1. lit le template complet et récupère les séquences des parts (les erreurs de
+   template sont signalées ici, une seule fois, à l'observer du run) ;
+2. découpe les lignes en shards contigus (``results/.shards/<n>/template.xlsx``)
+   et lance compute_all sur chacun dans un pool de processus, avec le même
+   dossier de séquences. Chaque shard renvoie aussi ses plasmides instanciés
+   (parts et fragments choisis) : l'instanciation, coûteuse, n'est pas faite
+   en série dans le processus du run ;
+3. déplace les fichiers propres à chaque plasmide (``<id>.gb``, ``<id>-*.svg``)
+   dans ``results/`` dans l'ordre des shards ;
+4. régénère les fichiers qui portent sur tous les plasmides (tables des
+   plasmides produits, gels globaux, dilutions) dans l'ordre du template, comme
+   le fait la fin de compute_all : le résultat ne dépend pas du découpage.
+
+``prepare`` et ``write_aggregates`` reprennent le début et la fin de
+``insillyclo.simulator.compute_all`` et s'appuient sur ses fonctions internes :
+la version d'insillyclo est donc figée dans requirements.txt, et
+SimulationShardingTests vérifie que les fichiers agrégés d'un run découpé sont
+identiques à ceux d'un run d'un seul tenant.
+
+InSillyClo, openpyxl et Biopython sont importés dans les fonctions : le processus
+web n'utilise que les constantes (``OUTPUT_HEADER`` pour la vérification préalable).
+"""
+import csv
+import itertools
+import math
+import multiprocessing
+import pathlib
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+
+SHARDS_DIRNAME = '.shards'
+OUTPUT_HEADER = 'Output plasmid id ↓'
+
+# Fichiers de compute_all qui portent sur tous les plasmides (avec dilution-*), régénérés après fusion
+AGGREGATE_FILENAMES = {'DB_produced_plasmid.csv', 'auto-gg-combination-to-make.csv', 'digestion.svg', 'pcr.svg'}
+
+
+def shard_count(rows, *, max_shards, min_rows):
+    """Nombre de shards pour un template de ``rows`` lignes (1 : pas de découpage)."""
+    if not rows or max_shards <= 1 or min_rows <= 0:
+        return 1
+    return max(1, min(max_shards, rows // min_rows))
+
+
+# ==========================================
+# 1. DÉCOUPAGE DU TEMPLATE
+# ==========================================
+
+def split_template(template_path, shards_dir, count, rows=None):
+    """
+    Écrit ``count`` templates contenant chacun une tranche contiguë des lignes
+    de plasmides (en-têtes identiques). ``rows`` : positions des lignes à garder
+    (toutes par défaut). Renvoie la liste des dossiers de shard.
+    """
+    import openpyxl
+
+    workbook = openpyxl.load_workbook(template_path)
+    sheet = workbook.worksheets[0]
+
+    header_row = next(
+        cell.row for cell in sheet['A'] if cell.value == OUTPUT_HEADER
+    )
+    plasmid_rows = [
+        values for values in sheet.iter_rows(min_row=header_row + 1, values_only=True)
+        if any(value is not None for value in values)
+    ]
+    if rows is not None:
+        plasmid_rows = [plasmid_rows[index] for index in sorted(rows)]
+    rows = plasmid_rows
+    size = math.ceil(len(rows) / count)
+
+    shard_dirs = []
+    for index in range(count):
+        shard_dir = pathlib.Path(shards_dir) / f'{index:03d}'
+        (shard_dir / 'results').mkdir(parents=True)
+        sheet.delete_rows(header_row + 1, sheet.max_row)
+        for values in rows[index * size:(index + 1) * size]:
+            sheet.append(values)
+        workbook.save(shard_dir / 'template.xlsx')
+        shard_dirs.append(shard_dir)
+    return shard_dirs
+
+
+def _compute_shard(shard_dir, compute_kwargs, collect=False):
+    """
+    Exécuté dans un processus du pool : compute_all sur les lignes du shard.
+    Avec ``collect``, renvoie les plasmides instanciés du shard (``prepare()['instances']``).
+    """
+    import insillyclo.observer
+    import insillyclo.simulator
+
+    kwargs = dict(compute_kwargs)
+    if kwargs.get('concentration_file'):
+        # compute_all réécrit le fichier de concentrations : chaque shard a sa copie
+        copy = shard_dir / pathlib.Path(kwargs['concentration_file']).name
+        shutil.copy(kwargs['concentration_file'], copy)
+        kwargs['concentration_file'] = copy
+    insillyclo.simulator.compute_all(
+        observer=insillyclo.observer.InSillyCloCliObserver(debug=False, fail_on_error=True),
+        input_template_filled=shard_dir / 'template.xlsx',
+        output_dir=shard_dir / 'results',
+        **kwargs,
+    )
+    if collect:
+        # Observer muet : compute_all vient de signaler les problèmes de ces lignes
+        observer = insillyclo.observer.InSillyCloCliObserver(debug=False, fail_on_error=False)
+        return prepare(observer=observer, input_template_filled=shard_dir / 'template.xlsx', **kwargs)['instances']
+    return None
+
+
+# ==========================================
+# 2. EXÉCUTION ET FUSION
+# ==========================================
+
+def compute_sharded(*, observer, output_dir, input_template_filled, shards, prepared=None, rows=None,
+                    **compute_kwargs):
+    """
+    Équivalent de ``compute_all(observer=..., output_dir=..., input_template_filled=..., **compute_kwargs)``
+    réparti sur ``shards`` processus. Renvoie le résultat de ``prepare``.
+
+    ``rows`` limite la simulation à certaines lignes du template (rerun
+    incrémental : les fichiers des autres plasmides sont déjà dans
+    ``output_dir``) ; ``prepared`` évite alors de relire le template.
+    """
+    output_dir = pathlib.Path(output_dir)
+    collect = prepared is None
+    if collect:
+        # Les plasmides sont instanciés dans les shards, en parallèle
+        prepared = prepare(
+            observer=observer, input_template_filled=input_template_filled, instantiate=False, **compute_kwargs
+        )
+
+    shards_dir = output_dir / SHARDS_DIRNAME
+    shard_dirs = split_template(input_template_filled, shards_dir, shards, rows=rows)
+    try:
+        # fork : les shards héritent des modules déjà importés (pas de réimport d'insillyclo)
+        context = multiprocessing.get_context('fork')
+        with ProcessPoolExecutor(max_workers=len(shard_dirs), mp_context=context) as pool:
+            futures = [pool.submit(_compute_shard, shard_dir, compute_kwargs, collect) for shard_dir in shard_dirs]
+            shard_instances = [future.result() for future in futures]
+        if collect:
+            # Shards contigus : leur concaténation suit l'ordre du template
+            prepared['instances'] = list(itertools.chain.from_iterable(shard_instances))
+
+        # Fichiers par plasmide : dans l'ordre des shards (comme compute_all, le dernier id en double l'emporte)
+        for shard_dir in shard_dirs:
+            for path in sorted((shard_dir / 'results').iterdir()):
+                if path.is_file() and path.name not in AGGREGATE_FILENAMES and not path.name.startswith('dilution-'):
+                    path.replace(output_dir / path.name)
+    finally:
+        shutil.rmtree(shards_dir, ignore_errors=True)
+
+    write_aggregates(prepared, output_dir=output_dir, observer=observer, **compute_kwargs)
+    return prepared
+
+
+def prepare(*, observer, input_template_filled, input_parts_files, gb_plasmids, concentration_file=None,
+             primer_id_pairs=None, primers_file=None, data_source, instantiate=True, **ignored):
+    """
+    Début de compute_all : lecture du template, séquences des parts, instanciation des plasmides
+    (``instances``, absent sans ``instantiate``).
+    """
+    import insillyclo.models
+    import insillyclo.parser
+    import insillyclo.simulator
+
+    assembly, plasmids = insillyclo.parser.parse_assembly_and_plasmid_from_template(
+        input_template_filled,
+        input_part_factory=insillyclo.models.InputPartDataClassFactory(),
+        assembly_factory=insillyclo.models.AssemblyDataClassFactory(),
+        plasmid_factory=insillyclo.models.PlasmidDataClassFactory(),
+        observer=observer,
+    )
+    primer_pairs = insillyclo.simulator.primer_id_pairs_to_primer_with_seq(
+        primer_id_pairs=primer_id_pairs,
+        primers_file=primers_file,
+        observer=observer,
+    ) if primer_id_pairs else []
+
+    input_parts_gb_mapping = insillyclo.simulator.fetch_gb_for_input_parts(
+        needed_input_parts=insillyclo.simulator.extract_needed_input_parts(plasmids),
+        input_parts_files=input_parts_files,
+        gb_plasmids=gb_plasmids,
+        observer=observer,
+    )
+    insillyclo.simulator.override_from_concentration_file_and_update(
+        sequences=input_parts_gb_mapping,
+        concentration_file=concentration_file,
+        observer=observer,
+    )
+    prepared = {
+        'assembly': assembly,
+        'primer_pairs': primer_pairs,
+        'mapping': input_parts_gb_mapping,
+    }
+    if instantiate:
+        prepared['instances'] = [
+            (plasmid, *insillyclo.simulator.instantiate_plasmid_to_assemble(
+                plasmid=plasmid,
+                available_sequence=input_parts_gb_mapping,
+                assembly=assembly,
+                data_source=data_source,
+                observer=observer,
+            ))
+            for plasmid in plasmids
+        ]
+    return prepared
+
+
+def write_aggregates(prepared, *, output_dir, observer, settings=None, enzyme_names=None,
+                      default_mass_concentration=None, **ignored):
+    """Fin de compute_all : fichiers qui portent sur l'ensemble des plasmides, dans l'ordre du template."""
+    import Bio.SeqIO
+    import insillyclo.conf
+    import insillyclo.dilution
+    import insillyclo.gel
+    import insillyclo.models
+
+    if settings is None:
+        settings = insillyclo.conf.InSillyCloConfig()
+
+    produced_plasmids = []
+    wells = []
+    plasmids_dilution_info = []
+    for plasmid, plasmid_name, part_to_assemble in prepared['instances']:
+        record = Bio.SeqIO.read(output_dir / f'{plasmid.plasmid_id}.gb', 'genbank')
+        # Nom et description tels que compute_all les a donnés (le format GenBank peut les tronquer)
+        record.name = plasmid.plasmid_id
+        record.description = plasmid_name
+        produced_plasmids.append((plasmid, part_to_assemble, record))
+
+        well_sequences = [(record, True)]
+        for part in part_to_assemble:
+            for fragment in part.fragments:
+                well_sequences.extend([
+                    (fragment.out_sens, False),
+                    (fragment.in_sens, False),
+                    (fragment.out_antisens, False),
+                    (fragment.in_antisens, False),
+                ])
+        wells.append(insillyclo.models.PCRWell(
+            name=plasmid.plasmid_id,
+            sequences=well_sequences,
+            primers=prepared['primer_pairs'],
+        ))
+        plasmids_dilution_info.append(insillyclo.dilution.PlasmidDilutionInfo(
+            plasmid_id=plasmid.plasmid_id,
+            used_sequences=list(itertools.chain.from_iterable(part.sequences for part in part_to_assemble)),
+        ))
+
+    with open(output_dir / 'DB_produced_plasmid.csv', mode='w', newline='') as csv_file:
+        writer = csv.writer(csv_file, delimiter=';', quotechar='|', quoting=csv.QUOTE_MINIMAL)
+        writer.writerow(['pID', 'Name', 'Type'])
+        for plasmid, _, record in produced_plasmids:
+            writer.writerow([plasmid.plasmid_id, record.description, plasmid.output_type])
+
+    with open(output_dir / 'auto-gg-combination-to-make.csv', mode='w', newline='') as csv_file:
+        writer = csv.writer(csv_file, delimiter=',', quotechar='|', quoting=csv.QUOTE_MINIMAL)
+        for plasmid, part_to_assemble, record in produced_plasmids:
+            writer.writerow([f'{record.name} {record.description}'] + [
+                seq.name for part in part_to_assemble for seq in part.sequences
+            ])
+
+    insillyclo.gel.enzyme_digestion_to_gel(
+        filename=output_dir / 'digestion.svg',
+        plasmids=[(plasmid.plasmid_id, record) for plasmid, _, record in produced_plasmids],
+        enzyme_names=enzyme_names,
+        observer=observer,
+    )
+    insillyclo.gel.pcr_amplification_to_gel(
+        filename=output_dir / 'pcr.svg',
+        wells=wells,
+        observer=observer,
+    )
+
+    has_mass_concentration = default_mass_concentration is not None or any(
+        ip.annotations.get('mass_concentration', None) for ip in prepared['mapping'].values()
+    )
+    if has_mass_concentration:
+        dilutions = insillyclo.dilution.compute_all_dilutions(
+            plasmids_dilution_info,
+            settings=settings,
+            puncture_volume_10x=None,
+            output_plasmid_expected_volume=None,
+            enzyme_and_buffer_volume=None,
+            minimum_remaining_volume_for_10x_intermediate_dilution=None,
+            minimal_puncture_volume=None,
+            default_mass_concentration=default_mass_concentration,
+            expected_concentration_in_output=None,
+            target_dilutions=None,
+            observer=observer,
+        )
+        for dilution_strategy, dilution in dilutions.items():
+            dilution = insillyclo.dilution.round_dilution_spec(specs=dilution, ndigits=settings.nb_digits_rounding)
+            for expected_format in ('json', 'csv'):
+                insillyclo.dilution.write_dilution_spec(
+                    filename=output_dir / f'dilution-{dilution_strategy}.{expected_format}',
+                    specs=dilution,
+                    output_format=expected_format,
+                )
@@ -1,3 +1,1322 @@
-from django.test import TestCase
+import datetime
+import io
+import os
+import pathlib
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+import zipfile
+from unittest import mock
 
-# Create your tests here.
+import openpyxl
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from apps.core.utils.hashing import file_sha256
+
+from . import archives
+from . import batches
+from . import blobs
+from . import cache as simulation_cache
+from . import deletion
+from . import incremental
+from . import manifest
+from . import metrics
+from . import preflight
+from . import progress
+from . import retention
+from . import runtime
+from . import sharding
+from . import visuals
+from .jobs import SimulationWorker, complete_job, fail_job, finalize_outputs, get_run_dir, request_cancel, run_simulation
+from .models import Campaign, SimulationBatch, SimulationJob
+from apps.plasmids.models import Plasmid, PlasmidCollection
+
+User = get_user_model()
+
+
+GB_CONTENT = """LOCUS       pTEST001                  12 bp    DNA     circular UNK 01-JAN-1980
+DEFINITION  test part.
+ACCESSION   pTEST001
+VERSION     pTEST001.1
+KEYWORDS    .
+SOURCE      .
+  ORGANISM  .
+FEATURES             Location/Qualifiers
+     misc_feature    1..12
+                     /label="part"
+ORIGIN
+        1 atgcatgcat gc
+//
+"""
+
+
+def make_template(rows):
+    """Template InSillyClo à une part ('Part', type 1) ; ``rows`` : couples (plasmide, part)."""
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.append(["Assembly settings"])
+    sheet.append(["Restriction enzyme", "BsaI"])
+    sheet.append(["Name", "test"])
+    sheet.append(["Output separator", "-"])
+    for _ in range(4):
+        sheet.append([])
+    sheet.append(["Assembly composition", "Part name ->", "Part"])
+    sheet.append([None, "Part types ->", "1"])
+    sheet.append([None, "Is optional part ->", "False"])
+    sheet.append([None, "Part name should be in output name ->", "True"])
+    sheet.append([None, "Part separator ->"])
+    sheet.append(["Output plasmid id ↓", "OutputType (optional) ↓", "↓"])
+    for row in rows:
+        sheet.append([row[0], None, *row[1:]])
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    return buffer.getvalue()
+
+
+# Octets figés une fois : openpyxl horodate chaque sauvegarde (les tests de cache comparent les entrées)
+TEMPLATE_CONTENT = make_template([("pOUT001", "part")])
+
+
+def make_sequences_zip():
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as zf:
+        zf.writestr("pTEST001.gb", GB_CONTENT)
+    return SimpleUploadedFile("sequences.zip", buffer.getvalue(), content_type="application/zip")
+
+
+class SimulationTestCase(TestCase):
+    """Isole MEDIA_ROOT (et le cache de lecture GenBank) dans un dossier temporaire pour chaque test."""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.media_override = override_settings(
+            MEDIA_ROOT=self.media_root, GENBANK_PARSE_CACHE_DIR=os.path.join(self.media_root, "parse_cache")
+        )
+        self.media_override.enable()
+
+    def tearDown(self):
+        self.media_override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def submit(self, **extra):
+        data = {
+            "simulation_name": "Queued run",
+            "template_file": SimpleUploadedFile("template.xlsx", TEMPLATE_CONTENT),
+            "correspondence_file": SimpleUploadedFile("mapping.csv", b"pID,Name,Type\npTEST001,part,1\n"),
+            "sequences_archive": make_sequences_zip(),
+            "default_concentration": "200",
+        }
+        data.update(extra)
+        return self.client.post(reverse("simulations:simu"), data)
+
+
+# =====================
+# FILE D'ATTENTE
+# =====================
+# La soumission ne lance pas compute_all : elle crée un job "queued" et rend la main.
+class SimulationQueueTests(SimulationTestCase):
+    def test_submission_enqueues_job_and_redirects(self):
+        response = self.submit()
+
+        job = SimulationJob.objects.get()
+        self.assertEqual(job.status, SimulationJob.STATUS_QUEUED)
+        self.assertRedirects(
+            response,
+            reverse("simulations:simulation_detail", args=[job.run_id]),
+            fetch_redirect_response=False,
+        )
+        self.assertEqual(job.payload["template"], "template/template.xlsx")
+        self.assertEqual(job.payload["correspondence"], "correspondence/mapping.csv")
+
+    def test_authenticated_submission_creates_campaign(self):
+        user = User.objects.create_user(email="sim@example.com", password="pass")
+        self.client.force_login(user)
+
+        self.submit()
+
+        job = SimulationJob.objects.get()
+        campaign = Campaign.objects.get(run_id=job.run_id)
+        self.assertEqual(job.campaign, campaign)
+        self.assertEqual(job.owner, user)
+
+    def test_collection_submission_exports_plasmids(self):
+        collection = PlasmidCollection.objects.create(name="Public kit", is_public=True)
+        for identifier in ("pCOL1", "pCOL2"):
+            Plasmid.objects.create(
+                identifier=identifier, name=identifier, type="1", sequence="ATGC", length=4, collection=collection,
+            )
+
+        self.submit(
+            use_collections="on", selected_collections=[collection.id], sequences_archive="",
+            correspondence_file=SimpleUploadedFile("mapping.csv", b"pID,Name,Type\npCOL1,part,1\n"),
+        )
+
+        job = SimulationJob.objects.get()
+        sequences = get_run_dir(job.run_id) / "sequences"
+        self.assertEqual(sorted(p.name for p in sequences.glob("*.gb")), ["pCOL1.gb", "pCOL2.gb"])
+
+    def test_status_endpoint_reports_job_state(self):
+        self.submit()
+        job = SimulationJob.objects.get()
+
+        response = self.client.get(reverse("simulations:simulation_status", args=[job.run_id]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["status"], "queued")
+        self.assertEqual(response.json()["job_id"], job.id)
+
+        job.status = SimulationJob.STATUS_FAILED
+        job.error = "Simulation failed: boom"
+        job.save()
+        response = self.client.get(reverse("simulations:simulation_status", args=[job.run_id]))
+        self.assertEqual(response.json()["error"], "Simulation failed: boom")
+
+    def test_pending_job_renders_status_page(self):
+        self.submit()
+        job = SimulationJob.objects.get()
+
+        response = self.client.get(reverse("simulations:simulation_detail", args=[job.run_id]))
+        self.assertTemplateUsed(response, "simulations/simulation_status.html")
+
+
+# =====================
+# VÉRIFICATION PRÉALABLE
+# =====================
+# Les parts introuvables ou ambiguës sont toutes signalées avant la mise en file.
+class SimulationPreflightTests(SimulationTestCase):
+    def write_inputs(self, rows, correspondence):
+        directory = self.media_root
+        with open(os.path.join(directory, "template.xlsx"), "wb") as out:
+            out.write(make_template(rows))
+        with open(os.path.join(directory, "mapping.csv"), "w") as out:
+            out.write(correspondence)
+        return os.path.join(directory, "template.xlsx"), os.path.join(directory, "mapping.csv")
+
+    def test_reports_every_missing_and_ambiguous_part(self):
+        template, mapping = self.write_inputs(
+            [("pOUT001", "part"), ("pOUT002", "unknown"), ("pOUT003", "dup"), ("pOUT004", "pDIRECT")],
+            "pID;Name;Type\npTEST001;part;1\npTEST001;dup;1\npTEST002;dup;1\n",
+        )
+
+        report = preflight.check_inputs(template, mapping, ["pTEST001.gb", "pTEST002.gb", "pDIRECT.gb"])
+
+        self.assertEqual(report.plasmids, 4)
+        self.assertEqual(report.missing, [("pOUT002", "unknown")])
+        self.assertEqual(report.ambiguous, [("pOUT003", "dup", ["pTEST001.gb", "pTEST002.gb"])])
+        self.assertFalse(report.ok)
+        self.assertEqual(len(report.problems()), 1)
+        self.assertEqual(len(report.warnings()), 1)
+
+    def test_duplicate_sequence_file_is_ambiguous(self):
+        template, mapping = self.write_inputs([("pOUT001", "part")], "pID,Name,Type\npTEST001,part,1\n")
+
+        report = preflight.check_inputs(template, mapping, ["pTEST001.gb", "pTEST001.gb"])
+
+        self.assertEqual(report.ambiguous, [("pOUT001", "part", ["pTEST001.gb"])])
+        # compute_all accepte les doublons (le dernier fichier l'emporte) : simple avertissement
+        self.assertTrue(report.ok)
+
+    def test_empty_required_parts_are_all_reported(self):
+        template, mapping = self.write_inputs([("pOUT001",), ("pOUT002",)], "pID,Name,Type\npTEST001,part,1\n")
+
+        report = preflight.check_inputs(template, mapping, ["pTEST001.gb"])
+
+        self.assertEqual(len(report.errors), 2)
+
+    def test_complete_rows_are_checked_after_an_incomplete_one(self):
+        template, mapping = self.write_inputs([("pOUT001",), ("pOUT002", "unknown")], "pID,Name,Type\npTEST001,part,1\n")
+
+        report = preflight.check_inputs(template, mapping, ["pTEST001.gb"])
+
+        self.assertEqual(len(report.errors), 1)
+        self.assertEqual(report.missing, [("pOUT002", "unknown")])
+        self.assertFalse(preflight._collecting_observer_class()().is_fail_on_error())
+
+    def test_ambiguous_parts_are_queued_with_a_warning(self):
+        mapping = SimpleUploadedFile("mapping.csv", b"pID,Name,Type\npTEST001,part,1\npTEST002,part,1\n")
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, "w") as zf:
+            zf.writestr("pTEST001.gb", GB_CONTENT)
+            zf.writestr("pTEST002.gb", GB_CONTENT)
+
+        response = self.submit(
+            correspondence_file=mapping,
+            sequences_archive=SimpleUploadedFile("sequences.zip", buffer.getvalue(), content_type="application/zip"),
+        )
+
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(SimulationJob.objects.exists())
+        warnings = [str(m) for m in response.wsgi_request._messages]
+        self.assertTrue(any("matches several sequences" in message for message in warnings))
+
+    def test_invalid_submission_is_not_queued(self):
+        response = self.submit(correspondence_file=SimpleUploadedFile("mapping.csv", b"pID,Name,Type\npOTHER,part,1\n"))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(SimulationJob.objects.exists())
+        self.assertFalse(Campaign.objects.exists())
+        errors = [str(message) for message in response.context["messages"]]
+        self.assertIn("pOUT001: no sequence found for part 'part'", errors)
+        # Rejet avant extraction de l'archive
+        self.assertFalse(any(pathlib.Path(self.media_root).glob("simulations/*/sequences/*.gb")))
+
+
+# =====================
+# MANIFESTE DES ENTRÉES
+# =====================
+# Le rerun et le pré-remplissage lisent le rôle des fichiers dans manifest.json, pas dans leur nom.
+class SimulationManifestTests(SimulationTestCase):
+    def test_submission_writes_manifest(self):
+        self.submit(concentrations_file=SimpleUploadedFile("lab-values.csv", b"pID,Mass Concentration\n"))
+        job = SimulationJob.objects.get()
+
+        inputs = manifest.read_manifest(get_run_dir(job.run_id))["inputs"]
+        self.assertEqual(sorted(inputs), ["archive", "concentrations", "correspondence", "template"])
+        self.assertEqual(inputs["concentrations"]["path"], "concentrations/lab-values.csv")
+        self.assertEqual(inputs["template"]["size"], len(TEMPLATE_CONTENT))
+        self.assertEqual(inputs["archive"]["sha256"], file_sha256(get_run_dir(job.run_id) / "sequences.zip"))
+
+    def test_rerun_recovers_inputs_from_manifest(self):
+        self.client.force_login(User.objects.create_user(username="rerun", email="rerun@example.com", password="pass"))
+        self.submit(concentrations_file=SimpleUploadedFile("lab-values.csv", b"pID,Mass Concentration\n"))
+        old_run_id = SimulationJob.objects.get().run_id
+        # Un fichier au nom trompeur hors du manifeste est ignoré
+        (get_run_dir(old_run_id) / "primers-old.csv").write_text("ignored")
+
+        response = self.client.get(reverse("simulations:simu"), {"from_sim": old_run_id})
+        prefill = response.context["prefill"]
+        self.assertEqual(prefill["prev_template"], "template.xlsx")
+        self.assertEqual(prefill["prev_zip"], "sequences.zip")
+        self.assertEqual(prefill["prev_concentrations"], "lab-values.csv")
+        self.assertNotIn("prev_primers", prefill)
+
+        self.client.post(reverse("simulations:simu"), {"old_sim_id": old_run_id, "default_concentration": "200"})
+        new_job = SimulationJob.objects.exclude(run_id=old_run_id).get()
+        self.assertEqual(new_job.payload["concentrations"], "concentrations/lab-values.csv")
+        self.assertIsNone(new_job.payload["primers"])
+        # Le worker reprendra les plasmides inchangés de l'ancien run
+        self.assertEqual(new_job.payload["previous_run"], old_run_id)
+
+    def test_backfill_command_writes_missing_manifests(self):
+        legacy = get_run_dir("legacy01")
+        (legacy / "template").mkdir(parents=True)
+        (legacy / "template" / "plan.xlsx").write_bytes(TEMPLATE_CONTENT)
+        (legacy / "mapping.csv").write_text("pID,Name\n")
+        (legacy / "conc_values.csv").write_text("pID,Mass Concentration\n")
+        (legacy / "parts.zip").write_bytes(b"zip")
+        (legacy / "tout_telecharger.zip").write_bytes(b"results")
+
+        call_command("backfill_simulation_manifests", stdout=io.StringIO())
+
+        inputs = manifest.read_manifest(legacy)["inputs"]
+        self.assertEqual(inputs["template"]["path"], "template/plan.xlsx")
+        self.assertEqual(inputs["correspondence"]["path"], "mapping.csv")
+        self.assertEqual(inputs["concentrations"]["path"], "conc_values.csv")
+        self.assertEqual(inputs["archive"]["path"], "parts.zip")
+        self.assertNotIn("primers", inputs)
+
+
+# =====================
+# SOUMISSION EN LOT
+# =====================
+# Entrées partagées préparées une fois, un job par template, récapitulatif par lot.
+class SimulationBatchTests(SimulationTestCase):
+    def submit_batch(self, **extra):
+        archive = io.BytesIO()
+        with zipfile.ZipFile(archive, "w") as zf:
+            zf.writestr("plans/third.xlsx", make_template([("pOUT003", "part")]))
+            zf.writestr("__MACOSX/plans/._third.xlsx", b"")
+        data = {
+            "batch_name": "Screen",
+            "template_files": [
+                SimpleUploadedFile("first.xlsx", make_template([("pOUT001", "part")])),
+                SimpleUploadedFile("second.xlsx", make_template([("pOUT002", "part")])),
+            ],
+            "templates_archive": SimpleUploadedFile("plans.zip", archive.getvalue()),
+            "correspondence_file": SimpleUploadedFile("mapping.csv", b"pID,Name,Type\npTEST001,part,1\n"),
+            "sequences_archive": make_sequences_zip(),
+            "default_concentration": "200",
+        }
+        data.update(extra)
+        return self.client.post(reverse("simulations:simu_batch"), data)
+
+    def test_batch_enqueues_one_job_per_template(self):
+        user = User.objects.create_user(username="batch", email="batch@example.com", password="pass")
+        self.client.force_login(user)
+
+        response = self.submit_batch()
+
+        batch = SimulationBatch.objects.get()
+        self.assertRedirects(
+            response, reverse("simulations:batch_detail", args=[batch.batch_id]), fetch_redirect_response=False,
+        )
+        jobs = list(batch.jobs.order_by("id"))
+        self.assertEqual(
+            [os.path.basename(job.payload["template"]) for job in jobs], ["first.xlsx", "second.xlsx", "third.xlsx"],
+        )
+        self.assertEqual(Campaign.objects.filter(owner=user).count(), 3)
+        self.assertEqual(Campaign.objects.get(run_id=jobs[0].run_id).name, "Screen · first")
+
+        # Séquences extraites une fois : les runs partagent le même fichier
+        sequences = [get_run_dir(job.run_id) / "sequences" / "pTEST001.gb" for job in jobs]
+        self.assertEqual(len({path.stat().st_ino for path in sequences}), 1)
+        self.assertEqual(manifest.read_manifest(get_run_dir(jobs[2].run_id))["inputs"]["template"]["path"], "template/third.xlsx")
+        self.assertFalse(batches.get_batch_dir(batch.batch_id).exists())
+
+    def test_invalid_template_rejects_the_whole_batch(self):
+        response = self.submit_batch(template_files=[
+            SimpleUploadedFile("first.xlsx", make_template([("pOUT001", "part")])),
+            SimpleUploadedFile("broken.xlsx", make_template([("pOUT009", "unknown")])),
+        ])
+
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(SimulationBatch.objects.exists())
+        self.assertFalse(SimulationJob.objects.exists())
+        errors = [str(message) for message in response.context["messages"]]
+        self.assertIn("broken.xlsx: pOUT009: no sequence found for part 'unknown'", errors)
+
+    def test_summary_page_lists_runs_and_is_private(self):
+        owner = User.objects.create_user(username="owner", email="owner@example.com", password="pass")
+        self.client.force_login(owner)
+        self.submit_batch()
+        batch = SimulationBatch.objects.get()
+        batch.jobs.filter(payload__template="template/first.xlsx").update(status=SimulationJob.STATUS_DONE)
+
+        response = self.client.get(reverse("simulations:batch_detail", args=[batch.batch_id]))
+        self.assertContains(response, "second.xlsx")
+        self.assertEqual(dict((value, count) for value, _, count in response.context["status_counts"]), {"queued": 2, "done": 1})
+
+        self.client.force_login(User.objects.create_user(username="other", email="other@example.com", password="pass"))
+        response = self.client.get(reverse("simulations:batch_detail", args=[batch.batch_id]))
+        self.assertEqual(response.status_code, 404)
+
+
+# =====================
+# WORKER
+# =====================
+# Un job dont le dossier ne contient aucune séquence passe en "failed" avec un message lisible.
+class SimulationWorkerTests(SimulationTestCase):
+    def test_worker_marks_failed_job(self):
+        job = SimulationJob.objects.create(run_id="emptyrun", payload={})
+        get_run_dir(job.run_id).mkdir(parents=True)
+
+        SimulationWorker(max_workers=1, poll_interval=0, log=lambda msg: None).run(once=True)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, SimulationJob.STATUS_FAILED)
+        self.assertIn("No valid .gb files found.", job.error)
+        self.assertIsNotNone(job.finished_at)
+        self.assertEqual(job.termination_reason, SimulationJob.REASON_ERROR)
+
+    def test_failure_cleans_partial_results_and_records_termination(self):
+        owner = User.objects.create_user(username="stopped", email="stopped@example.com", password="pass")
+        campaign = Campaign.objects.create(name="Stopped", run_id="stoppedrun", owner=owner)
+        job = SimulationJob.objects.create(run_id="stoppedrun", payload={}, campaign=campaign)
+        results = get_run_dir(job.run_id) / "results"
+        results.mkdir(parents=True)
+        (results / "partial.gb").write_text(GB_CONTENT)
+
+        fail_job(job, "Simulation stopped: time limit exceeded (1 s).", reason=SimulationJob.REASON_TIMEOUT)
+
+        self.assertFalse(results.exists())
+        campaign.refresh_from_db()
+        self.assertEqual(campaign.results_data["termination"]["reason"], "timeout")
+        self.assertEqual(campaign.results_data["termination"]["status"], "failed")
+
+    def test_worker_enforces_wall_clock_limit(self):
+        job = SimulationJob.objects.create(run_id="slowrun", payload={})
+        get_run_dir(job.run_id).mkdir(parents=True)
+        worker = SimulationWorker(max_workers=1, poll_interval=0.05, log=lambda msg: None, limits={"wall_seconds": 0.5})
+
+        # Le processus du run (forké) hérite du patch : il ne se termine jamais seul
+        with mock.patch("apps.simulations.jobs.run_simulation", side_effect=lambda *args, **kwargs: time.sleep(60)):
+            worker.run(once=True)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, SimulationJob.STATUS_FAILED)
+        self.assertEqual(job.termination_reason, SimulationJob.REASON_TIMEOUT)
+
+    def test_worker_enforces_cpu_limit(self):
+        job = SimulationJob.objects.create(run_id="busyrun", payload={})
+        get_run_dir(job.run_id).mkdir(parents=True)
+        worker = SimulationWorker(max_workers=1, poll_interval=0.05, log=lambda msg: None, limits={"cpu_seconds": 1})
+
+        def spin(*args, **kwargs):
+            while True:
+                pass
+
+        with mock.patch("apps.simulations.jobs.run_simulation", side_effect=spin):
+            worker.run(once=True)
+
+        job.refresh_from_db()
+        self.assertEqual(job.termination_reason, SimulationJob.REASON_CPU_LIMIT)
+
+    def test_external_kill_is_not_reported_as_cpu_limit(self):
+        # Tué après la durée de la limite CPU, mais sans avoir consommé de CPU (OOM killer, kill -9)
+        job = SimulationJob.objects.create(run_id="killedrun", payload={})
+        get_run_dir(job.run_id).mkdir(parents=True)
+        worker = SimulationWorker(max_workers=1, poll_interval=0.05, log=lambda msg: None, limits={"cpu_seconds": 1})
+
+        def killed(*args, **kwargs):
+            time.sleep(1.5)
+            os.kill(os.getpid(), signal.SIGKILL)
+
+        with mock.patch("apps.simulations.jobs.run_simulation", side_effect=killed):
+            worker.run(once=True)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, SimulationJob.STATUS_FAILED)
+        self.assertEqual(job.termination_reason, SimulationJob.REASON_CRASHED)
+
+    def test_worker_preloads_simulation_stack_once(self):
+        messages = []
+        with mock.patch("apps.simulations.runtime.preload", return_value=0.5) as preload:
+            SimulationWorker(max_workers=1, poll_interval=0, log=messages.append).run(once=True)
+
+        preload.assert_called_once_with()
+        self.assertIn("Simulation stack loaded in 0.50s", messages)
+
+    def test_data_source_is_built_once_per_process(self):
+        self.assertIs(runtime.get_data_source(), runtime.get_data_source())
+
+    def test_web_process_does_not_import_simulation_stack(self):
+        # Processus neuf : la suite de tests a déjà importé pandas & co
+        heavy = ("pandas", "openpyxl", "Bio.Restriction", "insillyclo")
+        # La clé de cache (calculée à chaque mise en file) ne doit pas non plus importer InSillyClo
+        script = (
+            "import sys, django; django.setup(); import apps.simulations.urls; "
+            "from apps.simulations import cache; cache.data_source_fingerprint(); "
+            "print(','.join(m for m in %r if m in sys.modules))" % (heavy,)
+        )
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE="mysite.settings")
+        output = subprocess.run(
+            [sys.executable, "-c", script], cwd=settings.BASE_DIR, env=env,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+        self.assertEqual(output, "")
+
+
+# =====================
+# ANNULATION
+# =====================
+class SimulationCancelTests(SimulationTestCase):
+    def test_cancel_queued_job(self):
+        self.submit()
+        job = SimulationJob.objects.get()
+
+        response = self.client.post(reverse("simulations:simulation_cancel", args=[job.run_id]))
+
+        self.assertRedirects(response, reverse("simulations:simulation_detail", args=[job.run_id]), fetch_redirect_response=False)
+        job.refresh_from_db()
+        self.assertEqual(job.status, SimulationJob.STATUS_CANCELLED)
+        self.assertEqual(job.termination_reason, SimulationJob.REASON_CANCELLED)
+        # Le worker ne reprend pas un job annulé
+        SimulationWorker(max_workers=1, poll_interval=0, log=lambda msg: None).run(once=True)
+        job.refresh_from_db()
+        self.assertEqual(job.status, SimulationJob.STATUS_CANCELLED)
+
+    def test_cancel_running_job_sets_flag(self):
+        job = SimulationJob.objects.create(run_id="runningrun", payload={}, status=SimulationJob.STATUS_RUNNING)
+
+        self.assertTrue(request_cancel(job))
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, SimulationJob.STATUS_RUNNING)
+        self.assertTrue(job.cancel_requested)
+
+    def test_only_owner_can_cancel(self):
+        owner = User.objects.create_user(username="owner", email="owner@example.com", password="pass")
+        other = User.objects.create_user(username="other", email="other@example.com", password="pass")
+        job = SimulationJob.objects.create(run_id="ownedrun", payload={}, owner=owner)
+
+        self.client.force_login(other)
+        response = self.client.post(reverse("simulations:simulation_cancel", args=[job.run_id]))
+
+        self.assertEqual(response.status_code, 404)
+        job.refresh_from_db()
+        self.assertEqual(job.status, SimulationJob.STATUS_QUEUED)
+
+
+# =====================
+# CACHE DES RÉSULTATS
+# =====================
+# Des entrées identiques réutilisent les résultats déjà calculés sans repasser par le worker.
+class SimulationCacheTests(SimulationTestCase):
+    def store_fake_results(self, job, files):
+        results = get_run_dir(job.run_id) / "results"
+        results.mkdir(parents=True, exist_ok=True)
+        for name, content in files.items():
+            (results / name).write_text(content)
+        simulation_cache.store(job.payload["cache_key"], results.parent)
+
+    def test_identical_submission_is_served_from_cache(self):
+        self.submit()
+        first = SimulationJob.objects.get()
+        self.store_fake_results(first, {"pOUT1.gb": GB_CONTENT})
+
+        self.submit()
+        second = SimulationJob.objects.exclude(pk=first.pk).get()
+
+        self.assertEqual(second.payload["cache_key"], first.payload["cache_key"])
+        self.assertEqual(second.status, SimulationJob.STATUS_DONE)
+        self.assertTrue((get_run_dir(second.run_id) / "results" / "pOUT1.gb").exists())
+
+    def test_different_parameters_miss_the_cache(self):
+        self.submit()
+        first = SimulationJob.objects.get()
+        self.store_fake_results(first, {"pOUT1.gb": GB_CONTENT})
+
+        self.submit(default_concentration="50")
+        second = SimulationJob.objects.exclude(pk=first.pk).get()
+
+        self.assertNotEqual(second.payload["cache_key"], first.payload["cache_key"])
+        self.assertEqual(second.status, SimulationJob.STATUS_QUEUED)
+
+    def test_eviction_removes_least_recently_used_entries(self):
+        source = get_run_dir("src")
+        (source / "results").mkdir(parents=True)
+        (source / "results" / "out.gb").write_text("x" * 100)
+
+        simulation_cache.store("old", source)
+        simulation_cache.store("new", source)
+        simulation_cache.materialize("new", get_run_dir("dst"))
+
+        evicted = simulation_cache.evict(max_bytes=150)
+
+        self.assertEqual(evicted, ["old"])
+        self.assertEqual([e["key"] for e in simulation_cache.list_entries()], ["new"])
+
+
+# =====================
+# STORE DE BLOBS
+# =====================
+# Les séquences identiques de deux runs partagent un seul fichier sur le disque.
+class BlobStoreTests(SimulationTestCase):
+    def test_identical_sequences_are_shared_between_runs(self):
+        self.submit()
+        self.submit()
+        first, second = SimulationJob.objects.order_by("id")
+
+        seq1 = get_run_dir(first.run_id) / "sequences" / "pTEST001.gb"
+        seq2 = get_run_dir(second.run_id) / "sequences" / "pTEST001.gb"
+        self.assertTrue(os.path.samefile(seq1, seq2))
+        self.assertEqual(seq1.read_text(), GB_CONTENT)
+
+    def test_garbage_collection_only_removes_unreferenced_blobs(self):
+        self.submit()
+        job = SimulationJob.objects.get()
+        digest = file_sha256(get_run_dir(job.run_id) / "sequences" / "pTEST001.gb")
+        blob = blobs.blob_path(digest, ".gb")
+
+        self.assertEqual(blobs.collect_garbage(grace_seconds=0)[0], 0)
+        self.assertTrue(blob.exists())
+
+        shutil.rmtree(get_run_dir(job.run_id))
+        removed, freed = blobs.collect_garbage(grace_seconds=0)
+        self.assertGreaterEqual(removed, 1)
+        self.assertFalse(blob.exists())
+
+    def test_grace_period_counts_from_blob_creation(self):
+        self.submit()
+        job = SimulationJob.objects.get()
+        blob = blobs.blob_path(file_sha256(get_run_dir(job.run_id) / "sequences" / "pTEST001.gb"), ".gb")
+        # Blob encore lié au run : gardé
+        self.assertEqual(blobs.collect_garbage()[0], 0)
+        stored_at = time.time() - 2 * blobs.GC_GRACE_SECONDS
+        os.utime(blob, (stored_at, stored_at))
+
+        # Supprimer le dernier lien rafraîchit st_ctime, pas la date de création
+        shutil.rmtree(get_run_dir(job.run_id))
+        removed, _ = blobs.collect_garbage()
+
+        self.assertGreaterEqual(removed, 1)
+        self.assertFalse(blob.exists())
+
+
+# =====================
+# VISUELS PRÉCALCULÉS
+# =====================
+# Les cartes sont servies page par page depuis visuals.jsonl ; il est régénéré s'il manque (anciens runs).
+class SimulationVisualsTests(SimulationTestCase):
+    def make_old_run(self, run_id, count=1):
+        results = get_run_dir(run_id) / "results"
+        results.mkdir(parents=True)
+        for i in range(1, count + 1):
+            (results / f"pOUT{i:02d}.gb").write_text(GB_CONTENT)
+        return get_run_dir(run_id)
+
+    def get_maps(self, run_id, **params):
+        return self.client.get(reverse("simulations:simulation_maps", args=[run_id]), params)
+
+    def test_missing_sidecar_is_regenerated(self):
+        work_dir = self.make_old_run("oldrun")
+
+        response = self.get_maps("oldrun")
+
+        maps = response.json()["results"]
+        self.assertEqual([m["filename"] for m in maps], ["pOUT01.gb"])
+        self.assertEqual(maps[0]["features"][0]["label"], "part")
+        self.assertTrue((work_dir / "visuals.jsonl").exists())
+
+    def test_maps_are_paginated(self):
+        self.make_old_run("manyruns", count=5)
+
+        first = self.get_maps("manyruns", page=1, page_size=2).json()
+        last = self.get_maps("manyruns", page=3, page_size=2).json()
+
+        self.assertEqual([m["filename"] for m in first["results"]], ["pOUT01.gb", "pOUT02.gb"])
+        self.assertTrue(first["has_next"])
+        self.assertEqual([m["filename"] for m in last["results"]], ["pOUT05.gb"])
+        self.assertFalse(last["has_next"])
+
+    def test_maps_filter_by_name(self):
+        work_dir = self.make_old_run("filtered")
+        (work_dir / "visuals.jsonl").write_text(
+            '{"filename":"pA.gb","name":"alpha","length":12,"visual_width":900,"features":[]}\n'
+            '{"filename":"pB.gb","name":"beta","length":12,"visual_width":900,"features":[]}\n'
+        )
+
+        response = self.get_maps("filtered", q="BETA")
+
+        self.assertEqual([m["filename"] for m in response.json()["results"]], ["pB.gb"])
+
+    def test_results_page_does_not_embed_maps(self):
+        self.make_old_run("lazy")
+
+        response = self.client.get(reverse("simulations:simulation_detail", args=["lazy"]))
+
+        self.assertNotIn("plasmid_visuals", response.context["results"])
+        self.assertContains(response, reverse("simulations:simulation_maps", args=["lazy"]))
+
+    def test_unknown_run_returns_404(self):
+        self.assertEqual(self.get_maps("missing").status_code, 404)
+
+    def test_run_sidecar_is_parsed_within_the_run_process_budget(self):
+        work_dir = self.make_old_run("budget", count=3)
+
+        with override_settings(GENBANK_PARSE_PARALLEL_MIN_BYTES=0), \
+                mock.patch("apps.plasmids.parsing.ProcessPoolExecutor") as pool:
+            finalize_outputs(work_dir, work_dir / "results")
+
+        pool.assert_not_called()
+        self.assertEqual(len(visuals.load_visuals(work_dir)), 3)
+
+    def test_maps_of_running_job_wait_for_the_finished_sidecar(self):
+        work_dir = self.make_old_run("writing")
+        job = SimulationJob.objects.create(run_id="writing", payload={}, status=SimulationJob.STATUS_RUNNING)
+
+        response = self.get_maps("writing")
+        self.assertEqual(response.status_code, 409)
+        self.assertFalse((work_dir / "visuals.jsonl").exists())
+
+        # Sidecar partiel laissé avant la fin du run : réécrit par finalize_outputs
+        visuals.write_visuals_sidecar(work_dir)
+        (work_dir / "results" / "pOUT02.gb").write_text(GB_CONTENT)
+        complete_job(job, finalize_outputs(work_dir, work_dir / "results"))
+
+        maps = self.get_maps("writing").json()["results"]
+        self.assertEqual([m["filename"] for m in maps], ["pOUT01.gb", "pOUT02.gb"])
+
+
+# =====================
+# EXTRACTION DES SÉQUENCES
+# =====================
+# Seuls les GenBank sont extraits, en flux, avec des tailles bornées.
+class SequenceArchiveExtractionTests(SimulationTestCase):
+    def write_zip(self, entries):
+        path = pathlib.Path(self.media_root) / "sequences.zip"
+        with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+            for name, content in entries.items():
+                zf.writestr(name, content)
+        return path
+
+    def test_extracts_only_genbank_members(self):
+        path = self.write_zip({
+            "pTEST001.gb": GB_CONTENT,
+            "nested/pTEST002.gb": GB_CONTENT,
+            "../escape.gb": GB_CONTENT,
+            "__MACOSX/._pTEST001.gb": "resource fork",
+            ".hidden.gb": GB_CONTENT,
+            "notes.txt": "not a sequence",
+        })
+        dest = pathlib.Path(self.media_root) / "sequences"
+
+        result = archives.extract_sequences(path, dest)
+
+        extracted = sorted(str(p.relative_to(dest)) for p in dest.rglob("*") if p.is_file())
+        self.assertEqual(extracted, ["escape.gb", "nested/pTEST002.gb", "pTEST001.gb"])
+        self.assertEqual((result.files, result.skipped), (3, 3))
+        self.assertEqual(result.bytes_written, 3 * len(GB_CONTENT.encode()))
+        self.assertEqual(preflight.names_from_zip(path), ["pTEST001.gb", "pTEST002.gb", "escape.gb"])
+
+    def test_size_limits_stop_extraction(self):
+        path = self.write_zip({"a.gb": GB_CONTENT, "b.gb": GB_CONTENT + " " * 5000})
+        dest = pathlib.Path(self.media_root) / "sequences"
+
+        with self.assertRaisesMessage(archives.ArchiveError, "'b.gb' is larger than"):
+            archives.extract_sequences(path, dest, max_file_bytes=2000)
+        with self.assertRaisesMessage(archives.ArchiveError, "archive is larger than"):
+            archives.extract_sequences(path, dest, max_total_bytes=len(GB_CONTENT) + 100)
+        self.assertEqual(list(dest.rglob("*.gb")), [])
+
+    def test_rejects_files_that_are_not_genbank(self):
+        path = self.write_zip({"pTEST001.gb": GB_CONTENT, "fake.gb": ">fasta\nATGC\n"})
+
+        with self.assertRaisesMessage(archives.ArchiveError, "'fake.gb' is not a GenBank file"):
+            archives.extract_sequences(path, pathlib.Path(self.media_root) / "sequences")
+
+    @override_settings(SIMULATION_ARCHIVE_MAX_BYTES=100)
+    def test_oversized_archive_is_refused_by_the_form(self):
+        response = self.submit()
+
+        self.assertContains(response, "The sequences archive is larger than")
+        self.assertFalse(SimulationJob.objects.exists())
+
+
+# =====================
+# TÉLÉCHARGEMENT ZIP
+# =====================
+# L'archive n'est plus précalculée : elle est construite en streaming, éventuellement filtrée.
+class SimulationDownloadTests(SimulationTestCase):
+    def setUp(self):
+        super().setUp()
+        results = get_run_dir("dlrun") / "results"
+        results.mkdir(parents=True)
+        (results / "pOUT1.gb").write_text(GB_CONTENT)
+        (results / "DB_produced_plasmid.csv").write_text("id,name\npOUT1,out\n")
+        (results / "digestion.svg").write_text("<svg/>")
+
+    def download(self, **params):
+        response = self.client.get(reverse("simulations:simulation_download", args=["dlrun"]), params)
+        self.assertTrue(response.streaming)
+        return zipfile.ZipFile(io.BytesIO(b"".join(response.streaming_content)))
+
+    def test_full_archive_contains_all_results(self):
+        archive = self.download()
+
+        self.assertEqual(sorted(archive.namelist()), ["DB_produced_plasmid.csv", "digestion.svg", "pOUT1.gb"])
+        self.assertEqual(archive.read("pOUT1.gb").decode(), GB_CONTENT)
+        self.assertIsNone(archive.testzip())
+
+    def test_subset_selection(self):
+        self.assertEqual(self.download(kind="gb").namelist(), ["pOUT1.gb"])
+        self.assertEqual(self.download(kind="tables").namelist(), ["DB_produced_plasmid.csv"])
+        self.assertEqual(self.download(file="digestion.svg").namelist(), ["digestion.svg"])
+
+    def test_unknown_kind_is_rejected(self):
+        response = self.client.get(reverse("simulations:simulation_download", args=["dlrun"]), {"kind": "exe"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_no_archive_is_prebuilt(self):
+        finalize_outputs(get_run_dir("dlrun"), get_run_dir("dlrun") / "results")
+        self.assertFalse((get_run_dir("dlrun") / "tout_telecharger.zip").exists())
+
+
+# =====================
+# AVANCEMENT
+# =====================
+# L'observer publie les assemblages et problèmes dans progress.jsonl, relayés par la vue de statut.
+class SimulationProgressTests(SimulationTestCase):
+    def test_observer_records_assemblies_and_issues(self):
+        work_dir = get_run_dir("progressrun")
+        output_dir = work_dir / "results"
+        output_dir.mkdir(parents=True)
+        observer = progress.ProgressObserver(work_dir, fail_on_error=False, watch_interval=0.01)
+
+        with observer.track(output_dir, total=2):
+            (output_dir / "pOUT1.gb").write_text(GB_CONTENT)
+            observer.notify_unknown_digestion_enzyme(enzyme_name="FooI")
+            (output_dir / "pOUT2.gb").write_text(GB_CONTENT)
+        observer.finished()
+
+        events, _ = progress.read_events(work_dir)
+        self.assertEqual(events[0]["type"], "started")
+        self.assertEqual(events[-1]["type"], "finished")
+        assemblies = [e for e in events if e["type"] == "assembly"]
+        self.assertEqual([(e["plasmid_id"], e["done"], e["total"]) for e in assemblies], [("pOUT1", 1, 2), ("pOUT2", 2, 2)])
+        issue = next(e for e in events if e["type"] == "issue")
+        self.assertEqual(issue["details"], {"enzyme_name": "FooI"})
+
+    def test_failure_is_recorded(self):
+        work_dir = get_run_dir("failedrun")
+        (work_dir / "results").mkdir(parents=True)
+        observer = progress.ProgressObserver(work_dir)
+
+        with self.assertRaises(ValueError):
+            with observer.track(work_dir / "results", total=1):
+                raise ValueError("boom")
+
+        events, _ = progress.read_events(work_dir)
+        self.assertEqual(events[-1]["type"], "failed")
+        self.assertEqual(events[-1]["message"], "boom")
+
+    def test_status_endpoint_returns_progress_after_last_event(self):
+        work_dir = get_run_dir("pollrun")
+        (work_dir / "results").mkdir(parents=True)
+        store = progress.ProgressStore(work_dir)
+        store.append("started", total=1)
+        store.append("assembly", plasmid_id="pOUT1", done=1, total=1)
+        SimulationJob.objects.create(run_id="pollrun", payload={}, status=SimulationJob.STATUS_RUNNING)
+        url = reverse("simulations:simulation_status", args=["pollrun"])
+
+        data = self.client.get(url, {"after": 0}).json()
+        resumed = self.client.get(url, {"after": 1}).json()
+
+        self.assertEqual(data["status"], "running")
+        self.assertEqual([e["seq"] for e in data["events"]], [1, 2])
+        self.assertEqual(data["events"][1]["plasmid_id"], "pOUT1")
+        self.assertEqual([e["seq"] for e in resumed["events"]], [2])
+        self.assertNotIn("events", self.client.get(url).json())
+        self.assertEqual(self.client.get(url, {"after": "x"}).status_code, 400)
+
+
+# =====================
+# MESURES PAR PHASE
+# =====================
+class SimulationMetricsTests(SimulationTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username="metrics", email="metrics@example.com", password="pass")
+
+    def test_submission_records_web_phases(self):
+        self.client.force_login(self.user)
+        self.submit()
+
+        web = Campaign.objects.get().results_data["metrics"]["web"]
+        self.assertEqual(web["input_files"], 1)
+        self.assertEqual(list(web["phases"]), ["upload", "preflight", "extract", "enqueue"])
+        self.assertEqual(web["phases"]["extract"]["files"], 1)
+        for phase in web["phases"].values():
+            self.assertGreaterEqual(phase["wall_s"], 0)
+            self.assertGreater(phase["max_rss_kb"], 0)
+
+    def test_phase_peak_is_measured_per_phase(self):
+        # Le pic d'une phase ne reprend pas celui des phases précédentes du processus
+        recorder = metrics.PhaseRecorder()
+        with recorder.phase("large"):
+            block = bytearray(64 * 1024 * 1024)
+            block[::4096] = b"x" * len(block[::4096])
+            del block
+        with recorder.phase("small"):
+            pass
+
+        large, small = recorder.phases["large"], recorder.phases["small"]
+        self.assertGreater(large["max_rss_kb"], 0)
+        self.assertGreater(small["max_rss_kb"], 0)
+        self.assertIn("rss_delta_kb", small)
+        if metrics.reset_peak_rss():
+            self.assertGreaterEqual(large["max_rss_kb"] - small["max_rss_kb"], 48 * 1024)
+
+    def test_completed_job_records_worker_phases(self):
+        campaign = Campaign.objects.create(name="Measured", run_id="measured", owner=self.user)
+        job = SimulationJob.objects.create(run_id="measured", payload={}, campaign=campaign)
+        metrics.store_metrics(campaign, "web", {"phases": {}, "input_files": 3})
+
+        complete_job(job, {"files": ["a.gb"], "metrics": {"phases": {"compute": {"wall_s": 1.5, "cpu_s": 1.2}}}})
+
+        campaign.refresh_from_db()
+        self.assertEqual(campaign.results_data["metrics"]["web"]["input_files"], 3)
+        self.assertEqual(campaign.results_data["metrics"]["worker"]["phases"]["compute"]["wall_s"], 1.5)
+
+    def test_aggregate_percentiles(self):
+        created_at = timezone.now()
+        rows = [
+            (created_at, {"metrics": {"worker": {"phases": {"compute": {"wall_s": wall, "cpu_s": wall, "max_rss_kb": 2048}}}}})
+            for wall in (1.0, 2.0, 3.0, 4.0, 5.0)
+        ] + [(created_at, {})]
+
+        summary = metrics.aggregate_metrics(rows)
+
+        self.assertEqual(summary["runs"], 5)
+        compute = summary["phases"][0]
+        self.assertEqual(compute["name"], "compute")
+        self.assertEqual(compute["wall"]["p50"], 3.0)
+        self.assertAlmostEqual(compute["wall"]["p90"], 4.6)
+        self.assertEqual(compute["rss_max_mb"], 2.0)
+        self.assertEqual(summary["weeks"][0]["total_p50"], 3.0)
+
+    def test_metrics_page_is_staff_only(self):
+        url = reverse("simulations:simulation_metrics")
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(url).status_code, 302)
+
+        self.user.is_staff = True
+        self.user.save()
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Simulation Metrics")
+
+    def test_benchmark_template_has_requested_size(self):
+        from .management.commands.benchmark_simulation import write_template
+
+        path = get_run_dir("bench") / "template.xlsx"
+        path.parent.mkdir(parents=True)
+        write_template(path, 12)
+
+        self.assertEqual(progress.count_template_plasmids(path), 12)
+
+
+# =====================
+# DÉCOUPAGE DES GROS TEMPLATES
+# =====================
+# Un template réparti sur plusieurs processus produit les mêmes fichiers qu'un run d'un seul tenant.
+def prepare_benchmark_run(run_id, size):
+    """Dossier de run avec un template de ``size`` plasmides sur les séquences pYTK de data/ ; renvoie le payload."""
+    from .management.commands.benchmark_simulation import write_correspondence, write_template
+
+    work_dir = get_run_dir(run_id)
+    for folder in ("template", "correspondence"):
+        (work_dir / folder).mkdir(parents=True)
+    write_template(work_dir / "template" / "template.xlsx", size)
+    write_correspondence(work_dir / "correspondence" / "parts.csv")
+    shutil.copytree(os.path.join(settings.BASE_DIR, "data", "pYTK"), work_dir / "sequences")
+    return {
+        "template": "template/template.xlsx",
+        "correspondence": "correspondence/parts.csv",
+        "default_concentration": 200.0,
+    }
+
+
+class SimulationShardingTests(SimulationTestCase):
+
+    def test_shard_count(self):
+        self.assertEqual(sharding.shard_count(1000, max_shards=4, min_rows=250), 4)
+        self.assertEqual(sharding.shard_count(600, max_shards=4, min_rows=250), 2)
+        self.assertEqual(sharding.shard_count(100, max_shards=4, min_rows=250), 1)
+        self.assertEqual(sharding.shard_count(None, max_shards=4, min_rows=250), 1)
+
+    @override_settings(SIMULATION_SHARD_MIN_ROWS=4, SIMULATION_CACHE_ENABLED=False)
+    def test_sharded_run_matches_single_process_run(self):
+        single = run_simulation("single", prepare_benchmark_run("single", 12), max_shards=1)
+        sharded = run_simulation("sharded", prepare_benchmark_run("sharded", 12), max_shards=3)
+
+        self.assertEqual(sharded["metrics"]["phases"]["compute"]["shards"], 3)
+        self.assertEqual(single["files"], sharded["files"])
+        self.assertFalse((get_run_dir("sharded") / "results" / sharding.SHARDS_DIRNAME).exists())
+        for name in single["files"]:
+            if name.endswith((".csv", ".json")):
+                self.assertEqual(
+                    (get_run_dir("single") / "results" / name).read_text(),
+                    (get_run_dir("sharded") / "results" / name).read_text(),
+                    name,
+                )
+
+    @override_settings(SIMULATION_SHARD_MIN_ROWS=4, SIMULATION_CACHE_ENABLED=False)
+    def test_sharded_aggregates_match_compute_all(self):
+        # write_aggregates reprend la fin de compute_all : toute divergence d'insillyclo se voit ici
+        run_simulation("single", prepare_benchmark_run("single", 12), max_shards=1)
+        run_simulation("sharded", prepare_benchmark_run("sharded", 12), max_shards=3)
+
+        single, sharded = get_run_dir("single") / "results", get_run_dir("sharded") / "results"
+        aggregates = sorted(
+            path.name for path in single.iterdir()
+            if path.name in sharding.AGGREGATE_FILENAMES or path.name.startswith("dilution-")
+        )
+        self.assertIn("DB_produced_plasmid.csv", aggregates)
+        self.assertTrue(any(name.startswith("dilution-") for name in aggregates))
+        for name in aggregates:
+            self.assertEqual((single / name).read_bytes(), (sharded / name).read_bytes(), name)
+        self.assertEqual(
+            incremental.read_fingerprints(get_run_dir("single")),
+            incremental.read_fingerprints(get_run_dir("sharded")),
+        )
+
+    def test_worker_shares_shard_budget(self):
+        worker = SimulationWorker(max_workers=3, log=lambda msg: None, shards_per_run=4, max_processes=6)
+
+        self.assertEqual(worker._shard_budget({}), 4)
+        self.assertEqual(worker._shard_budget({1: mock.Mock(shards=4)}), 2)
+        self.assertEqual(worker._shard_budget({1: mock.Mock(shards=4), 2: mock.Mock(shards=2)}), 1)
+
+
+# =====================
+# RERUNS INCRÉMENTAUX
+# =====================
+# Un rerun ne resimule que les lignes modifiées et produit les mêmes fichiers qu'un run complet.
+@override_settings(SIMULATION_CACHE_ENABLED=False)
+class SimulationIncrementalTests(SimulationTestCase):
+    def edit_template(self, run_id, row, column, value):
+        path = get_run_dir(run_id) / "template" / "template.xlsx"
+        workbook = openpyxl.load_workbook(path)
+        sheet = workbook.worksheets[0]
+        header_row = next(cell.row for cell in sheet["A"] if cell.value == sharding.OUTPUT_HEADER)
+        sheet.cell(row=header_row + row, column=column, value=value)
+        workbook.save(path)
+        return sheet.cell(row=header_row + row, column=1).value
+
+    def test_run_records_fingerprint_per_plasmid(self):
+        run_simulation("base", prepare_benchmark_run("base", 4))
+
+        fingerprints = incremental.read_fingerprints(get_run_dir("base"))
+        self.assertEqual(sorted(fingerprints), [f"pBENCH{i:04d}" for i in range(1, 5)])
+
+    def test_rerun_only_simulates_changed_rows(self):
+        from .management.commands.benchmark_simulation import CDS
+
+        run_simulation("base", prepare_benchmark_run("base", 6))
+        payload = prepare_benchmark_run("rerun", 6)
+        changed = self.edit_template("rerun", 2, 5, CDS[-1])
+        output = run_simulation("rerun", {**payload, "previous_run": "base"})
+
+        self.assertEqual(output["metrics"]["phases"]["compute"]["reused"], 5)
+        base_results, rerun_results = get_run_dir("base") / "results", get_run_dir("rerun") / "results"
+        # Plasmides inchangés : mêmes fichiers (liens durs), le plasmide modifié est recalculé
+        self.assertEqual(os.stat(base_results / "pBENCH0001.gb").st_ino, os.stat(rerun_results / "pBENCH0001.gb").st_ino)
+        self.assertNotEqual(os.stat(base_results / f"{changed}.gb").st_ino, os.stat(rerun_results / f"{changed}.gb").st_ino)
+        self.assertNotEqual(
+            incremental.read_fingerprints(get_run_dir("base"))[changed],
+            incremental.read_fingerprints(get_run_dir("rerun"))[changed],
+        )
+
+        # Même résultat qu'un run complet du template modifié
+        prepare_benchmark_run("fresh", 6)
+        self.edit_template("fresh", 2, 5, CDS[-1])
+        fresh = run_simulation("fresh", payload)
+        self.assertEqual(output["files"], fresh["files"])
+        for name in fresh["files"]:
+            if name.endswith((".csv", ".json")):
+                self.assertEqual(
+                    (rerun_results / name).read_text(),
+                    (get_run_dir("fresh") / "results" / name).read_text(),
+                    name,
+                )
+        self.assertEqual(
+            [visual["filename"] for visual in visuals.load_visuals(get_run_dir("rerun"))],
+            [visual["filename"] for visual in visuals.load_visuals(get_run_dir("fresh"))],
+        )
+
+    def test_changed_sequence_resimulates_plasmids_using_it(self):
+        from .management.commands.benchmark_simulation import FIXED_PARTS
+
+        run_simulation("base", prepare_benchmark_run("base", 3))
+        payload = {**prepare_benchmark_run("rerun", 3), "previous_run": "base"}
+        # Part commune à tous les plasmides : même nom de fichier, contenu différent
+        sequences_dir = get_run_dir("rerun") / "sequences"
+        gb_file = next(sequences_dir.glob(f"**/{FIXED_PARTS['Con1'][0]}.gb"))
+        previous_file = get_run_dir("base") / "sequences" / gb_file.relative_to(sequences_dir)
+        previous_content = previous_file.read_bytes()
+        # Nouveau fichier : celui du run peut être un lien dur vers un blob partagé
+        content = gb_file.read_text().replace("DEFINITION  ", "DEFINITION  edited ", 1)
+        gb_file.unlink()
+        gb_file.write_text(content)
+
+        output = run_simulation("rerun", payload)
+
+        self.assertEqual(output["metrics"]["phases"]["compute"]["reused"], 0)
+        self.assertEqual(previous_file.read_bytes(), previous_content)
+
+    def test_previous_run_must_be_a_run_id(self):
+        run_simulation("base", prepare_benchmark_run("base", 2))
+        work_dir = get_run_dir("rerun")
+
+        self.assertEqual(incremental.previous_run_dir({"previous_run": "base"}, work_dir), get_run_dir("base"))
+        self.assertIsNone(incremental.previous_run_dir({"previous_run": "../simulations/base"}, work_dir))
+        self.assertIsNone(incremental.previous_run_dir({"previous_run": "missing"}, work_dir))
+        self.assertIsNone(incremental.previous_run_dir({}, work_dir))
+
+
+# =====================
+# RÉTENTION
+# =====================
+@override_settings(
+    SIMULATION_ORPHAN_GRACE_HOURS=24,
+    SIMULATION_ANONYMOUS_RETENTION_DAYS=7,
+    SIMULATION_RETENTION_DAYS=0,
+    SIMULATION_COMPACT_AFTER_DAYS=30,
+    SIMULATION_USER_QUOTA_BYTES=0,
+)
+class SimulationRetentionTests(SimulationTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username="owner", email="owner@example.com", password="pass")
+        self.sources = pathlib.Path(self.media_root) / "sources"
+        self.sources.mkdir()
+
+    def make_run(self, run_id, *, days, owner=None, campaign=False, status=SimulationJob.STATUS_DONE,
+                 results=b"R" * 100):
+        """
+        Dossier de run âgé de ``days`` jours : une séquence de 1000 octets (propre au run)
+        liée au store de blobs, des résultats et un template référencé par le manifeste.
+        """
+        work_dir = get_run_dir(run_id)
+        (work_dir / "sequences").mkdir(parents=True)
+        (work_dir / "results").mkdir()
+        (work_dir / "template").mkdir()
+        source = self.sources / f"{run_id}.gb"
+        source.write_bytes(run_id.encode().ljust(1000, b"A"))
+        blobs.link_into(source, work_dir / "sequences" / "part.gb")
+        source.unlink()
+        (work_dir / "results" / "p1.gb").write_bytes(results)
+        (work_dir / "template" / "plan.xlsx").write_bytes(b"T" * 10)
+        manifest.write_manifest(work_dir, {"template": work_dir / "template" / "plan.xlsx"})
+
+        created = timezone.now() - datetime.timedelta(days=days)
+        age = time.time() - days * 86400
+        os.utime(work_dir, (age, age))
+        if campaign:
+            row = Campaign.objects.create(name=run_id, owner=owner or self.user, run_id=run_id)
+            Campaign.objects.filter(pk=row.pk).update(created_at=created)
+        if status is not None:
+            job = SimulationJob.objects.create(run_id=run_id, status=status, owner=owner)
+            SimulationJob.objects.filter(pk=job.pk).update(created_at=created, finished_at=created)
+        return work_dir
+
+    def test_expired_orphan_and_anonymous_runs_are_deleted_and_old_campaigns_compacted(self):
+        self.make_run("orphan", days=2, status=None)
+        self.make_run("fresh-orphan", days=0, status=None)
+        self.make_run("anon", days=10)
+        self.make_run("anon-new", days=1)
+        self.make_run("queued", days=10, status=SimulationJob.STATUS_QUEUED)
+        old = self.make_run("old", days=40, campaign=True)
+        self.make_run("recent", days=5, campaign=True)
+
+        report = retention.collect()
+
+        remaining = sorted(path.name for path in retention.get_simulations_dir().iterdir())
+        self.assertEqual(remaining, ["anon-new", "fresh-orphan", "old", "queued", "recent"])
+        self.assertFalse(SimulationJob.objects.filter(run_id="anon").exists())
+        # Compactage : les séquences partent, résultats et entrées du manifeste restent
+        self.assertFalse((old / "sequences").exists())
+        self.assertTrue((old / "results" / "p1.gb").is_file())
+        self.assertEqual(manifest.input_path(old, "template"), old / "template" / "plan.xlsx")
+        self.assertTrue((get_run_dir("recent") / "sequences").is_dir())
+        self.assertEqual([a.workspace.run_id for a in report.compacted], ["old"])
+        # Deux dossiers supprimés (séquence + résultats + fichiers d'entrée), une séquence compactée
+        manifest_size = (old / manifest.MANIFEST_FILENAME).stat().st_size
+        self.assertEqual(report.bytes_reclaimed, 2 * (1000 + 100 + 10 + manifest_size) + 1000)
+        self.assertEqual(report.blobs_removed, 3)
+
+    def test_user_quota_compacts_then_deletes_oldest_runs(self):
+        other = User.objects.create_user(username="other", email="other@example.com", password="pass")
+        for index, days in enumerate((20, 10, 1)):
+            self.make_run(f"run{index}", days=days, campaign=True, results=b"R" * 3000)
+        self.make_run("other", days=20, campaign=True, owner=other, results=b"R" * 3000)
+        run_size = retention.tree_size(get_run_dir("run0"))
+
+        with override_settings(SIMULATION_USER_QUOTA_BYTES=2 * run_size):
+            report = retention.collect()
+
+        # Compacter les trois runs ne suffit pas (3 x 3000 octets de résultats) : le plus ancien est supprimé
+        self.assertEqual([a.workspace.run_id for a in report.deleted], ["run0"])
+        self.assertEqual([a.workspace.run_id for a in report.compacted], ["run1", "run2"])
+        self.assertFalse(Campaign.objects.filter(run_id="run0").exists())
+        self.assertTrue((get_run_dir("run2") / "results" / "p1.gb").is_file())
+        # Le quota est par utilisateur
+        self.assertTrue((get_run_dir("other") / "sequences").is_dir())
+
+    def test_dry_run_reports_without_deleting(self):
+        self.make_run("anon", days=10)
+        self.make_run("old", days=40, campaign=True)
+        out = io.StringIO()
+
+        call_command("simulation_gc", "--dry-run", stdout=out)
+        expected = retention.collect(dry_run=True).bytes_reclaimed
+
+        self.assertTrue(get_run_dir("anon").is_dir())
+        self.assertTrue((get_run_dir("old") / "sequences").is_dir())
+        self.assertTrue(SimulationJob.objects.filter(run_id="anon").exists())
+        self.assertIn("delete anon (anonymous run expired)", out.getvalue())
+        self.assertIn("compact old", out.getvalue())
+        self.assertEqual(retention.collect().bytes_reclaimed, expected)
+
+
+# =====================
+# SUPPRESSION ASYNCHRONE
+# =====================
+class SimulationDeletionTests(SimulationTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username="deleter", email="deleter@example.com", password="pass")
+        self.client.force_login(self.user)
+
+    def make_campaign(self, run_id, status=SimulationJob.STATUS_DONE):
+        (get_run_dir(run_id) / "results").mkdir(parents=True)
+        (get_run_dir(run_id) / "results" / "p1.gb").write_text(GB_CONTENT)
+        campaign = Campaign.objects.create(name=run_id, owner=self.user, run_id=run_id)
+        SimulationJob.objects.create(run_id=run_id, status=status, owner=self.user, campaign=campaign)
+        return campaign
+
+    def test_delete_view_hides_campaigns_and_worker_removes_them(self):
+        campaigns = [self.make_campaign(f"run{i}") for i in range(3)]
+        kept = self.make_campaign("kept")
+
+        response = self.client.post(
+            reverse("simulations:delete_campaigns"),
+            {"campaign_ids": [c.pk for c in campaigns]},
+        )
+
+        self.assertRedirects(response, reverse("simulations:history"), fetch_redirect_response=False)
+        # Rien n'est supprimé pendant la requête, mais les campagnes ne sont plus visibles
+        self.assertTrue(all(get_run_dir(c.run_id).is_dir() for c in campaigns))
+        history = self.client.get(reverse("simulations:history"))
+        self.assertEqual(list(history.context["campaigns"]), [kept])
+        self.assertRedirects(
+            self.client.get(reverse("simulations:simulation_detail", args=["run0"])),
+            reverse("simulations:simu"),
+            fetch_redirect_response=False,
+        )
+
+        call_command("simulation_deletion_worker", "--once", "--batch-size", "2", stdout=io.StringIO())
+
+        self.assertEqual(list(Campaign.objects.all()), [kept])
+        self.assertEqual(list(SimulationJob.objects.values_list("run_id", flat=True)), ["kept"])
+        self.assertFalse(any(get_run_dir(c.run_id).exists() for c in campaigns))
+        self.assertTrue(get_run_dir("kept").is_dir())
+
+    def test_blobs_of_deleted_runs_are_freed_by_the_same_pass(self):
+        self.submit()
+        job = SimulationJob.objects.get(campaign__owner=self.user)
+        SimulationJob.objects.filter(pk=job.pk).update(status=SimulationJob.STATUS_DONE)
+        blob = blobs.blob_path(file_sha256(get_run_dir(job.run_id) / "sequences" / "pTEST001.gb"), ".gb")
+
+        deletion.request_deletion(Campaign.objects.all())
+        deletion.process_pending()
+
+        self.assertFalse(get_run_dir(job.run_id).exists())
+        self.assertFalse(blob.exists())
+        self.assertEqual(list(blobs.get_blob_dir().glob("*/*")), [])
+
+    def test_failed_deletions_are_retried_then_reported(self):
+        campaign = self.make_campaign("stuck")
+        deletion.request_deletion(Campaign.objects.filter(pk=campaign.pk))
+
+        with override_settings(SIMULATION_DELETION_MAX_ATTEMPTS=2), \
+                mock.patch("apps.simulations.deletion.shutil.rmtree", side_effect=PermissionError("denied")):
+            report = deletion.process_pending()
+            # Nouvelle tentative seulement après le délai
+            self.assertEqual(deletion.process_pending().failed, [])
+            later = timezone.now() + datetime.timedelta(seconds=deletion.RETRY_BASE_SECONDS + 1)
+            deletion.process_pending(now=later)
+            failed = list(deletion.failed_deletions())
+
+        self.assertEqual(report.failed, [(campaign.pk, "stuck", "denied")])
+        self.assertEqual(failed, [campaign])
+        self.assertEqual(failed[0].deletion_error, "denied")
+        self.assertTrue(get_run_dir("stuck").is_dir())
+
+        deletion.retry(Campaign.objects.all())
+        self.assertEqual(deletion.process_pending().deleted, [campaign.pk])
+        self.assertFalse(get_run_dir("stuck").exists())
+
+    def test_active_runs_are_cancelled_before_their_directory_is_removed(self):
+        queued = self.make_campaign("queued", status=SimulationJob.STATUS_QUEUED)
+        running = self.make_campaign("running", status=SimulationJob.STATUS_RUNNING)
+
+        deletion.request_deletion(Campaign.objects.all())
+        report = deletion.process_pending()
+
+        self.assertEqual(report.deleted, [queued.pk])
+        job = SimulationJob.objects.get(run_id="running")
+        self.assertTrue(job.cancel_requested)
+        self.assertTrue(get_run_dir("running").is_dir())
+
+        fail_job(job, "Simulation cancelled.", reason=SimulationJob.REASON_CANCELLED, status=SimulationJob.STATUS_CANCELLED)
+        self.assertEqual(deletion.process_pending().deleted, [running.pk])
@@ -5,7 +5,14 @@ app_name = 'simulations'
 
 urlpatterns = [
     path('', views.simulation_view, name='simu'),
+    path('batch/', views.simulation_batch_view, name='simu_batch'),
+    path('batch/<str:batch_id>/', views.simulation_batch_detail_view, name='batch_detail'),
     path('history/', views.simulation_history_view, name='history'),
     path('results/<str:sim_id>/', views.simulation_detail_view, name='simulation_detail'),
+    path('results/<str:sim_id>/download/', views.simulation_download_view, name='simulation_download'),
+    path('results/<str:sim_id>/maps/', views.simulation_maps_view, name='simulation_maps'),
+    path('results/<str:sim_id>/cancel/', views.simulation_cancel_view, name='simulation_cancel'),
+    path('status/<str:sim_id>/', views.simulation_status_view, name='simulation_status'),
     path('delete/', views.delete_campaigns_view, name='delete_campaigns'),
-]
\ No newline at end of file
+    path('admin/metrics/', views.simulation_metrics_view, name='simulation_metrics'),
+]
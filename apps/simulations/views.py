@@ -1,12 +1,12 @@
 import os
+import datetime
 import shutil
 import uuid
-import zipfile
 import pathlib
 import traceback
 import glob
+from collections import Counter
 import re
-import pandas as pd
 
 from django.shortcuts import render, redirect
 from django.conf import settings
@@ -14,174 +14,44 @@ from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.db.models import Count
 
-from Bio import SeqIO
+from django.http import Http404, HttpResponseBadRequest, JsonResponse, StreamingHttpResponse
+from django.urls import reverse
 
 # Imports du projet
-import insillyclo.observer
-import insillyclo.simulator
-import insillyclo.data_source
-
-from .models import Campaign
-from apps.plasmids.models import Plasmid, PlasmidCollection, PlasmidAnnotation
+from . import archives, batches, blobs, deletion, manifest, metrics, preflight, progress
+from . import cache as simulation_cache
+from .jobs import enqueue_simulation, get_run_dir, request_cancel
+from .models import Campaign, SimulationBatch, SimulationJob
+from .visuals import page_visuals
+from apps.core.utils.hashing import file_sha256
+from apps.plasmids import parse_cache
+from apps.plasmids.models import PlasmidCollection
+from apps.plasmids.service import bulk_import_genbank_files, export_plasmids_to_dir, plasmids_for_export
 
 from django.views.decorators.http import require_POST
+from django.contrib.admin.views.decorators import staff_member_required
+from django.utils import timezone
 
 # ==========================================
-# 1. CONSTANTES & CONFIGURATION
+# 1. FONCTIONS UTILITAIRES (FILES)
 # ==========================================
 
-COLORS = {
-    "tRNA": "#070087",
-    "CDS": "#0000FF",
-    "rep_origin": "#1C9BFF",
-    "promoter": "#66CCFF",
-    "misc_feature": "#C2E0FF",
-    "misc_RNA": "#C2E0FF",
-    "protein_bind": "#FF9900",
-    "RBS": "#F8B409",
-    "terminator": "#FFCD36",
+# Rôle d'un fichier du manifeste -> clé du pré-remplissage du formulaire
+PREFILL_KEYS = {
+    'template': 'prev_template',
+    'correspondence': 'prev_correspondence',
+    'archive': 'prev_zip',
+    'primers': 'prev_primers',
+    'concentrations': 'prev_concentrations',
 }
 
 
-# ==========================================
-# 2. FONCTIONS UTILITAIRES (VISUALISATION)
-# ==========================================
-
-def detect_overlaps_and_adjust(features_list):
-    """Détecte les chevauchements visuels et ajuste les niveaux des labels."""
-    # Trier par position centrale
-    features_sorted = sorted(features_list, key=lambda f: f["visual_center"])
-    
-    for current_feature in features_sorted:
-        current_feature["label_level"] = 0
-        
-        for test_level in range(3):
-            has_overlap = False
-            
-            for other_feature in features_sorted:
-                if other_feature == current_feature: continue
-                
-                if other_feature.get("label_level", 0) != test_level: continue
-                
-                # Calcul des positions horizontales (avec marge de 5px)
-                c_left = current_feature["visual_center"] - current_feature["label_text_width"] / 2
-                c_right = current_feature["visual_center"] + current_feature["label_text_width"] / 2
-                o_left = other_feature["visual_center"] - other_feature["label_text_width"] / 2
-                o_right = other_feature["visual_center"] + other_feature["label_text_width"] / 2
-                
-                if not (c_right + 5 < o_left or o_right + 5 < c_left):
-                    has_overlap = True
-                    break
-            
-            if not has_overlap:
-                current_feature["label_level"] = test_level
-                break
-
-def get_plasmid_visual_data(gb_path):
-    """
-    Lit un fichier .gb et prépare les données pour le rendu SVG/HTML.
-    """
-    try:
-        record = next(SeqIO.parse(gb_path, "genbank"))
-    except:
-        return None
-
-    # --- Extraction des features ---
-    features = []
-    for f in record.features:
-        if f.type == 'source': continue
-        
-        # Récupération Label
-        label = ""
-        if 'label' in f.qualifiers: label = f.qualifiers['label'][0]
-        elif 'gene' in f.qualifiers: label = f.qualifiers['gene'][0]
-        elif 'note' in f.qualifiers: label = f.qualifiers['note'][0]
-        else: label = f.type
-
-        features.append({
-            "start": int(f.location.start),
-            "end": int(f.location.end),
-            "length": int(f.location.end) - int(f.location.start),
-            "label": label,
-            "type": f.type,
-            "strand": f.location.strand if f.location.strand else 1,
-            "color": COLORS.get(f.type, "#CCCCCC"),
-        })
-
-    # --- Calculs graphiques ---
-    VISUAL_WIDTH = 900
-    seq_length = len(record.seq)
-    ratio = VISUAL_WIDTH / max(seq_length, 1)
-    
-    # Trier les features par position de départ
-    features = sorted(features, key=lambda f: f["start"])
-    
-    external_label_counter = 0
-    for f in features:
-        f["visual_width"] = max(2, int(f["length"] * ratio))
-        f["visual_left"] = int(f["start"] * ratio)
-        f["visual_center"] = f["visual_left"] + f["visual_width"] // 2
-
-        # Calcul des points SVG pour les flèches
-        w = f["visual_width"]
-        h = 20
-        d = 6 # Profondeur pointe
-
-        if f["strand"] == 1: # Forward
-            f["svg_points"] = f"0,0 {w-d},0 {w},{h//2} {w-d},{h} 0,{h}"
-        elif f["strand"] == -1: # Reverse
-            f["svg_points"] = f"{d},0 {w},0 {w},{h} {d},{h} 0,{h//2}"
-        else: # Rectangle
-            f["svg_points"] = f"0,0 {w},0 {w},{h} 0,{h}"
-
-        # Gestion des Labels
-        label_text_width = len(f.get("label", "")) * 8
-        f["label_text_width"] = label_text_width
-
-        if label_text_width <= f["visual_width"] - 10:
-            f["label_position"] = "inside"
-            f["label_side"] = None
-            f["label_level"] = 0
-        else:
-            f["label_position"] = "outside"
-            f["label_side"] = "above" if external_label_counter % 2 == 0 else "below"
-            f["label_level"] = 0
-            external_label_counter += 1
-
-    # --- Chevauchement et niveaux ---
-    features_above = [f for f in features if f.get("label_position") == "outside" and f.get("label_side") == "above"]
-    features_below = [f for f in features if f.get("label_position") == "outside" and f.get("label_side") == "below"]
-    
-    detect_overlaps_and_adjust(features_above)
-    detect_overlaps_and_adjust(features_below)
-
-    # --- CSS Final ---
-    for f in features:
-        if f.get("label_position") == "outside":
-            level = f.get("label_level", 0)
-            if f["label_side"] == "above":
-                f["css_top"] = f"{-15 - (level * 15)}px"
-                f["css_connector"] = "bottom: -15px;"
-            else:
-                f["css_top"] = f"{60 + (level * 15)}px"
-                f["css_connector"] = "top: -15px;"
-
-    return {
-        "filename": gb_path.name,
-        "name": record.description or record.id,
-        "length": seq_length,
-        "features": features,
-        "visual_width": VISUAL_WIDTH
-    }
-
-
-# ==========================================
-# 3. FONCTIONS UTILITAIRES (FILES)
-# ==========================================
-
 def handle_file_upload_or_recover(request, file_key, folder_name, work_dir, old_path_src=None, clear_flag=False):
     dest_dir = work_dir / folder_name
     dest_dir.mkdir(parents=True, exist_ok=True)
+
+    # Le fichier de concentrations est réécrit par compute_all : il ne doit pas être partagé
+    copy_input = shutil.copy if folder_name == 'concentrations' else blobs.link_into
     
     # Cas 1 : Nouveau fichier uploadé
     if file_key in request.FILES:
@@ -194,58 +64,97 @@ def handle_file_upload_or_recover(request, file_key, folder_name, work_dir, old_
     # Cas 2 : Demande de suppression
     if clear_flag: return None
 
-    # Cas 3 : Récupération depuis historique
+    # Cas 3 : Récupération depuis historique (fichier désigné par le manifeste de l'ancien run)
     if old_path_src:
-        old_subfolder = old_path_src / folder_name
-        
-        # S'il y a un dossier dédié (structure standard)
-        if old_subfolder.exists():
-            files = list(old_subfolder.glob('*'))
-            if files:
-                shutil.copy(files[0], dest_dir / files[0].name)
-                return dest_dir / files[0].name
-        
-        # Sinon recherche à la racine (rétro-compatibilité)
-        else:
-            candidates = []
-            if folder_name == 'template':
-                candidates = list(old_path_src.glob("*template*.*")) + list(old_path_src.glob("*.xlsx"))
-            elif folder_name == 'correspondence':
-                candidates = [f for f in old_path_src.glob("*.csv") if "conc" not in f.name.lower() and "primer" not in f.name.lower()]
-            elif folder_name == 'primers':
-                candidates = [f for f in old_path_src.glob("*.csv") if "primer" in f.name.lower()]
-            elif folder_name == 'concentrations':
-                candidates = [f for f in old_path_src.glob("*.csv") if "conc" in f.name.lower()]
-
-            if candidates:
-                shutil.copy(candidates[0], dest_dir / candidates[0].name)
-                return dest_dir / candidates[0].name
+        old_file = manifest.input_path(old_path_src, folder_name)
+        if old_file and old_file.is_file():
+            copy_input(old_file, dest_dir / old_file.name)
+            return dest_dir / old_file.name
     return None
 
 
-# ==========================================
-# 4. VUES DJANGO
-# ==========================================
-
-def simulation_view(request):
+def collections_context(request):
+    """Collections proposées dans les formulaires de simulation."""
     context = {}
-    
-    # --- A. RÉCUPÉRATION DES COLLECTIONS ---
     if request.user.is_authenticated:
         context['user_collections'] = PlasmidCollection.objects.filter(
             owner=request.user, is_public=False
-        ).annotate(plasmid_count=Count('plasmids'))  
-    
+        ).annotate(plasmid_count=Count('plasmids'))
     context['public_collections'] = PlasmidCollection.objects.filter(
         is_public=True
     ).annotate(plasmid_count=Count('plasmids'))
+    return context
+
+
+def get_selected_collections(request):
+    """Collections cochées et accessibles à l'utilisateur, dans l'ordre de sélection."""
+    selected_ids = request.POST.getlist('selected_collections')
+    if not selected_ids:
+        raise Exception("Please select at least one collection.")
+    accessible = {
+        col.id: col for col in PlasmidCollection.objects.filter(id__in=selected_ids)
+        if col.is_public or (request.user.is_authenticated and col.owner_id == request.user.id)
+    }
+    return [accessible[int(col_id)] for col_id in selected_ids if int(col_id) in accessible]
+
+
+def read_simulation_parameters(request, has_primers_db):
+    """Paires de primers PCR, enzymes de digestion et concentration par défaut du formulaire."""
+    pcr_primers = []
+    if has_primers_db and request.POST.get('pcr_primers'):
+        for line in request.POST.get('pcr_primers').splitlines():
+            if ',' in line: pcr_primers.append([x.strip() for x in line.split(',')[:2]])
+
+    enzymes = [e.strip() for e in request.POST.get('digestion_enzymes', '').split(',') if e.strip()] or None
+    def_conc = float(request.POST.get('default_concentration', 200))
+    return pcr_primers, enzymes, def_conc
+
+
+def report_preflight_error(request, error):
+    """Un message par problème : l'utilisateur corrige tout en une fois."""
+    problems = error.report.problems()
+    messages.error(request, f"Simulation not queued: {len(problems)} problem(s) found in the inputs.")
+    for line in str(error).splitlines():
+        messages.error(request, line)
+
+
+def report_preflight_warnings(request, report):
+    """Parts ambiguës : le run est mis en file, l'utilisateur est prévenu."""
+    for line in report.warnings():
+        messages.warning(request, line)
+
+
+def check_simulation_inputs(request, path_template, path_mapping, available_names):
+    """Vérification préalable (preflight) : lève PreflightError avec tous les problèmes trouvés."""
+    report = preflight.check_inputs(path_template, path_mapping, available_names)
+    if not report.ok:
+        raise preflight.PreflightError(report)
+    report_preflight_warnings(request, report)
+    return report
+
+
+def extract_sequences_archive(path_zip, sequences_dir):
+    """Extrait les fichiers GenBank de l'archive de séquences d'un run (voir archives.extract_sequences)."""
+    result = archives.extract_sequences(path_zip, sequences_dir)
+    # Dédoublonnage : les séquences extraites deviennent des liens vers le store
+    blobs.intern_tree(sequences_dir)
+    return result
+
+
+# ==========================================
+# 2. VUES DJANGO
+# ==========================================
+
+def simulation_view(request):
+    # --- A. RÉCUPÉRATION DES COLLECTIONS ---
+    context = collections_context(request)
 
     # --- B. PRÉ-REMPLISSAGE (GET from History) ---
     prefill = {}
     if request.method == 'GET' and 'from_sim' in request.GET:
         sim_id = request.GET.get('from_sim')
         try:
-            old_campaign = Campaign.objects.get(run_id=sim_id)
+            old_campaign = Campaign.objects.visible().get(run_id=sim_id)
             prefill['name'] = (old_campaign.name or "Untitled") + " (Rerun)"
             prefill['old_sim_id'] = sim_id
             
@@ -256,31 +165,11 @@ def simulation_view(request):
             prefill['use_collections'] = params.get('use_collections', False)
             prefill['selected_collection_ids'] = params.get('collection_ids', [])
 
-            # Détection fichiers existants
-            old_abs_path = pathlib.Path(settings.MEDIA_ROOT) / 'simulations' / sim_id
-            if old_abs_path.exists():
-                if (old_abs_path / 'template').exists() and list((old_abs_path / 'template').glob('*')):
-                    prefill['prev_template'] = list((old_abs_path / 'template').glob('*'))[0].name
-                elif list(old_abs_path.glob("*template*.*")) or list(old_abs_path.glob("*.xlsx")):
-                    prefill['prev_template'] = "Detected from history"
-
-                if (old_abs_path / 'correspondence').exists() and list((old_abs_path / 'correspondence').glob('*')):
-                    prefill['prev_correspondence'] = list((old_abs_path / 'correspondence').glob('*'))[0].name
-                elif list(old_abs_path.glob("*.csv")):
-                    prefill['prev_correspondence'] = "Detected from history"
-
-                zips = [z for z in old_abs_path.glob("*.zip") if "tout_telecharger" not in z.name]
-                if zips: prefill['prev_zip'] = zips[0].name
-
-                if (old_abs_path / 'primers').exists() and list((old_abs_path / 'primers').glob('*')):
-                    prefill['prev_primers'] = list((old_abs_path / 'primers').glob('*'))[0].name
-                elif [f for f in old_abs_path.glob("*.csv") if "primer" in f.name.lower()]: 
-                    prefill['prev_primers'] = "Detected from history"
-
-                if (old_abs_path / 'concentrations').exists() and list((old_abs_path / 'concentrations').glob('*')):
-                    prefill['prev_concentrations'] = list((old_abs_path / 'concentrations').glob('*'))[0].name
-                elif [f for f in old_abs_path.glob("*.csv") if "conc" in f.name.lower()]: 
-                    prefill['prev_concentrations'] = "Detected from history"
+            # Fichiers de l'ancien run, d'après son manifeste
+            old_inputs = (manifest.read_manifest(get_run_dir(sim_id)) or {}).get('inputs', {})
+            for role, key in PREFILL_KEYS.items():
+                if role in old_inputs:
+                    prefill[key] = pathlib.PurePosixPath(old_inputs[role]['path']).name
 
             context['prefill'] = prefill
             messages.info(request, "Parameters recovered from history.")
@@ -300,18 +189,22 @@ def simulation_view(request):
             old_sim_id_post = request.POST.get('old_sim_id')
             old_path_src = (pathlib.Path(settings.MEDIA_ROOT) / 'simulations' / old_sim_id_post) if old_sim_id_post else None
 
+            # Durée de chaque phase, enregistrée dans Campaign.results_data['metrics']
+            recorder = metrics.PhaseRecorder()
+
             # --- GESTION DES FICHIERS ---
-            path_template = handle_file_upload_or_recover(request, 'template_file', 'template', work_dir, old_path_src)
-            if not path_template: raise Exception("Missing Template file.")
+            with recorder.phase('upload'):
+                path_template = handle_file_upload_or_recover(request, 'template_file', 'template', work_dir, old_path_src)
+                if not path_template: raise Exception("Missing Template file.")
 
-            path_mapping = handle_file_upload_or_recover(request, 'correspondence_file', 'correspondence', work_dir, old_path_src)
-            if not path_mapping: raise Exception("Missing Correspondence Table.")
+                path_mapping = handle_file_upload_or_recover(request, 'correspondence_file', 'correspondence', work_dir, old_path_src)
+                if not path_mapping: raise Exception("Missing Correspondence Table.")
 
-            clear_primers = request.POST.get('clear_primers') == 'true'
-            clear_concentrations = request.POST.get('clear_concentrations') == 'true'
+                clear_primers = request.POST.get('clear_primers') == 'true'
+                clear_concentrations = request.POST.get('clear_concentrations') == 'true'
 
-            path_primers_db = handle_file_upload_or_recover(request, 'primers_file', 'primers', work_dir, old_path_src, clear_flag=clear_primers)
-            path_conc = handle_file_upload_or_recover(request, 'concentrations_file', 'concentrations', work_dir, old_path_src, clear_flag=clear_concentrations)
+                path_primers_db = handle_file_upload_or_recover(request, 'primers_file', 'primers', work_dir, old_path_src, clear_flag=clear_primers)
+                path_conc = handle_file_upload_or_recover(request, 'concentrations_file', 'concentrations', work_dir, old_path_src, clear_flag=clear_concentrations)
 
             # --- GESTION DES SÉQUENCES ---
             sequences_dir = work_dir / 'sequences'
@@ -319,120 +212,66 @@ def simulation_view(request):
             
             use_collections = request.POST.get('use_collections') == 'on'
             zip_name_display = "sequences.zip"
+            path_zip = None
             selected_ids_str = [] 
 
             # >>> OPTION A : Utilisation des Collections (BDD)
             if use_collections:
-                selected_ids = request.POST.getlist('selected_collections')
-                selected_ids_str = selected_ids 
-                
-                if not selected_ids:
-                    raise Exception("Please select at least one collection.")
-                
-                # Récupération des noms pour le résumé
-                selected_cols_objects = PlasmidCollection.objects.filter(id__in=selected_ids)
-                names_list = [col.name for col in selected_cols_objects]
-                zip_name_display = ", ".join(names_list)
+                selected_ids_str = request.POST.getlist('selected_collections')
+                ordered_cols = get_selected_collections(request)
+                zip_name_display = ", ".join(col.name for col in ordered_cols)
+
+                # Une requête pour les plasmides + une pour leurs annotations
+                plasmids = plasmids_for_export(ordered_cols)
+                if not plasmids:
+                    raise Exception("Selected collections are empty or inaccessible.")
+
+                # Toutes les parts du template doivent être résolues avant d'écrire la moindre séquence
+                with recorder.phase('preflight') as phase:
+                    phase['plasmids'] = check_simulation_inputs(
+                        request, path_template, path_mapping, preflight.names_from_plasmids(plasmids)
+                    ).plasmids
+
+                # Fichiers écrits en parallèle (les GenBank générés depuis la base viennent du cache de rendu)
+                with recorder.phase('collections') as phase:
+                    export = export_plasmids_to_dir(
+                        plasmids,
+                        sequences_dir,
+                        copy_file=blobs.link_into,
+                    )
+                    phase['files'] = count_generated = export.written
 
-                count_generated = 0
-                for col_id in selected_ids:
-                    try:
-                        col = PlasmidCollection.objects.get(id=col_id)
-                        if not col.is_public and col.owner != request.user:
-                            continue
-                            
-                        for plasmid in col.plasmids.all():
-                            # Nettoyage ID
-                            clean_name = plasmid.identifier
-                            if re.search(r'_[0-9a-f]{4}$', clean_name):
-                                clean_name = clean_name[:-5]
-                            
-                            safe_name = "".join([c for c in clean_name if c.isalnum() or c in (' ', '.', '_', '-')]).strip()
-                            safe_name = safe_name.replace(" ", "_")
-                            if not safe_name: safe_name = "plasmid"
-                            
-                            dest_path = sequences_dir / f"{safe_name}.gb"
-
-                            # Copier le fichier existant
-                            file_found = False
-                            if plasmid.file_path:
-                                src_path = pathlib.Path(plasmid.file_path)
-                                if not src_path.is_absolute():
-                                    src_path = pathlib.Path(settings.BASE_DIR) / plasmid.file_path
-                                
-                                if src_path.exists() and src_path.is_file():
-                                    try:
-                                        shutil.copy(src_path, dest_path)
-                                        file_found = True
-                                    except Exception:
-                                        pass 
-
-                            # Générer un fichier propre si manquant
-                            if not file_found:
-                                raw_seq = "".join(plasmid.sequence.split()).lower() if plasmid.sequence else ""
-                                length = len(raw_seq)
-                                short_name = safe_name[:16] # Nom court pour LOCUS
-                                
-                                header = (
-                                    f"LOCUS       {short_name:<16} {length:>10} bp    DNA     linear   UNK 01-JAN-1980\n"
-                                    f"DEFINITION  {plasmid.name}\n"
-                                    f"ACCESSION   {safe_name}\n"
-                                    f"VERSION     {safe_name}.1\n"
-                                    f"KEYWORDS    .\n"
-                                    f"SOURCE      .\n"
-                                    f"  ORGANISM  .\n"
-                                )
-
-                                features_block = "FEATURES             Location/Qualifiers\n"
-                                
-                                db_annotations = plasmid.annotations.all().order_by('start')
-                                if db_annotations.exists():
-                                    for ann in db_annotations:
-                                        s = ann.start + 1
-                                        e = ann.end
-                                        loc_str = f"{s}..{e}"
-                                        if ann.strand == -1: loc_str = f"complement({s}..{e})"
-                                        
-                                        ftype = ann.feature_type.strip()
-                                        if not ftype: ftype = "misc_feature"
-
-                                        features_block += f"     {ftype:<16}{loc_str}\n"
-                                        label = ann.label or ftype
-                                        features_block += f"                     /label=\"{label}\"\n"
-                                        features_block += f"                     /note=\"Imported from Collection\"\n"
-                                else:
-                                    features_block += f"     misc_feature    1..{length}\n"
-                                    features_block += f"                     /label=\"{plasmid.name}\"\n"
-                                    features_block += f"                     /note=\"No annotations in DB\"\n"
-
-                                content = f"{header}{features_block}ORIGIN\n        1 {raw_seq}\n//\n"
-                                with open(dest_path, "w") as out: out.write(content)
-                            
-                            count_generated += 1
-                    except PlasmidCollection.DoesNotExist:
-                        continue
-                
                 if count_generated == 0:
                     raise Exception("Selected collections are empty or inaccessible.")
 
             # >>> OPTION B : Utilisation d'un fichier ZIP
             else:
-                path_zip = None
-                if 'sequences_archive' in request.FILES:
-                    zfile = request.FILES['sequences_archive']
-                    path_zip = work_dir / zfile.name
-                    with open(path_zip, 'wb+') as dest:
-                        for chunk in zfile.chunks(): dest.write(chunk)
-                    zip_name_display = zfile.name
-                elif old_path_src:
-                    olds = [z for z in old_path_src.glob("*.zip") if "tout_telecharger" not in z.name]
-                    if olds:
-                        shutil.copy(olds[0], work_dir / olds[0].name)
-                        path_zip = work_dir / olds[0].name
-                        zip_name_display = olds[0].name
+                with recorder.phase('upload'):
+                    if 'sequences_archive' in request.FILES:
+                        zfile = request.FILES['sequences_archive']
+                        path_zip = work_dir / zfile.name
+                        with open(path_zip, 'wb+') as dest:
+                            for chunk in zfile.chunks(): dest.write(chunk)
+                        blobs.intern_file(path_zip)
+                        zip_name_display = zfile.name
+                    elif old_path_src:
+                        old_zip = manifest.input_path(old_path_src, 'archive')
+                        if old_zip and old_zip.is_file():
+                            blobs.link_into(old_zip, work_dir / old_zip.name)
+                            path_zip = work_dir / old_zip.name
+                            zip_name_display = old_zip.name
                 
                 if path_zip:
-                    with zipfile.ZipFile(path_zip, 'r') as z: z.extractall(sequences_dir)
+                    # Vérification sur la liste des entrées de l'archive, avant extraction
+                    with recorder.phase('preflight') as phase:
+                        phase['plasmids'] = check_simulation_inputs(
+                            request, path_template, path_mapping, preflight.names_from_zip(path_zip)
+                        ).plasmids
+                    with recorder.phase('extract') as phase:
+                        extraction = extract_sequences_archive(path_zip, sequences_dir)
+                        phase['files'] = extraction.files
+                        phase['bytes'] = extraction.bytes_written
+                        phase['skipped'] = extraction.skipped
                 else:
                     raise Exception("No sequence source provided.")
                 
@@ -453,61 +292,19 @@ def simulation_view(request):
                         permanent_storage_dir = pathlib.Path(settings.MEDIA_ROOT) / 'plasmids' / f'user_{request.user.id}'
                         permanent_storage_dir.mkdir(parents=True, exist_ok=True)
 
-                        imported_count = 0
-                        for gb_file in sequences_dir.glob("**/*.gb"):
-                            try:
-                                record = next(SeqIO.parse(gb_file, "genbank"))
-                                
-                                identifier = record.id
-                                if not identifier or identifier == '.' or '<unknown' in identifier:
-                                    identifier = gb_file.stem 
-                                
-                                clean_id = identifier
-                                while Plasmid.objects.filter(identifier=clean_id).exists():
-                                    clean_id = f"{identifier}_{uuid.uuid4().hex[:4]}"
-
-                                safe_filename = f"{clean_id}_{gb_file.name}"
-                                permanent_path = permanent_storage_dir / safe_filename
-                                shutil.copy(gb_file, permanent_path)
-
-                                new_plasmid = Plasmid.objects.create(
-                                    identifier=clean_id,
-                                    name=record.description[:200] if record.description else clean_id,
-                                    type="Imported",
-                                    sequence=str(record.seq).upper(),
-                                    length=len(record.seq),
-                                    description=f"Imported from simulation {sim_id}",
-                                    collection=new_collection,
-                                    file_path=str(permanent_path.relative_to(settings.MEDIA_ROOT)),
-                                    is_public=False
-                                )
-
-                                for feature in record.features:
-                                    if feature.type == 'source': continue
-                                    
-                                    label = ""
-                                    if 'label' in feature.qualifiers: label = feature.qualifiers['label'][0]
-                                    elif 'gene' in feature.qualifiers: label = feature.qualifiers['gene'][0]
-                                    elif 'note' in feature.qualifiers: label = feature.qualifiers['note'][0]
-                                    else: label = feature.type 
-                                    
-                                    strand_val = feature.location.strand
-                                    if strand_val is None: strand_val = 1
-
-                                    PlasmidAnnotation.objects.create(
-                                        plasmid=new_plasmid,
-                                        feature_type=feature.type,
-                                        start=int(feature.location.start), 
-                                        end=int(feature.location.end),
-                                        strand=strand_val,
-                                        label=label[:200],
-                                        qualifiers=feature.qualifiers
-                                    )
-                                imported_count += 1
-                            
-                            except Exception as e:
-                                print(f"Failed to import plasmid {gb_file}: {e}")
-                                continue 
+                        # Parsing complet puis insertions groupées (bulk_create) dans une transaction
+                        with recorder.phase('collection_import') as phase:
+                            import_result = bulk_import_genbank_files(
+                                sorted(sequences_dir.glob("**/*.gb")),
+                                collection=new_collection,
+                                storage_dir=permanent_storage_dir,
+                                storage_root=pathlib.Path(settings.MEDIA_ROOT),
+                                description=f"Imported from simulation {sim_id}",
+                            )
+                            phase['files'] = import_result.created
+                        for error in import_result.errors:
+                            print(f"Failed to import plasmid {error}")
+                        imported_count = import_result.created
 
                         if imported_count > 0:
                             messages.success(request, f"Collection '{new_col_name}' created with {imported_count} plasmids.")
@@ -518,63 +315,40 @@ def simulation_view(request):
                         traceback.print_exc()
                         messages.warning(request, f"Collection import failed: {str(e)}")
 
-            # --- LANCEMENT DE InSillyClo ---
-            pcr_primers = []
-            if request.POST.get('pcr_primers'):
-                for line in request.POST.get('pcr_primers').splitlines():
-                    if ',' in line: pcr_primers.append(tuple(x.strip() for x in line.split(',')[:2]))
-
-            enzymes = [e.strip() for e in request.POST.get('digestion_enzymes', '').split(',') if e.strip()] or None
-            def_conc = float(request.POST.get('default_concentration', 200))
+            # --- MISE EN FILE DE LA SIMULATION ---
+            pcr_primers, enzymes, def_conc = read_simulation_parameters(request, has_primers_db=bool(path_primers_db))
 
-            if not path_primers_db: pcr_primers = []
-
-            observer = insillyclo.observer.InSillyCloCliObserver(debug=False, fail_on_error=True)
-            output_dir = work_dir / 'results'
-            output_dir.mkdir(exist_ok=True)
-            gb_files = list(sequences_dir.glob('**/*.gb'))
-            
-            if not gb_files: 
+            input_files = metrics.count_files(sequences_dir, '**/*.gb')
+            if not input_files:
                 raise Exception("No valid .gb files found.")
 
-            try:
-                insillyclo.simulator.compute_all(
-                    observer=observer,
-                    settings=None,
-                    input_template_filled=path_template,
-                    input_parts_files=[path_mapping],
-                    gb_plasmids=gb_files,
-                    output_dir=output_dir,
-                    data_source=insillyclo.data_source.DataSourceHardCodedImplementation(),
-                    primers_file=path_primers_db,
-                    primer_id_pairs=pcr_primers,
-                    enzyme_names=enzymes,
-                    default_mass_concentration=def_conc,
-                    concentration_file=path_conc,
-                    sbol_export=False,
-                )
-            except FileNotFoundError as fnf_error:
-                missing = fnf_error.filename
-                if not missing and "No such file" in str(fnf_error):
-                     # Tentative d'extraction du nom si filename est vide
-                     missing = str(fnf_error)
-                
-                raise Exception(f"Simulation failed: A required plasmid file is missing. The simulator looked for: {missing}")
-            
-            except Exception as e:
-                # Si l'erreur contient "No such file" mais n'est pas un FileNotFoundError
-                error_str = str(e)
-                if "No such file" in error_str or "does not exist" in error_str:
-                     raise Exception(f"Simulation failed: A required file is missing. Details: {error_str}")
-                
-                # Sinon, c'est une autre erreur de simulation, on la remonte telle quelle
-                raise e
-
-            shutil.make_archive(str(work_dir / 'tout_telecharger'), 'zip', output_dir)
-
+            # Chemins relatifs au dossier du run : le worker les résout de son côté
+            payload = {
+                'template': str(path_template.relative_to(work_dir)),
+                'correspondence': str(path_mapping.relative_to(work_dir)),
+                'primers': str(path_primers_db.relative_to(work_dir)) if path_primers_db else None,
+                'concentrations': str(path_conc.relative_to(work_dir)) if path_conc else None,
+                'pcr_primers': pcr_primers,
+                'enzymes': enzymes,
+                'default_concentration': def_conc,
+            }
+            if old_path_src and old_path_src.is_dir():
+                # Rerun : le worker reprend les plasmides inchangés du run d'origine
+                payload['previous_run'] = old_sim_id_post
+
+            # Rôle de chaque fichier d'entrée, relu par le pré-remplissage et les reruns
+            manifest.write_manifest(work_dir, {
+                'template': path_template,
+                'correspondence': path_mapping,
+                'primers': path_primers_db,
+                'concentrations': path_conc,
+                'archive': path_zip,
+            })
+
+            campaign = None
             if request.user.is_authenticated:
                 relative_input_path = os.path.join('simulations', sim_id, 'template', path_template.name)
-                Campaign.objects.create(
+                campaign = Campaign.objects.create(
                     name=request.POST.get('simulation_name') or "Untitled",
                     owner=request.user,
                     run_id=sim_id,
@@ -591,12 +365,35 @@ def simulation_view(request):
                         'primers_name': path_primers_db.name if path_primers_db else None,
                         'concentrations_name': path_conc.name if path_conc else None
                     },
-                    output_files={'files': os.listdir(output_dir)}
                 )
 
-            messages.success(request, "Simulation completed successfully!")
+            with recorder.phase('enqueue') as phase:
+                job = enqueue_simulation(
+                    run_id=sim_id,
+                    payload=payload,
+                    owner=request.user if request.user.is_authenticated else None,
+                    campaign=campaign,
+                )
+                phase['cache_hit'] = job.status == SimulationJob.STATUS_DONE
+            metrics.store_metrics(campaign, 'web', recorder.as_dict(input_files=input_files))
+
+            if request.headers.get('x-requested-with') == 'XMLHttpRequest':
+                return JsonResponse({
+                    'job_id': job.id,
+                    'sim_id': sim_id,
+                    'status': job.status,
+                    'status_url': reverse('simulations:simulation_status', args=[sim_id]),
+                }, status=202)
+
+            if job.status == SimulationJob.STATUS_DONE:
+                messages.success(request, "Simulation completed (identical inputs already simulated, results reused).")
+            else:
+                messages.success(request, f"Simulation queued (job #{job.id}).")
             return redirect('simulations:simulation_detail', sim_id=sim_id)
 
+        except preflight.PreflightError as e:
+            report_preflight_error(request, e)
+            return render(request, 'simulations/simu.html', context)
         except Exception as e:
             traceback.print_exc()
             messages.error(request, f"Error: {str(e)}")
@@ -605,13 +402,165 @@ def simulation_view(request):
     return render(request, 'simulations/simu.html', context)
 
 
+def simulation_batch_view(request):
+    """
+    Soumission d'un lot : plusieurs templates (fichiers et/ou archive zip) contre
+    une même table de correspondance et une même source de séquences. Les
+    entrées communes sont préparées une seule fois (voir batches.py), puis un
+    job est mis en file par template.
+    """
+    context = collections_context(request)
+    context['max_templates'] = settings.SIMULATION_BATCH_MAX_TEMPLATES
+
+    if request.method == 'POST':
+        batch_id = str(uuid.uuid4())[:8]
+        batch_dir = batches.get_batch_dir(batch_id)
+        try:
+            batch_dir.mkdir(parents=True)
+
+            # --- ENTRÉES PARTAGÉES ---
+            templates = batches.collect_templates(
+                request.FILES.getlist('template_files'),
+                request.FILES.get('templates_archive'),
+                batch_dir / 'templates',
+                max_templates=settings.SIMULATION_BATCH_MAX_TEMPLATES,
+            )
+            if not templates: raise Exception("Please provide at least one template (.xlsx).")
+
+            path_mapping = handle_file_upload_or_recover(request, 'correspondence_file', 'correspondence', batch_dir)
+            if not path_mapping: raise Exception("Missing Correspondence Table.")
+            path_primers_db = handle_file_upload_or_recover(request, 'primers_file', 'primers', batch_dir)
+            path_conc = handle_file_upload_or_recover(request, 'concentrations_file', 'concentrations', batch_dir)
+
+            use_collections = request.POST.get('use_collections') == 'on'
+            path_zip = None
+            if use_collections:
+                ordered_cols = get_selected_collections(request)
+                plasmids = plasmids_for_export(ordered_cols)
+                if not plasmids:
+                    raise Exception("Selected collections are empty or inaccessible.")
+                available = preflight.names_from_plasmids(plasmids)
+                sequences_name = ", ".join(col.name for col in ordered_cols)
+            elif 'sequences_archive' in request.FILES:
+                zfile = request.FILES['sequences_archive']
+                path_zip = batch_dir / zfile.name
+                with open(path_zip, 'wb+') as dest:
+                    for chunk in zfile.chunks(): dest.write(chunk)
+                blobs.intern_file(path_zip)
+                available = preflight.names_from_zip(path_zip)
+                sequences_name = zfile.name
+            else:
+                raise Exception("No sequence source provided.")
+
+            # Tous les templates sont vérifiés avant de préparer quoi que ce soit
+            report_preflight_warnings(request, batches.check_templates(templates, path_mapping, available))
+
+            # --- SÉQUENCES : UNE SEULE FOIS POUR TOUT LE LOT ---
+            sequences_dir = batch_dir / 'sequences'
+            sequences_dir.mkdir()
+            if use_collections:
+                export_plasmids_to_dir(plasmids, sequences_dir, copy_file=blobs.link_into)
+            else:
+                extract_sequences_archive(path_zip, sequences_dir)
+            if not metrics.count_files(sequences_dir, '**/*.gb'):
+                raise Exception("No valid .gb files found.")
+
+            shared = {
+                'correspondence': path_mapping,
+                'primers': path_primers_db,
+                'concentrations': path_conc,
+                'archive': path_zip,
+                'sequences': sequences_dir,
+            }
+            # Empreintes calculées une fois : manifestes et clés de cache des runs
+            digests = {role: file_sha256(path) for role, path in shared.items() if path and role != 'sequences'}
+            sequences = simulation_cache.sequence_digests(sequences_dir) if simulation_cache.is_enabled() else None
+
+            pcr_primers, enzymes, def_conc = read_simulation_parameters(request, has_primers_db=bool(path_primers_db))
+            owner = request.user if request.user.is_authenticated else None
+            batch_name = request.POST.get('batch_name') or "Untitled batch"
+            # Mêmes clés que Campaign.parameters d'une simulation isolée
+            parameters = {
+                'pcr_primers_text': request.POST.get('pcr_primers', ''),
+                'digestion_enzymes': request.POST.get('digestion_enzymes', ''),
+                'default_concentration': def_conc,
+                'use_collections': use_collections,
+                'collection_ids': [col.id for col in ordered_cols] if use_collections else [],
+                'correspondence_name': path_mapping.name,
+                'archive_name': sequences_name,
+                'primers_name': path_primers_db.name if path_primers_db else None,
+                'concentrations_name': path_conc.name if path_conc else None,
+            }
+            batch = SimulationBatch.objects.create(
+                batch_id=batch_id,
+                name=batch_name,
+                owner=owner,
+                parameters={**parameters, 'templates': [template.name for template in templates]},
+            )
+
+            # --- UN RUN PAR TEMPLATE ---
+            jobs = []
+            for template in templates:
+                run_id = str(uuid.uuid4())[:8]
+                work_dir = get_run_dir(run_id)
+                paths = batches.prepare_run(run_id, template, shared, digests)
+                payload = {
+                    'template': str(paths['template'].relative_to(work_dir)),
+                    'correspondence': str(paths['correspondence'].relative_to(work_dir)),
+                    'primers': str(paths['primers'].relative_to(work_dir)) if 'primers' in paths else None,
+                    'concentrations': str(paths['concentrations'].relative_to(work_dir)) if 'concentrations' in paths else None,
+                    'pcr_primers': pcr_primers,
+                    'enzymes': enzymes,
+                    'default_concentration': def_conc,
+                }
+
+                campaign = None
+                if owner:
+                    campaign = Campaign.objects.create(
+                        name=f"{batch_name} · {template.stem}",
+                        owner=owner,
+                        run_id=run_id,
+                        input_file=os.path.join('simulations', run_id, payload['template']),
+                        parameters={**parameters, 'template_name': template.name, 'batch_id': batch_id},
+                    )
+                jobs.append(enqueue_simulation(
+                    run_id=run_id,
+                    payload=payload,
+                    owner=owner,
+                    campaign=campaign,
+                    batch=batch,
+                    sequences=sequences,
+                ))
+
+            if request.headers.get('x-requested-with') == 'XMLHttpRequest':
+                return JsonResponse({
+                    'batch_id': batch_id,
+                    'jobs': [{'job_id': job.id, 'sim_id': job.run_id, 'status': job.status} for job in jobs],
+                    'summary_url': reverse('simulations:batch_detail', args=[batch_id]),
+                }, status=202)
+
+            messages.success(request, f"{len(jobs)} simulation(s) queued.")
+            return redirect('simulations:batch_detail', batch_id=batch_id)
+
+        except preflight.PreflightError as e:
+            report_preflight_error(request, e)
+        except Exception as e:
+            traceback.print_exc()
+            messages.error(request, f"Error: {str(e)}")
+        finally:
+            # Les runs ont leurs propres liens vers les fichiers du lot
+            shutil.rmtree(batch_dir, ignore_errors=True)
+
+    return render(request, 'simulations/simu_batch.html', context)
+
+
 # ==========================================
-# 5. AUTRES VUES (HISTORIQUE, DÉTAILS)
+# 3. AUTRES VUES (HISTORIQUE, DÉTAILS)
 # ==========================================
 
 @login_required
 def simulation_history_view(request):
-    campaigns = Campaign.objects.filter(owner=request.user).order_by('-created_at')
+    campaigns = Campaign.objects.visible().filter(owner=request.user).select_related('simulation_job').order_by('-created_at')
     return render(request, 'simulations/history.html', {'campaigns': campaigns})
 
 
@@ -622,6 +571,21 @@ def simulation_detail_view(request, sim_id):
     except Campaign.DoesNotExist:
         pass
 
+    # Suppression demandée : le dossier va disparaître (voir deletion.py)
+    if campaign and campaign.deletion_requested_at:
+        messages.error(request, "Results not found (expired or deleted).")
+        return redirect('simulations:simu')
+
+    # Simulation encore en file / en cours / en échec : page d'attente
+    job = SimulationJob.objects.filter(run_id=sim_id).first()
+    if job and job.status != SimulationJob.STATUS_DONE:
+        return render(request, 'simulations/simulation_status.html', {
+            'job': job,
+            'sim_id': sim_id,
+            'sim_name': campaign.name if campaign else "Anonymous Simulation",
+            'campaign': campaign,
+        })
+
     sim_rel_path = os.path.join('simulations', sim_id)
     sim_abs_path = pathlib.Path(settings.MEDIA_ROOT) / sim_rel_path
     output_dir = sim_abs_path / 'results'
@@ -633,24 +597,16 @@ def simulation_detail_view(request, sim_id):
     # Liste simple des fichiers
     files = sorted([f.name for f in output_dir.iterdir() if f.is_file()])
     
-    # --- PRÉPARATION VISUALISATION PLASMIDES ---
-    plasmid_visuals = []
-    # On cherche tous les .gb dans le dossier résultats
-    for gb_file in output_dir.glob("*.gb"):
-        visual_data = get_plasmid_visual_data(gb_file)
-        if visual_data:
-            plasmid_visuals.append(visual_data)
-    
-    # Trie par nom
-    plasmid_visuals.sort(key=lambda x: x['filename'])
-
     results = {
         'sim_id': sim_id,
         'sim_name': campaign.name if campaign else "Anonymous Simulation",
         'files': files,
         'output_dir_url': f"{settings.MEDIA_URL}simulations/{sim_id}/results",
-        'zip_url': f"{settings.MEDIA_URL}simulations/{sim_id}/tout_telecharger.zip" if (sim_abs_path / 'tout_telecharger.zip').exists() else None,
-        'plasmid_visuals': plasmid_visuals,
+        # Archive construite à la demande (voir simulation_download_view)
+        'zip_url': reverse('simulations:simulation_download', args=[sim_id]) if files else None,
+        # Les cartes des plasmides sont chargées page par page par le navigateur
+        'maps_url': reverse('simulations:simulation_maps', args=[sim_id]),
+        'has_maps': any(output_dir.glob("*.gb")),
     }
     
     context = {
@@ -660,8 +616,148 @@ def simulation_detail_view(request, sim_id):
     
     return render(request, 'simulations/simulation_results.html', context)
 
+
+def simulation_download_view(request, sim_id):
+    """
+    Télécharge les résultats en zip, construit en streaming.
+    Paramètres GET : kind (gb / tables / images) et/ou file (répétable).
+    """
+    output_dir = pathlib.Path(settings.MEDIA_ROOT) / 'simulations' / sim_id / 'results'
+    if not output_dir.is_dir():
+        raise Http404("Results not found (expired or deleted).")
+
+    kind = request.GET.get('kind') or None
+    try:
+        files = archives.select_result_files(output_dir, kind=kind, names=request.GET.getlist('file'))
+    except ValueError as e:
+        return HttpResponseBadRequest(str(e))
+    if not files:
+        raise Http404("No result file matches this selection.")
+
+    response = StreamingHttpResponse(archives.stream_zip(files), content_type='application/zip')
+    suffix = f"_{kind}" if kind else ""
+    response['Content-Disposition'] = f'attachment; filename="{sim_id}{suffix}_results.zip"'
+    return response
+
+
+MAPS_PAGE_SIZE = 20
+MAPS_MAX_PAGE_SIZE = 100
+
+
+def simulation_maps_view(request, sim_id):
+    """
+    Cartes des plasmides produits, en JSON et page par page.
+    Paramètres GET : page (à partir de 1), page_size, q (filtre sur le nom).
+    """
+    sim_abs_path = pathlib.Path(settings.MEDIA_ROOT) / 'simulations' / sim_id
+    # Run pas encore terminé : results/ est en cours d'écriture, le sidecar serait partiel
+    job = SimulationJob.objects.filter(run_id=sim_id).first()
+    if job and job.status != SimulationJob.STATUS_DONE:
+        return JsonResponse({'error': 'Simulation not finished.', 'status': job.status}, status=409)
+    if not (sim_abs_path / 'results').is_dir():
+        return JsonResponse({'error': 'Results not found (expired or deleted).'}, status=404)
+
+    try:
+        page = max(1, int(request.GET.get('page', 1)))
+        page_size = min(MAPS_MAX_PAGE_SIZE, max(1, int(request.GET.get('page_size', MAPS_PAGE_SIZE))))
+    except ValueError:
+        return JsonResponse({'error': 'Invalid page parameters.'}, status=400)
+
+    maps, has_next = page_visuals(
+        sim_abs_path,
+        offset=(page - 1) * page_size,
+        limit=page_size,
+        query=request.GET.get('q'),
+    )
+    return JsonResponse({
+        'page': page,
+        'page_size': page_size,
+        'has_next': has_next,
+        'results': maps,
+        'output_dir_url': f"{settings.MEDIA_URL}simulations/{sim_id}/results",
+    })
+
+
+def _job_status_data(job):
+    data = {
+        'job_id': job.id,
+        'sim_id': job.run_id,
+        'status': job.status,
+        'created_at': job.created_at.isoformat(),
+        'started_at': job.started_at.isoformat() if job.started_at else None,
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+    }
+    if job.status in (SimulationJob.STATUS_FAILED, SimulationJob.STATUS_CANCELLED):
+        data['error'] = job.error
+        data['termination_reason'] = job.termination_reason
+    if job.status == SimulationJob.STATUS_DONE:
+        data['results_url'] = reverse('simulations:simulation_detail', args=[job.run_id])
+    return data
+
+
+def simulation_status_view(request, sim_id):
+    """
+    Statut JSON d'un job de simulation (queued / running / done / failed / cancelled).
+    Avec ``?after=<seq>``, ajoute les événements d'avancement suivants (progress.jsonl) :
+    la page de statut interroge cette vue périodiquement, chaque requête rend la main aussitôt.
+    """
+    job = SimulationJob.objects.filter(run_id=sim_id).first()
+    if job is None:
+        return JsonResponse({'error': 'Unknown simulation.'}, status=404)
+    # Statut lu avant les événements : rien n'est perdu si le job se termine entre les deux
+    data = _job_status_data(job)
+    if 'after' in request.GET:
+        try:
+            after = int(request.GET['after'])
+        except ValueError:
+            return HttpResponseBadRequest("Invalid 'after' parameter.")
+        data['events'], _ = progress.read_events(get_run_dir(sim_id), after=after)
+    return JsonResponse(data)
+
+
+def simulation_batch_detail_view(request, batch_id):
+    """Récapitulatif d'un lot : statut de chaque run, comptage par statut."""
+    batch = SimulationBatch.objects.filter(batch_id=batch_id).first()
+    if batch is None or (batch.owner_id is not None and batch.owner_id != request.user.id):
+        raise Http404("Unknown batch.")
+
+    jobs = list(batch.jobs.select_related('campaign').order_by('id'))
+    counts = Counter(job.status for job in jobs)
+    return render(request, 'simulations/batch_detail.html', {
+        'batch': batch,
+        'rows': [
+            {'job': job, 'template': pathlib.PurePosixPath(job.payload.get('template', '')).name}
+            for job in jobs
+        ],
+        'status_counts': [
+            (value, label, counts[value]) for value, label in SimulationJob.STATUS_CHOICES if counts[value]
+        ],
+        'finished': all(job.is_finished for job in jobs),
+    })
+
+
+@require_POST
+def simulation_cancel_view(request, sim_id):
+    """
+    Annule une simulation en file ou en cours. Réservé au propriétaire du job ;
+    un job anonyme peut être annulé par qui connaît son run_id (comme ses résultats).
+    """
+    job = SimulationJob.objects.filter(run_id=sim_id).first()
+    if job is None or (job.owner_id is not None and job.owner_id != request.user.id):
+        raise Http404("Unknown simulation.")
+
+    if request_cancel(job):
+        messages.success(request, "Cancellation requested.")
+    else:
+        messages.warning(request, "This simulation has already finished.")
+
+    if request.GET.get('from') == 'history':
+        return redirect('simulations:history')
+    return redirect('simulations:simulation_detail', sim_id=sim_id)
+
+
 # ==========================================
-# 6. SUPPRESSION
+# 4. SUPPRESSION
 # ==========================================
 
 @login_required
@@ -676,29 +772,40 @@ def delete_campaigns_view(request):
             return redirect('simulations:history')
 
         # On récupère les campagnes, mais seulement celles qui appartiennent à l'utilisateur
-        campaigns_to_delete = Campaign.objects.filter(id__in=campaign_ids, owner=request.user)
+        campaigns_to_delete = Campaign.objects.visible().filter(id__in=campaign_ids, owner=request.user)
         count = campaigns_to_delete.count()
 
         if count == 0:
             messages.warning(request, "No valid campaigns found to delete.")
             return redirect('simulations:history')
 
-        # Suppression des fichiers sur le disque
-        for campaign in campaigns_to_delete:
-            if campaign.run_id:
-                sim_path = pathlib.Path(settings.MEDIA_ROOT) / 'simulations' / campaign.run_id
-                if sim_path.exists() and sim_path.is_dir():
-                    try:
-                        shutil.rmtree(sim_path) # Supprime le dossier et tout son contenu
-                    except Exception as e:
-                        print(f"Error deleting folder {sim_path}: {e}")
-
-        # Suppression en base de données
-        campaigns_to_delete.delete()
+        # Campagnes masquées tout de suite ; dossiers et lignes supprimés par le worker de suppression
+        deletion.request_deletion(campaigns_to_delete)
 
-        messages.success(request, f"Successfully deleted {count} campaign(s).")
+        messages.success(request, f"{count} campaign(s) scheduled for deletion.")
 
     except Exception as e:
         messages.error(request, f"An error occurred during deletion: {e}")
 
-    return redirect('simulations:history')
\ No newline at end of file
+    return redirect('simulations:history')
+
+
+# Fenêtre par défaut de la page de mesures (jours)
+METRICS_DEFAULT_DAYS = 90
+
+
+@staff_member_required
+def simulation_metrics_view(request):
+    """Percentiles des durées de chaque phase des simulations récentes (personnel uniquement)."""
+    try:
+        days = max(1, int(request.GET.get('days', METRICS_DEFAULT_DAYS)))
+    except ValueError:
+        days = METRICS_DEFAULT_DAYS
+
+    since = timezone.now() - datetime.timedelta(days=days)
+    rows = Campaign.objects.filter(created_at__gte=since).values_list('created_at', 'results_data')
+    return render(request, 'simulations/metrics.html', {
+        'days': days,
+        'summary': metrics.aggregate_metrics(rows.iterator()),
+        'parse_cache': parse_cache.stats(),
+    })
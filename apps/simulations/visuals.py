@@ -0,0 +1,246 @@
+"""
+Données de visualisation des plasmides produits par une simulation.
+
+Le parsing des .gb de sortie et le placement des labels sont faits une seule
+fois, à la fin de la simulation : ``write_visuals_sidecar`` écrit un fichier
+``visuals.jsonl`` à la racine du run (une ligne JSON compacte par plasmide,
+triées par nom de fichier). La page de résultats ne lit que ce fichier ; il
+est régénéré à la demande pour les runs antérieurs qui n'en ont pas.
+"""
+import json
+import os
+import pathlib
+import uuid
+
+from apps.core.utils.layout import assign_label_levels
+from apps.plasmids.parsing import parse_genbank_file, parse_genbank_files
+
+SIDECAR_FILENAME = 'visuals.jsonl'
+
+# Clés utilisées par simulation_results.html : seules celles-ci sont conservées dans le sidecar
+FEATURE_KEYS = (
+    "label", "type", "color", "svg_points",
+    "visual_left", "visual_width", "visual_center",
+    "label_position", "css_top", "css_connector",
+)
+
+
+COLORS = {
+    "tRNA": "#070087",
+    "CDS": "#0000FF",
+    "rep_origin": "#1C9BFF",
+    "promoter": "#66CCFF",
+    "misc_feature": "#C2E0FF",
+    "misc_RNA": "#C2E0FF",
+    "protein_bind": "#FF9900",
+    "RBS": "#F8B409",
+    "terminator": "#FFCD36",
+}
+
+
+def get_plasmid_visual_data(gb_path):
+    """
+    Lit un fichier .gb et prépare les données pour le rendu SVG/HTML.
+    """
+    parsed = parse_genbank_file(gb_path, first_only=True)
+    if parsed.error or not parsed.records:
+        return None
+    return visual_data_from_record(parsed.records[0], pathlib.Path(gb_path).name)
+
+
+def visual_data_from_record(record, filename):
+    """Données de rendu d'un enregistrement déjà lu (RecordSummary, voir apps/plasmids/parsing.py)."""
+    # --- Extraction des features ---
+    features = []
+    for f in record.features:
+        if f.type == 'source': continue
+
+        features.append({
+            "start": f.start,
+            "end": f.end,
+            "length": f.end - f.start,
+            "label": f.label,
+            "type": f.type,
+            "strand": f.strand,
+            "color": COLORS.get(f.type, "#CCCCCC"),
+        })
+
+    # --- Calculs graphiques ---
+    VISUAL_WIDTH = 900
+    seq_length = record.length
+    ratio = VISUAL_WIDTH / max(seq_length, 1)
+    
+    # Trier les features par position de départ
+    features = sorted(features, key=lambda f: f["start"])
+    
+    external_label_counter = 0
+    for f in features:
+        f["visual_width"] = max(2, int(f["length"] * ratio))
+        f["visual_left"] = int(f["start"] * ratio)
+        f["visual_center"] = f["visual_left"] + f["visual_width"] // 2
+
+        # Calcul des points SVG pour les flèches
+        w = f["visual_width"]
+        h = 20
+        d = 6 # Profondeur pointe
+
+        if f["strand"] == 1: # Forward
+            f["svg_points"] = f"0,0 {w-d},0 {w},{h//2} {w-d},{h} 0,{h}"
+        elif f["strand"] == -1: # Reverse
+            f["svg_points"] = f"{d},0 {w},0 {w},{h} {d},{h} 0,{h//2}"
+        else: # Rectangle
+            f["svg_points"] = f"0,0 {w},0 {w},{h} 0,{h}"
+
+        # Gestion des Labels
+        label_text_width = len(f.get("label", "")) * 8
+        f["label_text_width"] = label_text_width
+
+        if label_text_width <= f["visual_width"] - 10:
+            f["label_position"] = "inside"
+            f["label_side"] = None
+            f["label_level"] = 0
+        else:
+            f["label_position"] = "outside"
+            f["label_side"] = "above" if external_label_counter % 2 == 0 else "below"
+            f["label_level"] = 0
+            external_label_counter += 1
+
+    # --- Chevauchement et niveaux ---
+    features_above = [f for f in features if f.get("label_position") == "outside" and f.get("label_side") == "above"]
+    features_below = [f for f in features if f.get("label_position") == "outside" and f.get("label_side") == "below"]
+    
+    assign_label_levels(features_above)
+    assign_label_levels(features_below)
+
+    # --- CSS Final ---
+    for f in features:
+        if f.get("label_position") == "outside":
+            level = f.get("label_level", 0)
+            if f["label_side"] == "above":
+                f["css_top"] = f"{-15 - (level * 15)}px"
+                f["css_connector"] = "bottom: -15px;"
+            else:
+                f["css_top"] = f"{60 + (level * 15)}px"
+                f["css_connector"] = "top: -15px;"
+
+    return {
+        "filename": filename,
+        "name": record.description or record.id,
+        "length": seq_length,
+        "features": features,
+        "visual_width": VISUAL_WIDTH
+    }
+
+
+# ==========================================
+# SIDECAR visuals.jsonl
+# ==========================================
+
+def _compact(visual_data):
+    return {
+        "filename": visual_data["filename"],
+        "name": visual_data["name"],
+        "length": visual_data["length"],
+        "visual_width": visual_data["visual_width"],
+        "features": [
+            {k: f[k] for k in FEATURE_KEYS if f.get(k) is not None}
+            for f in visual_data["features"]
+        ],
+    }
+
+
+def _reusable_lines(work_dir, filenames):
+    """Lignes du sidecar d'un autre run pour les fichiers ``filenames``, par nom de fichier."""
+    sidecar = pathlib.Path(work_dir) / SIDECAR_FILENAME
+    lines = {}
+    if not filenames or not sidecar.is_file():
+        return lines
+    with open(sidecar, encoding='utf-8') as stream:
+        for line in stream:
+            if line.strip():
+                filename = json.loads(line).get('filename')
+                if filename in filenames:
+                    lines[filename] = line.rstrip('\n')
+    return lines
+
+
+def write_visuals_sidecar(work_dir, reuse_from=None, reusable=(), max_workers=None):
+    """
+    Calcule les visuels de tous les .gb de ``results/`` et les écrit dans ``visuals.jsonl``.
+    Les fichiers ``reusable`` (identiques dans le run ``reuse_from``) reprennent les visuels de ce run.
+    ``max_workers`` : processus de lecture des GenBank (1 : dans le processus courant).
+    """
+    work_dir = pathlib.Path(work_dir)
+    output_dir = work_dir / 'results'
+    sidecar = work_dir / SIDECAR_FILENAME
+    reused_lines = _reusable_lines(reuse_from, set(reusable)) if reuse_from else {}
+
+    # Écriture dans un fichier temporaire puis renommage : un lecteur ne voit jamais un fichier partiel
+    tmp_path = work_dir / f'.{SIDECAR_FILENAME}.{uuid.uuid4().hex}'
+    gb_files = sorted(output_dir.glob("*.gb"), key=lambda p: p.name)
+    # Lecture des GenBank (en parallèle pour les gros runs), puis mise en page dans l'ordre des noms
+    to_parse = [gb_file for gb_file in gb_files if gb_file.name not in reused_lines]
+    parsed = dict(zip(to_parse, parse_genbank_files(to_parse, first_only=True, max_workers=max_workers)))
+    with open(tmp_path, 'w', encoding='utf-8') as stream:
+        for gb_file in gb_files:
+            if gb_file.name in reused_lines:
+                stream.write(reused_lines[gb_file.name])
+                stream.write('\n')
+                continue
+            result = parsed[gb_file]
+            if result.error or not result.records:
+                continue
+            visual_data = visual_data_from_record(result.records[0], gb_file.name)
+            if visual_data:
+                stream.write(json.dumps(_compact(visual_data), ensure_ascii=False, separators=(',', ':')))
+                stream.write('\n')
+    os.replace(tmp_path, sidecar)
+    return sidecar
+
+
+def _iter_sidecar_lines(work_dir):
+    """Lignes brutes du sidecar ; (re)génère le fichier s'il est absent (anciens runs)."""
+    work_dir = pathlib.Path(work_dir)
+    sidecar = work_dir / SIDECAR_FILENAME
+    if not sidecar.is_file():
+        write_visuals_sidecar(work_dir)
+    with open(sidecar, encoding='utf-8') as stream:
+        for line in stream:
+            if line.strip():
+                yield line
+
+
+def iter_visuals(work_dir):
+    """Itère sur les visuels d'un run, dans l'ordre des noms de fichier."""
+    for line in _iter_sidecar_lines(work_dir):
+        yield json.loads(line)
+
+
+def load_visuals(work_dir):
+    return list(iter_visuals(work_dir))
+
+
+def page_visuals(work_dir, *, offset=0, limit=20, query=None):
+    """
+    Renvoie ``(visuels, has_next)`` pour une page de résultats, en lisant le
+    sidecar ligne à ligne : la mémoire utilisée ne dépend que de ``limit``.
+    ``query`` filtre (sans casse) sur le nom de fichier ou le nom du plasmide.
+    """
+    query = (query or '').strip().lower()
+    page = []
+    matched = 0
+    for line in _iter_sidecar_lines(work_dir):
+        # Pré-filtre sur la ligne brute avant de décoder le JSON
+        if query and query not in line.lower():
+            continue
+        if query:
+            visual = json.loads(line)
+            if query not in visual['filename'].lower() and query not in (visual['name'] or '').lower():
+                continue
+        matched += 1
+        if matched <= offset:
+            continue
+        if len(page) == limit:
+            return page, True
+        page.append(visual if query else json.loads(line))
+    return page, False
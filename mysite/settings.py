@@ -163,4 +163,60 @@ DEFAULT_FROM_EMAIL = "noreply@insillyclo.local"
 
 
 MEDIA_URL = '/media/'
-MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
\ No newline at end of file
+MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+
+# Simulation worker (python manage.py simulation_worker)
+SIMULATION_WORKERS = int(os.environ.get("SIMULATION_WORKERS", max(1, (os.cpu_count() or 2) - 1)))
+SIMULATION_WORKER_POLL_INTERVAL = 2.0  # secondes
+
+# Découpage des gros templates (voir apps/simulations/sharding.py) :
+# au plus SIMULATION_SHARDS_PER_RUN processus par run, SIMULATION_MAX_PROCESSES pour tout le worker,
+# et au moins SIMULATION_SHARD_MIN_ROWS lignes par shard
+SIMULATION_SHARDS_PER_RUN = int(os.environ.get("SIMULATION_SHARDS_PER_RUN", 4))
+SIMULATION_MAX_PROCESSES = int(os.environ.get("SIMULATION_MAX_PROCESSES", os.cpu_count() or 2))
+SIMULATION_SHARD_MIN_ROWS = int(os.environ.get("SIMULATION_SHARD_MIN_ROWS", 250))
+
+# Nombre maximal de templates par soumission en lot (voir apps/simulations/batches.py)
+SIMULATION_BATCH_MAX_TEMPLATES = int(os.environ.get("SIMULATION_BATCH_MAX_TEMPLATES", 100))
+
+# Archives de séquences envoyées (voir apps/simulations/archives.py) : taille extraite maximale
+# par fichier GenBank et pour toute l'archive, en octets
+SIMULATION_ARCHIVE_MAX_FILE_BYTES = int(os.environ.get("SIMULATION_ARCHIVE_MAX_FILE_BYTES", 50 * 1024 ** 2))
+SIMULATION_ARCHIVE_MAX_BYTES = int(os.environ.get("SIMULATION_ARCHIVE_MAX_BYTES", 1024 ** 3))
+
+# Lecture des fichiers GenBank (voir apps/plasmids/parsing.py) : processus du pool, et taille totale
+# des fichiers en dessous de laquelle ils sont lus dans le processus courant
+GENBANK_PARSE_WORKERS = int(os.environ.get("GENBANK_PARSE_WORKERS", os.cpu_count() or 2))
+GENBANK_PARSE_PARALLEL_MIN_BYTES = int(os.environ.get("GENBANK_PARSE_PARALLEL_MIN_BYTES", 2 * 1024 ** 2))
+
+# Cache des fichiers GenBank déjà lus (voir apps/plasmids/parse_cache.py), adressé par le contenu
+# des fichiers ; éviction LRU au-delà de cette taille. Les entrées sont des pickles : le dossier doit
+# rester hors de MEDIA_ROOT (servi par le serveur web, alimenté par les envois des utilisateurs)
+GENBANK_PARSE_CACHE_ENABLED = True
+GENBANK_PARSE_CACHE_DIR = os.environ.get("GENBANK_PARSE_CACHE_DIR", os.path.join(BASE_DIR, 'var', 'genbank_parse_cache'))
+GENBANK_PARSE_CACHE_MAX_BYTES = int(os.environ.get("GENBANK_PARSE_CACHE_MAX_BYTES", 512 * 1024 ** 2))
+
+# Limites de chaque run de simulation (None ou 0 : pas de limite). CPU et mémoire s'appliquent à chaque
+# processus : un run découpé en shards peut les atteindre dans chacun d'eux (voir apps/simulations/jobs.py)
+SIMULATION_TIME_LIMIT = int(os.environ.get("SIMULATION_TIME_LIMIT", 600))  # secondes, temps réel
+SIMULATION_CPU_TIME_LIMIT = int(os.environ.get("SIMULATION_CPU_TIME_LIMIT", 300))  # secondes CPU
+SIMULATION_MEMORY_LIMIT = int(os.environ.get("SIMULATION_MEMORY_LIMIT", 2 * 1024 ** 3))  # octets (espace d'adressage)
+
+# Cache des résultats de simulation (media/simulation_cache), éviction LRU au-delà de cette taille
+SIMULATION_CACHE_ENABLED = True
+SIMULATION_CACHE_MAX_BYTES = 2 * 1024 ** 3
+
+# Rétention des dossiers de run (python manage.py simulation_gc, voir apps/simulations/retention.py).
+# 0 : règle désactivée. Le compactage supprime les entrées intermédiaires (sequences/) et garde les résultats.
+SIMULATION_ORPHAN_GRACE_HOURS = int(os.environ.get("SIMULATION_ORPHAN_GRACE_HOURS", 24))  # dossiers sans campagne ni job
+SIMULATION_ANONYMOUS_RETENTION_DAYS = int(os.environ.get("SIMULATION_ANONYMOUS_RETENTION_DAYS", 7))
+SIMULATION_RETENTION_DAYS = int(os.environ.get("SIMULATION_RETENTION_DAYS", 0))  # campagnes
+SIMULATION_COMPACT_AFTER_DAYS = int(os.environ.get("SIMULATION_COMPACT_AFTER_DAYS", 30))
+SIMULATION_USER_QUOTA_BYTES = int(os.environ.get("SIMULATION_USER_QUOTA_BYTES", 0))  # octets par utilisateur
+SIMULATION_GC_INTERVAL = int(os.environ.get("SIMULATION_GC_INTERVAL", 6 * 3600))  # secondes, simulation_gc --loop
+
+# Suppression asynchrone des campagnes (python manage.py simulation_deletion_worker, voir apps/simulations/deletion.py) :
+# campagnes traitées par lot, dossiers supprimés en parallèle, tentatives avant abandon (visible dans l'admin)
+SIMULATION_DELETION_BATCH_SIZE = int(os.environ.get("SIMULATION_DELETION_BATCH_SIZE", 50))
+SIMULATION_DELETION_WORKERS = int(os.environ.get("SIMULATION_DELETION_WORKERS", 4))
+SIMULATION_DELETION_MAX_ATTEMPTS = int(os.environ.get("SIMULATION_DELETION_MAX_ATTEMPTS", 5))